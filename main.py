@@ -45,17 +45,46 @@ async def lifespan(app: FastAPI):
     logger.info(f"{settings.app_name} 启动")
     logger.info(f"服务器地址: {settings.host}:{settings.port}")
 
+    # 执行数据库结构迁移（创建表、索引并更新查询规划器统计信息）
+    from src.database import adb
+    from src.database.migrations import migrate, optimize
+    await adb.run(migrate)
+
     # 启动智能体定时任务调度器
     from src.process.agent import scheduler
     import asyncio
     scheduler_task = asyncio.create_task(scheduler.run())
     logger.info("智能体定时任务调度器已启动")
 
+    # 启动数据库维护任务（归档过期执行记录、增量 vacuum、WAL checkpoint）
+    maintenance_task = None
+    if settings.database_maintenance_interval_minutes > 0:
+        from src.process.maintenance import maintenance
+        maintenance_task = asyncio.create_task(maintenance.run())
+
+    # 后台预加载 embedding 模型（可选）
+    preload_task = None
+    if settings.embedding_preload:
+        from src.embedding import start_preload
+        preload_task = start_preload()
+
+    # 后台定期卸载空闲超时的 embedding 模型（可选）
+    idle_unload_task = None
+    if settings.embedding_model_idle_seconds > 0:
+        from src.embedding import start_idle_unloader
+        idle_unload_task = start_idle_unloader()
+
+    # 后台补齐未建立索引的研究报告（只在 embedding 模型预加载就绪后执行，不会为此在启动时加载模型）
+    index_task = None
+    if settings.report_index_enabled:
+        from src.process.report_index import report_indexer
+        index_task = asyncio.create_task(report_indexer.sync_when_ready(preload_task))
+
     yield
 
     # 关闭事件
     # 停止调度器
-    scheduler.stop()
+    await scheduler.stop()
     scheduler_task.cancel()
     try:
         await scheduler_task
@@ -63,9 +92,27 @@ async def lifespan(app: FastAPI):
         pass
     logger.info("智能体定时任务调度器已停止")
 
-    # 关闭数据库连接
-    from src.database import db
-    db.close_connection()
+    # 停止数据库维护、报告索引、embedding 预加载和空闲卸载、批处理器和推理工作池
+    if maintenance_task is not None:
+        maintenance.stop()
+    for background_task in (maintenance_task, index_task, preload_task, idle_unload_task):
+        if background_task is not None and not background_task.done():
+            background_task.cancel()
+            try:
+                await background_task
+            except asyncio.CancelledError:
+                pass
+    from src.embedding import stop_batchers, inference_pool, embedding_cache
+    await stop_batchers()
+    inference_pool.shutdown()
+    embedding_cache.close()
+
+    # 更新查询规划器统计信息后关闭数据库连接
+    try:
+        await adb.run(optimize)
+    except Exception as e:
+        logger.warning(f"PRAGMA optimize 执行失败: {e}")
+    adb.close()
     logger.info(f"{settings.app_name} 关闭")
 
 
@@ -7,6 +7,7 @@ import asyncio
 import sys
 from src.process.agent import AgentScheduler
 from src.database import db
+from src.database.migrations import migrate
 
 # 设置控制台编码为 UTF-8
 if sys.platform == 'win32':
@@ -71,7 +72,9 @@ async def run_task(task_id: int = None):
         where="task_id = ?",
         params=(task_id,),
         order_by="start_time DESC",
-        limit=1
+        limit=1,
+        columns=("execution_id", "status", "start_time", "end_time", "execution_duration",
+                 "result_summary", "error_message")
     )
 
     if executions:
@@ -141,6 +144,9 @@ async def run_custom_research():
 
 async def main():
     """主函数"""
+    # 与服务启动时一致，先升级数据库结构（未迁移的数据库缺少执行统计等表）
+    migrate()
+
     print("=" * 80)
     print("GPT Researcher 任务执行工具")
     print("=" * 80)
@@ -3,58 +3,30 @@
 
 使用 sentence-transformers 提供本地 embedding 服务
 """
-from typing import List
-from fastapi import APIRouter, Request
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from src.config import settings
+from src.embedding import (
+    count_tokens, embed_texts, embedding_cache, model_registry, start_preload, EmbeddingQueueFull, ModelReadiness
+)
+from src.embedding.encoding import encode_embeddings
+from src.embedding.stream import spool_request_body, stream_embeddings
 from src.logger import logger
 
 router = APIRouter()
 
-# 全局模型实例（延迟加载）
-_embedding_model = None
-
-
-def get_embedding_model():
-    """获取 embedding 模型（延迟加载）"""
-    global _embedding_model
-    if _embedding_model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            # 使用轻量级中文模型
-            logger.info("正在加载 embedding 模型...")
-            _embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-            logger.info("Embedding 模型加载成功")
-        except ImportError:
-            logger.error("sentence-transformers 未安装，请运行: pip install sentence-transformers")
-            raise
-        except Exception as e:
-            logger.error(f"加载 embedding 模型失败: {e}")
-            raise
-    return _embedding_model
-
 
 # ==================== 数据模型 ====================
 
 class EmbeddingRequest(BaseModel):
     """Embedding 请求"""
     input: str | List[str] = Field(..., description="要生成 embedding 的文本（单个字符串或字符串列表）")
-    model: str = Field("text-embedding-local", description="模型名称")
-
-
-class EmbeddingData(BaseModel):
-    """单个 embedding 数据"""
-    object: str = "embedding"
-    embedding: List[float]
-    index: int
-
-
-class EmbeddingResponse(BaseModel):
-    """Embedding 响应"""
-    object: str = "list"
-    data: List[EmbeddingData]
-    model: str
-    usage: dict
+    model: Optional[str] = Field(None, description="模型名称（embedding_models 中配置的别名，为空时使用默认模型）")
+    encoding_format: Literal["float", "base64"] = Field("float", description="返回格式（float: 浮点数列表，base64: 小端原始字节的 base64 编码）")
+    embedding_dtype: Literal["float32", "float16"] = Field("float32", description="返回精度（float16 可减小一半响应体积）")
 
 
 # ==================== Embedding 接口 ====================
@@ -64,42 +36,60 @@ async def create_embeddings(request: Request, req: EmbeddingRequest):
     """
     创建文本 embedding（兼容 OpenAI API 格式）
 
-    支持单个文本或文本列表
+    支持单个文本或文本列表；encoding_format=base64 时返回小端 float32（或 float16）原始字节的 base64 编码
     """
-    try:
-        # 获取模型
-        model = get_embedding_model()
+    # 解析模型别名（未配置的模型抛出 ValueError，由全局处理器返回 400）
+    model_name = model_registry.resolve(req.model)
 
+    try:
         # 处理输入
         texts = [req.input] if isinstance(req.input, str) else req.input
 
-        logger.info(f"生成 embedding，文本数量: {len(texts)}")
+        logger.info(f"生成 embedding，模型: {model_name}，文本数量: {len(texts)}")
 
-        # 生成 embeddings
-        embeddings = model.encode(texts, convert_to_numpy=True)
+        # 使用模型分词器批量计算 token 数（用于用量统计和按长度分桶）
+        token_counts, max_seq_length = await count_tokens(texts, model_name) if texts else ([], 0)
+        # 超出最大序列长度的部分会被模型截断，用量按实际参与计算的 token 数统计
+        truncated = sum(1 for n in token_counts if n > max_seq_length)
+        total_tokens = sum(min(n, max_seq_length) for n in token_counts)
+        if truncated:
+            logger.warning(f"{truncated} 条文本超出模型最大序列长度 {max_seq_length}，超出部分已截断")
 
-        # 构建响应
-        data = []
-        for i, embedding in enumerate(embeddings):
-            data.append(EmbeddingData(
-                embedding=embedding.tolist(),
-                index=i
-            ))
+        # 生成 embeddings（优先读缓存，未命中的与其他并发请求合并为一批）
+        embeddings = await embed_texts(texts, model_name, token_counts) if texts else []
 
-        # 计算 token 使用量（估算）
-        total_tokens = sum(len(text.split()) for text in texts)
+        # 构建响应（直接从 numpy 缓冲区编码，不经过 pydantic 校验）
+        encoded = encode_embeddings(embeddings, req.encoding_format, req.embedding_dtype) if texts else []
+        data = [
+            {"object": "embedding", "embedding": embedding, "index": i}
+            for i, embedding in enumerate(encoded)
+        ]
 
-        response = EmbeddingResponse(
-            data=data,
-            model=req.model,
-            usage={
+        return JSONResponse(content={
+            "object": "list",
+            "data": data,
+            "model": model_name,
+            "usage": {
                 "prompt_tokens": total_tokens,
-                "total_tokens": total_tokens
+                "total_tokens": total_tokens,
+                "truncated_inputs": truncated
+            }
+        })
+
+    except EmbeddingQueueFull as e:
+        # 推理队列已满，返回 503 让调用方稍后重试
+        logger.warning(f"Embedding 队列已满，拒绝请求，排队数: {e.depth}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "code": 503,
+                "message": "Embedding 服务繁忙，请稍后再试"
+            },
+            headers={
+                "X-Queue-Depth": str(e.depth),
+                "Retry-After": "1"
             }
         )
-
-        return response.model_dump()
-
     except Exception as e:
         logger.error(f"生成 embedding 失败: {e}")
         return {
@@ -108,6 +98,37 @@ async def create_embeddings(request: Request, req: EmbeddingRequest):
         }
 
 
+@router.post("/embeddings/stream")
+async def create_embeddings_stream(
+    request: Request,
+    model: Optional[str] = Query(None, description="模型名称（为空时使用默认模型）"),
+    encoding_format: Literal["float", "base64"] = Query("float", description="返回格式"),
+    embedding_dtype: Literal["float32", "float16"] = Query("float32", description="返回精度")
+):
+    """
+    流式创建文本 embedding（NDJSON 输入 / 输出，用于批量任务）
+
+    请求体每行一个 JSON 字符串或 {"input": "...", "id": ...} 对象，
+    按固定批大小 encode，每批完成后立即输出对应的结果行，最后一行为用量统计
+    """
+    model_name = model_registry.resolve(model)
+
+    # 先把请求体写入临时文件：响应开始后不能再读取请求体，且大输入不会全部留在内存中
+    spool = await spool_request_body(request.stream(), settings.embedding_stream_spool_mb * 1024 * 1024)
+    logger.info(f"流式生成 embedding，模型: {model_name}")
+
+    return StreamingResponse(
+        stream_embeddings(
+            spool,
+            model_name,
+            settings.embedding_stream_batch_size,
+            encoding_format,
+            embedding_dtype
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/models")
 async def list_models(request: Request):
     """
@@ -117,27 +138,51 @@ async def list_models(request: Request):
         "object": "list",
         "data": [
             {
-                "id": "text-embedding-local",
+                "id": model["id"],
                 "object": "model",
                 "created": 1677610602,
-                "owned_by": "local"
+                "owned_by": "local",
+                **model
             }
+            for model in model_registry.list_models()
         ]
     }
 
 
+@router.get("/cache/stats")
+async def get_cache_stats(request: Request):
+    """获取 embedding 缓存命中统计"""
+    return {"code": 0, "data": embedding_cache.stats(), "message": "查询成功"}
+
+
 @router.get("/health")
 async def health_check(request: Request):
-    """健康检查"""
-    try:
-        # 尝试加载模型
-        get_embedding_model()
-        return {
-            "status": "healthy",
-            "model": "paraphrase-multilingual-MiniLM-L12-v2"
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e)
-        }
+    """健康检查（存活状态，不触发模型加载）"""
+    return {
+        "status": "healthy",
+        "model": model_registry.model_path(),
+        "model_status": model_registry.readiness().status,
+        "models": {alias: model_registry.readiness(alias).status for alias in model_registry.models}
+    }
+
+
+@router.get("/ready")
+async def readiness_check(
+    request: Request,
+    model: Optional[str] = Query(None, description="模型名称（为空时使用默认模型）")
+):
+    """
+    就绪检查（模型已加载并预热后返回 200，否则返回 503）
+
+    模型尚未加载时（未开启预加载）由首次检查在后台触发预热，预热完成后返回 200
+    """
+    alias = model_registry.resolve(model)
+    readiness = model_registry.readiness(alias)
+    if readiness.status == ModelReadiness.NOT_LOADED:
+        start_preload(alias)
+    if readiness.is_ready:
+        return {"status": "ready", "model": model_registry.model_path(alias), **readiness.to_dict()}
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "not_ready", "model": model_registry.model_path(alias), **readiness.to_dict()}
+    )
@@ -0,0 +1,81 @@
+"""
+研究报告检索接口
+
+对已完成的研究报告（报告存储 tbl_report_blob 中的压缩报告，旧数据为 tbl_task_execution.result_detail）
+建立向量索引，按语义搜索相关的历史研究
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, Field
+
+from src.config import settings
+from src.logger import logger
+from src.process.report_index import report_indexer
+
+router = APIRouter()
+
+# 延迟导入 limiter（避免重复创建导致编码问题）
+limiter = None
+
+def _get_limiter():
+    global limiter
+    if limiter is None:
+        from main import limiter as main_limiter
+        limiter = main_limiter
+    return limiter
+
+# 确保 limiter 在模块加载时可用
+limiter = _get_limiter()
+
+
+# ==================== 数据模型 ====================
+
+class ReportSearchQuery(BaseModel):
+    """研究报告搜索请求"""
+    query: str = Field(..., min_length=1, description="查询文本")
+    top_k: int = Field(10, ge=1, le=100, description="返回的执行记录数和分块数")
+    task_id: Optional[int] = Field(None, description="只搜索指定任务的报告（可选）")
+
+
+class ReportIndexSync(BaseModel):
+    """增量索引请求"""
+    limit: int = Field(100, ge=1, le=10000, description="本次最多处理的执行记录数")
+
+
+# ==================== 研究报告检索接口 ====================
+
+@router.post("/search")
+@limiter.limit("60/minute")
+async def search_reports(request: Request, query: ReportSearchQuery):
+    """
+    搜索相关的历史研究报告
+
+    返回相似度最高的执行记录（按最相关分块的分数排序）和分块内容
+    """
+    logger.info(f"搜索研究报告: {query.query[:50]}, task_id={query.task_id}")
+    if report_indexer.index.count == 0:
+        # 索引为空时说明原因，避免与"没有相关报告"混淆
+        if settings.report_index_enabled:
+            message = "报告索引尚未建立（任务执行成功后自动建立，也可调用 /report/index/sync 立即建立）"
+        else:
+            message = "报告自动索引已关闭，请先调用 /report/index/sync 建立索引"
+        return {"code": 0, "data": {"executions": [], "chunks": []}, "message": message}
+    result = await report_indexer.search(query.query, query.top_k, query.task_id)
+    return {"code": 0, "data": result, "message": "查询成功"}
+
+
+@router.post("/index/sync")
+@limiter.limit("10/minute")
+async def sync_report_index(request: Request, query: ReportIndexSync):
+    """增量索引尚未处理的成功执行记录"""
+    logger.info(f"增量索引研究报告，最多处理 {query.limit} 条")
+    result = await report_indexer.sync(query.limit)
+    return {"code": 0, "data": result, "message": "索引完成"}
+
+
+@router.post("/index/stats")
+@limiter.limit("60/minute")
+async def get_report_index_stats(request: Request):
+    """获取报告索引统计"""
+    return {"code": 0, "data": report_indexer.stats(), "message": "查询成功"}
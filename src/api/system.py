@@ -0,0 +1,64 @@
+"""
+系统运行状态接口
+"""
+from fastapi import APIRouter, Request
+
+from src.database import adb, db
+from src.logger import logger
+from src.process.agent import scheduler
+from src.process.maintenance import maintenance
+
+router = APIRouter()
+
+# 延迟导入 limiter（避免重复创建导致编码问题）
+limiter = None
+
+def _get_limiter():
+    global limiter
+    if limiter is None:
+        from main import limiter as main_limiter
+        limiter = main_limiter
+    return limiter
+
+# 确保 limiter 在模块加载时可用
+limiter = _get_limiter()
+
+
+# ==================== 数据库接口 ====================
+
+@router.post("/db/pool")
+@limiter.limit("60/minute")
+async def get_db_pool_stats(request: Request):
+    """获取数据库连接池和 SQL 语句缓存指标"""
+    logger.info("查询数据库连接池指标")
+    return {
+        "code": 0,
+        "data": {**db.pool_stats(), "statement_cache": db.statements.stats()},
+        "message": "查询成功"
+    }
+
+
+@router.post("/db/size")
+@limiter.limit("10/minute")
+async def get_db_size_report(request: Request):
+    """获取数据库空间占用报告（文件大小、各表 / 索引占用、报告存储、归档目录、最近一次维护结果）"""
+    logger.info("查询数据库空间占用")
+    return {
+        "code": 0,
+        "data": await adb.run(maintenance.size_report),
+        "message": "查询成功"
+    }
+
+
+# ==================== 定时任务调度接口 ====================
+
+@router.post("/scheduler/queue")
+@limiter.limit("60/minute")
+async def get_scheduler_queue_stats(request: Request):
+    """获取研究任务执行队列指标（并发数、队列长度、排队等待时间、正在执行的任务）"""
+    logger.info("查询研究任务执行队列指标")
+    return {
+        "code": 0,
+        "data": scheduler.executor.stats(),
+        "message": "查询成功"
+    }
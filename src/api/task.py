@@ -1,14 +1,23 @@
 """
 智能体定时任务管理接口
 """
+import base64
+import binascii
+import json
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from src.database import db
+from src.config import settings
+from src.database import adb, execution_stats, report_store
 from src.logger import logger
+from src.process.schedule import compile_schedule
+from src.process.task_registry import task_registry
 
 router = APIRouter()
 
@@ -32,9 +41,10 @@ class AgentScheduleTaskCreate(BaseModel):
     """创建智能体定时任务请求"""
     task_name: str = Field(..., description="任务名称")
     task_info: Optional[str] = Field(None, description="任务信息")
-    task_conf: str = Field(..., description="任务执行时间配置（格式：时 日 月 周，如：'6,8 * * *' 表示每天6点和8点，'20 * * 0' 表示每周日晚8点）")
+    task_conf: str = Field(..., description="任务执行时间配置（格式：时 日 月 周 或 分 时 日 月 周，如：'6,8 * * *' 表示每天6点和8点，'20 * * 0' 表示每周日晚8点，'*/15 9-17 * * 1-5' 表示工作日9点到17点每15分钟）")
     task_prompt: Optional[str] = Field(None, description="任务提示词")
     task_status: int = Field(1, description="任务状态（0:关闭 1:开启）")
+    task_priority: int = Field(0, description="任务优先级（数值越大越优先执行，默认0）")
 
 
 class AgentScheduleTaskUpdate(BaseModel):
@@ -45,6 +55,7 @@ class AgentScheduleTaskUpdate(BaseModel):
     task_conf: Optional[str] = Field(None, description="任务执行时间配置")
     task_prompt: Optional[str] = Field(None, description="任务提示词")
     task_status: Optional[int] = Field(None, description="任务状态（0:关闭 1:开启）")
+    task_priority: Optional[int] = Field(None, description="任务优先级（数值越大越优先执行）")
 
 
 class AgentScheduleTaskQuery(BaseModel):
@@ -61,8 +72,10 @@ class AgentTaskLogQuery(BaseModel):
     """查询任务执行日志请求"""
     task_id: Optional[int] = Field(None, description="任务ID（可选，不传则查询所有）")
     status: Optional[int] = Field(None, description="执行状态（0:执行中 1:成功 2:失败）")
-    size: int = Field(100, description="每页数量")
-    start: int = Field(0, description="起始位置（从0开始）")
+    size: int = Field(100, ge=1, le=1000, description="每页数量")
+    start: int = Field(0, ge=0, description="起始位置（从0开始，传 cursor 时忽略）")
+    cursor: Optional[str] = Field(None, description="分页游标（上一页返回的 next_cursor，推荐使用）")
+    with_total: bool = Field(True, description="是否返回总数（总数有短时缓存）")
 
 
 class TaskExecutionQuery(BaseModel):
@@ -78,14 +91,19 @@ async def create_agent_task(request: Request, task: AgentScheduleTaskCreate):
     """
     添加智能体定时任务
 
-    task_conf 格式说明（类似 cron，但简化为4个字段）：
-    - 格式：时 日 月 周（用空格分隔）
+    task_conf 格式说明（类似 cron）：
+    - 格式：时 日 月 周，或 分 时 日 月 周（用空格分隔）
+      - 4 个字段时在匹配的小时内执行一次（默认整点，SCHEDULER_JITTER_MINUTES 大于 0 时按任务错开）
+      - 5 个字段时在匹配的分钟执行
     - 示例：
       - "6,8 * * *" - 每天6点和8点执行
       - "20 * * 0" - 每周日晚8点执行
       - "9 1 * *" - 每月1号早9点执行
       - "14 * * 1-5" - 每周一到周五下午2点执行
+      - "30 9 * * *" - 每天9点30分执行
+      - "*/15 9-17 * * 1-5" - 每周一到周五9点到17点每15分钟执行
     - 字段说明：
+      - 分：0-59
       - 时：0-23
       - 日：1-31
       - 月：1-12
@@ -93,9 +111,15 @@ async def create_agent_task(request: Request, task: AgentScheduleTaskCreate):
       - * 表示任意值
       - , 表示多个值（如：6,8,10）
       - - 表示范围（如：1-5）
+      - / 表示步长（如：*/15、10-50/20、5/10）
+
+    task_priority：同一时刻触发的任务超过最大并发数时，优先级高的任务先执行
     """
     logger.info(f"创建智能体定时任务: {task.task_name}")
 
+    # 校验时间配置（格式错误时返回 400）
+    compile_schedule(task.task_conf)
+
     # 获取当前时间
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
@@ -106,12 +130,14 @@ async def create_agent_task(request: Request, task: AgentScheduleTaskCreate):
         "task_conf": task.task_conf,
         "task_prompt": task.task_prompt,
         "task_status": task.task_status,
+        "task_priority": task.task_priority,
         "insert_time": current_time,
         "update_time": current_time
     }
 
     # 插入数据库
-    task_id = db.insert("tbl_agent_schedule_task", task_data)
+    task_id = await adb.insert("tbl_agent_schedule_task", task_data)
+    task_registry.invalidate(task_id)
 
     logger.info(f"智能体定时任务创建成功，任务ID: {task_id}")
 
@@ -130,8 +156,8 @@ async def create_agent_task(request: Request, task: AgentScheduleTaskCreate):
 async def get_agent_tasks(request: Request):
     """获取所有智能体定时任务"""
     logger.info("查询所有智能体定时任务")
-    tasks = db.get_all("tbl_agent_schedule_task", order_by="task_id DESC")
-    total = db.count("tbl_agent_schedule_task")
+    tasks = await adb.get_all("tbl_agent_schedule_task", order_by="task_id DESC")
+    total = await adb.count("tbl_agent_schedule_task")
     return {
         "code": 0,
         "data": {
@@ -147,7 +173,7 @@ async def get_agent_tasks(request: Request):
 async def get_agent_task(request: Request, query: AgentScheduleTaskQuery):
     """获取单个智能体定时任务"""
     logger.info(f"查询智能体定时任务 ID: {query.task_id}")
-    task = db.get_by_id("tbl_agent_schedule_task", "task_id", query.task_id)
+    task = await adb.get_by_id("tbl_agent_schedule_task", "task_id", query.task_id)
     if not task:
         return {"code": 404, "message": "任务不存在"}
     return {"code": 0, "data": task, "message": "查询成功"}
@@ -163,11 +189,13 @@ async def update_agent_task(request: Request, task: AgentScheduleTaskUpdate):
     update_data = {k: v for k, v in task.model_dump(exclude_unset=True).items() if k != "task_id"}
     if not update_data:
         return {"code": 400, "message": "没有提供更新字段"}
+    if "task_conf" in update_data:
+        compile_schedule(update_data["task_conf"])
 
     # 添加更新时间
     update_data["update_time"] = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-    rows = db.update(
+    rows = await adb.update(
         "tbl_agent_schedule_task",
         update_data,
         "task_id = ?",
@@ -176,6 +204,7 @@ async def update_agent_task(request: Request, task: AgentScheduleTaskUpdate):
 
     if rows == 0:
         return {"code": 404, "message": "任务不存在"}
+    task_registry.invalidate(task.task_id)
     return {"code": 0, "message": "更新成功"}
 
 
@@ -184,21 +213,97 @@ async def update_agent_task(request: Request, task: AgentScheduleTaskUpdate):
 async def delete_agent_task(request: Request, task: AgentScheduleTaskDelete):
     """删除智能体定时任务"""
     logger.info(f"删除智能体定时任务 ID: {task.task_id}")
-    rows = db.delete("tbl_agent_schedule_task", "task_id = ?", (task.task_id,))
+    rows = await adb.delete("tbl_agent_schedule_task", "task_id = ?", (task.task_id,))
     if rows == 0:
         return {"code": 404, "message": "任务不存在"}
+    task_registry.invalidate(task.task_id)
     return {"code": 0, "message": "删除成功"}
 
 
 # ==================== 任务执行日志接口 ====================
 
+# 列表接口返回的执行记录字段（不含 result_detail / error_detail 大字段，完整内容通过 getExecutionDetail 获取）
+EXECUTION_LIST_COLUMNS = (
+    "execution_id", "task_id", "task_name", "task_prompt", "status",
+    "start_time", "end_time", "execution_duration",
+    "result_summary", "error_message", "created_at", "updated_at",
+)
+
+# 执行记录总数缓存的最大条目数
+_EXECUTION_TOTAL_CACHE_SIZE = 256
+
+# 执行记录总数缓存：(task_id, status) -> (总数, 过期时间)，按最近使用顺序（LRU）限制条目数，写入时清理过期条目
+_execution_total_cache: "OrderedDict[Tuple[Optional[int], Optional[int]], Tuple[int, float]]" = OrderedDict()
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    """根据当前页最后一条记录生成游标（start_time, execution_id）"""
+    raw = json.dumps([row["start_time"], row["execution_id"]], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_time, execution_id = json.loads(raw)
+        if not isinstance(start_time, str) or not isinstance(execution_id, int):
+            raise ValueError
+        return start_time, execution_id
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("无效的分页游标")
+
+
+def _stream_execution_detail(execution: Dict[str, Any], first_chunk: str, chunks: Iterator[str]):
+    """
+    流式输出执行记录详情（与普通响应格式相同）
+
+    result_detail 放在最后，报告按块解压并转义后输出，不在内存中拼出完整报告
+    """
+    fields = {k: v for k, v in execution.items() if k != "result_detail"}
+    yield '{"code": 0, "message": "查询成功", "data": '
+    yield json.dumps(fields, ensure_ascii=False)[:-1]
+    yield ', "result_detail": "'
+    yield json.dumps(first_chunk, ensure_ascii=False)[1:-1]
+    for text in chunks:
+        yield json.dumps(text, ensure_ascii=False)[1:-1]
+    yield '"}}'
+
+
+async def _count_executions(task_id: Optional[int], status: Optional[int], where: Optional[str],
+                            params: Optional[tuple]) -> int:
+    """统计执行记录数（指定任务时读取执行统计汇总，否则 COUNT 并缓存 execution_total_cache_seconds 秒）"""
+    status_keys = {None: "total_count", 0: "running_count", 1: "success_count", 2: "failure_count"}
+    if task_id is not None and status in status_keys:
+        stats = await adb.run(execution_stats.get, task_id)
+        return stats[status_keys[status]] if stats else 0
+
+    key = (task_id, status)
+    cached = _execution_total_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[1] > now:
+        _execution_total_cache.move_to_end(key)
+        return cached[0]
+    total = await adb.count("tbl_task_execution", where=where, params=params)
+    if settings.execution_total_cache_seconds > 0:
+        for expired in [k for k, (_, expires_at) in _execution_total_cache.items() if expires_at <= now]:
+            del _execution_total_cache[expired]
+        _execution_total_cache[key] = (total, now + settings.execution_total_cache_seconds)
+        _execution_total_cache.move_to_end(key)
+        while len(_execution_total_cache) > _EXECUTION_TOTAL_CACHE_SIZE:
+            _execution_total_cache.popitem(last=False)
+    return total
+
+
 @router.post("/agentTasks/getExecutionList")
 @limiter.limit("60/minute")
 async def get_agent_task_logs(request: Request, query: AgentTaskLogQuery):
     """
     获取任务执行历史列表
 
-    支持按任务ID和执行状态筛选，支持分页
+    支持按任务ID和执行状态筛选，支持分页：
+    - 游标分页（推荐）：传入上一页返回的 next_cursor，按 (start_time, execution_id) 定位，深分页不变慢
+    - 偏移分页（兼容）：传入 start
     """
     logger.info(f"查询任务执行日志: task_id={query.task_id}, status={query.status}")
 
@@ -214,20 +319,34 @@ async def get_agent_task_logs(request: Request, query: AgentTaskLogQuery):
         where_clauses.append("status = ?")
         params.append(query.status)
 
+    filter_where = " AND ".join(where_clauses) if where_clauses else None
+    filter_params = tuple(params) if params else None
+
+    # 游标分页：从上一页最后一条记录之后继续
+    if query.cursor:
+        start_time, execution_id = _decode_cursor(query.cursor)
+        where_clauses.append("(start_time, execution_id) < (?, ?)")
+        params.extend([start_time, execution_id])
+
     where = " AND ".join(where_clauses) if where_clauses else None
 
-    # 查询日志（使用新表 tbl_task_execution）
-    logs = db.get_all(
+    # 多取一条用于判断是否还有下一页（使用新表 tbl_task_execution）
+    logs = await adb.get_all(
         "tbl_task_execution",
         where=where,
         params=tuple(params) if params else None,
-        order_by="start_time DESC",
-        limit=query.size,
-        offset=query.start
+        order_by="start_time DESC, execution_id DESC",
+        limit=query.size + 1,
+        offset=None if query.cursor else query.start,
+        columns=EXECUTION_LIST_COLUMNS
     )
+    has_more = len(logs) > query.size
+    logs = logs[:query.size]
 
-    # 统计总数
-    total = db.count("tbl_task_execution", where=where, params=tuple(params) if params else None)
+    # 统计总数（可选，短时缓存）
+    total = None
+    if query.with_total:
+        total = await _count_executions(query.task_id, query.status, filter_where, filter_params)
 
     return {
         "code": 0,
@@ -235,7 +354,9 @@ async def get_agent_task_logs(request: Request, query: AgentTaskLogQuery):
             "list": logs,
             "total": total,
             "size": query.size,
-            "start": query.start
+            "start": query.start,
+            "next_cursor": _encode_cursor(logs[-1]) if has_more else None,
+            "has_more": has_more
         },
         "message": "查询成功"
     }
@@ -247,12 +368,13 @@ async def get_latest_task_log(request: Request, query: AgentScheduleTaskQuery):
     """获取指定任务的最新执行日志"""
     logger.info(f"查询任务最新执行日志 ID: {query.task_id}")
 
-    logs = db.get_all(
+    logs = await adb.get_all(
         "tbl_task_execution",
         where="task_id = ?",
         params=(query.task_id,),
         order_by="start_time DESC",
-        limit=1
+        limit=1,
+        columns=EXECUTION_LIST_COLUMNS
     )
 
     if not logs:
@@ -267,15 +389,29 @@ async def get_task_execution_detail(request: Request, query: TaskExecutionQuery)
     """
     根据执行ID获取任务执行记录详情
 
-    返回完整的执行记录信息，包括完整报告内容（result_detail）
+    返回完整的执行记录信息，包括完整报告内容（result_detail）。
+    报告保存在压缩报告存储中时，按块解压并流式返回。
     """
     logger.info(f"查询任务执行记录详情 execution_id: {query.execution_id}")
 
-    execution = db.get_by_id("tbl_task_execution", "execution_id", query.execution_id)
+    execution = await adb.get_by_id("tbl_task_execution", "execution_id", query.execution_id)
 
     if not execution:
         return {"code": 404, "message": "执行记录不存在"}
 
+    if execution.get("report_hash"):
+        # 先读取第一块，报告缺失时还能返回普通的错误响应
+        chunks = report_store.iter_text(execution["report_hash"])
+        try:
+            first_chunk = await adb.run(next, chunks, "")
+        except KeyError:
+            logger.error(f"执行记录 {query.execution_id} 的报告内容不存在: {execution['report_hash']}")
+            return {"code": 404, "message": "报告内容不存在"}
+        return StreamingResponse(
+            _stream_execution_detail(execution, first_chunk, chunks),
+            media_type="application/json"
+        )
+
     return {"code": 0, "data": execution, "message": "查询成功"}
 
 
@@ -285,14 +421,10 @@ async def get_task_log_stats(request: Request, query: AgentScheduleTaskQuery):
     """获取指定任务的执行统计信息"""
     logger.info(f"查询任务执行统计 ID: {query.task_id}")
 
-    # 查询所有日志（使用新表 tbl_task_execution）
-    logs = db.get_all(
-        "tbl_task_execution",
-        where="task_id = ?",
-        params=(query.task_id,)
-    )
+    # 从执行统计汇总表读取（执行开始 / 结束时增量维护，与执行历史长度无关）
+    stats = await adb.run(execution_stats.get, query.task_id)
 
-    if not logs:
+    if not stats or not stats["total_count"]:
         return {
             "code": 0,
             "data": {
@@ -306,26 +438,27 @@ async def get_task_log_stats(request: Request, query: AgentScheduleTaskQuery):
             "message": "暂无执行记录"
         }
 
-    # 统计数据
-    total = len(logs)
-    success = sum(1 for log in logs if log.get("status") == 1)
-    failure = sum(1 for log in logs if log.get("status") == 2)
-    running = sum(1 for log in logs if log.get("status") == 0)
-
-    # 计算平均执行时长（仅统计已完成的任务）
-    completed_logs = [log for log in logs if log.get("execution_duration") is not None]
-    avg_duration = sum(log.get("execution_duration", 0) for log in completed_logs) / len(completed_logs) if completed_logs else 0
+    # 平均执行时长（仅统计已完成的任务）
+    completed = stats["completed_count"]
+    avg_duration = stats["total_duration"] / completed if completed else 0
 
-    # 最后一次执行
-    last_log = logs[0] if logs else None
+    # 最后一次执行（按开始时间）
+    last_log = None
+    if stats["last_execution_id"] is not None:
+        last_log = await adb.get_by_id(
+            "tbl_task_execution",
+            "execution_id",
+            stats["last_execution_id"],
+            columns=("execution_id", "start_time", "status", "execution_duration")
+        )
 
     return {
         "code": 0,
         "data": {
-            "total_executions": total,
-            "success_count": success,
-            "failure_count": failure,
-            "running_count": running,
+            "total_executions": stats["total_count"],
+            "success_count": stats["success_count"],
+            "failure_count": stats["failure_count"],
+            "running_count": stats["running_count"],
             "avg_duration": round(avg_duration, 2),
             "last_execution": {
                 "execution_id": last_log.get("execution_id"),
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +17,19 @@ class Settings(BaseSettings):
 
     # 数据库配置
     database_echo: bool = False  # 是否打印 SQL 语句
+    database_workers: int = 4  # 异步数据库工作线程数（SQLite 调用在这些线程中执行，不阻塞事件循环）
+    database_pool_readers: int = 4  # 只读连接数上限（写操作使用单独的写连接）
+    database_pool_idle_seconds: int = 300  # 只读连接空闲多久后关闭（0 表示不关闭）
+    database_cache_size_kb: int = 16384  # 每个连接的页缓存大小（KB）
+    database_mmap_size_mb: int = 256  # 内存映射读取的大小上限（MB，0 表示不使用）
+    database_batch_size: int = 500  # insert_many / update_many 每个事务处理的行数
+    execution_total_cache_seconds: int = 30  # 执行记录列表总数的缓存时间（秒，0 表示不缓存）
+    report_compression: str = "zlib"  # 研究报告压缩算法（zlib / zstd，zstd 需要安装 zstandard）
+    report_compression_level: int = 6  # 压缩级别（zlib: 1-9，zstd: 1-22）
+    database_maintenance_interval_minutes: int = 60  # 数据库维护任务的执行间隔（分钟，0 表示不执行）
+    execution_retention_days: int = 0  # 执行记录保留天数，超过的记录归档后删除（0 表示永久保留）
+    execution_archive_dir: str = "/work/data/execution_archive"  # 执行记录归档目录（gzip 压缩的 JSONL，为空则不归档直接删除）
+    database_vacuum_pages: int = 2000  # 每次维护最多回收的空闲页数（0 表示全部回收）
 
     # 日志配置
     log_dir: str = "/work/logs/MIdeasServer"
@@ -43,6 +58,52 @@ class Settings(BaseSettings):
     browse_chunk_max_length: int = 8192
     summary_token_limit: int = 700
 
+    # ==================== 定时任务调度配置 ====================
+    scheduler_registry_check_seconds: int = 60  # 检查任务表是否被其他进程修改的间隔（秒，接口修改任务时立即生效）
+    scheduler_max_concurrency: int = 2  # 同时执行的研究任务数（其余触发的任务按优先级排队）
+    scheduler_jitter_minutes: int = 0  # 小时级配置（时 日 月 周）的任务按任务ID在触发小时的前 N 分钟内错开（0 表示整点触发，最大 60）
+    scheduler_queue_size: int = 1000  # 执行队列容量（0 表示不限制，队列已满时本触发时段内稍后重试）
+    scheduler_catchup_policy: str = "skip"  # 停机期间错过的触发：skip（跳过）/ once（启动后补执行一次）
+    scheduler_orphan_policy: str = "fail"  # 启动时遗留的运行中执行记录：fail（标记为失败）/ requeue（标记为失败并重新执行任务）
+
+    # ==================== 研究报告索引配置 ====================
+    report_index_enabled: bool = True  # 任务执行成功后自动为报告建立向量索引（启动时只在 embedding 模型预加载就绪后补齐），关闭时通过 /report/index/sync 手动建立
+    report_index_dir: str = "/work/data/report_index"  # 向量索引目录
+    report_index_model: str = ""  # 使用的 embedding 模型别名（为空时使用默认模型）
+    report_chunk_size: int = 800  # 报告分块的最大字符数
+    report_chunk_overlap: int = 100  # 超长段落切分时相邻分块的重叠字符数
+    report_index_exact_threshold: int = 50000  # 向量数不超过该值时使用暴力搜索，超过后使用近似搜索
+
+    # ==================== 本地 Embedding 服务配置 ====================
+    # 模型注册表：别名 -> sentence-transformers 模型名称或本地路径（环境变量中使用 JSON 格式）
+    embedding_models: Dict[str, str] = {
+        "text-embedding-local": "paraphrase-multilingual-MiniLM-L12-v2"
+    }
+    embedding_default_model: str = "text-embedding-local"  # 请求未指定模型时使用
+    embedding_model_memory_mb: int = 4096  # 已加载模型的总内存预算，超出后按 LRU 卸载（0 表示不限制）
+    embedding_model_idle_seconds: int = 0  # 模型空闲多久后卸载（0 表示不卸载）
+    embedding_preload: bool = False  # 启动时在后台预加载并预热默认模型
+    # 推理后端：torch（PyTorch fp32）/ onnx（ONNX Runtime）/ onnx-int8（ONNX 动态 int8 量化）
+    embedding_backend: str = "torch"
+    embedding_onnx_dir: str = "/work/data/onnx_models"  # ONNX 导出 / 量化模型的保存目录
+    embedding_onnx_quantization: str = "avx2"  # int8 量化配置：arm64 / avx2 / avx512 / avx512_vnni
+    embedding_parity_check: bool = True  # 非 torch 后端加载后与 fp32 输出做一致性校验
+    embedding_parity_min_cosine: float = 0.99  # 一致性校验的最小余弦相似度
+    # 动态批处理：并发请求合并为一次 encode
+    embedding_batch_max_size: int = 64  # 单批最大文本数
+    embedding_batch_max_wait_ms: float = 5  # 收集批次的最长等待时间（毫秒）
+    embedding_encode_batch_size: int = 32  # 按 token 长度排序后每次前向计算的文本数
+    # 推理工作池：encode 在独立线程池 / 进程池中执行，不阻塞事件循环
+    embedding_executor: str = "thread"  # thread / process
+    embedding_workers: int = 1  # 工作线程 / 进程数
+    embedding_queue_size: int = 256  # 最大排队请求数，超过后返回 503
+    # 结果缓存：按 (模型名称, 规范化文本) 缓存 embedding
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_mb: int = 256  # 内存 LRU 层容量（MB）
+    embedding_cache_path: str = ""  # 磁盘层 SQLite 文件路径（为空则只使用内存层）
+    embedding_stream_batch_size: int = 128  # 流式接口每批 encode 的文本数
+    embedding_stream_spool_mb: int = 8  # 流式接口请求体在内存中缓存的上限（超出部分写入临时文件）
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -1,3 +1,8 @@
 from .db import db, Database
+from .async_db import adb, AsyncDatabase
+from .report_store import report_store, ReportStore
+from .execution_stats import execution_stats, ExecutionStats
+from .scheduler_state import scheduler_state, SchedulerState
 
-__all__ = ["db", "Database"]
+__all__ = ["db", "Database", "adb", "AsyncDatabase", "report_store", "ReportStore", "execution_stats", "ExecutionStats",
+           "scheduler_state", "SchedulerState"]
@@ -0,0 +1,102 @@
+"""
+异步数据库访问
+
+在专用线程池中执行 Database 的同步方法，避免 SQLite 调用（包括最长 10 秒的锁等待）阻塞事件循环。
+接口与 Database 保持一致，只是需要 await：
+
+    task = await adb.get_by_id("tbl_agent_schedule_task", "task_id", 1)
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.config import settings
+from src.database.db import Database, db
+from src.logger import logger
+
+
+class AsyncDatabase:
+    """Database 的异步封装（工作线程共享 Database 的连接池）"""
+
+    def __init__(self, database: Database, max_workers: int = 4):
+        """
+        初始化异步数据库
+
+        Args:
+            database: 同步数据库实例
+            max_workers: 数据库工作线程数
+        """
+        self.db = database
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在数据库线程中执行任意同步函数（如需要在同一事务中完成的多条语句，在 fn 内使用 db.transaction()）
+
+        Args:
+            fn: 同步函数
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(fn, *args, **kwargs))
+
+    async def query(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """执行查询语句"""
+        return await self.run(self.db.query, sql, params)
+
+    async def execute(self, sql: str, params: tuple = None) -> int:
+        """执行更新语句（INSERT, UPDATE, DELETE），返回影响的行数"""
+        return await self.run(self.db.execute, sql, params)
+
+    async def insert(self, table: str, data: Dict[str, Any]) -> int:
+        """插入数据，返回新插入记录的 ID"""
+        return await self.run(self.db.insert, table, data)
+
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]], chunk_size: int = None) -> int:
+        """批量插入数据，返回插入的行数"""
+        return await self.run(self.db.insert_many, table, rows, chunk_size)
+
+    async def update(self, table: str, data: Dict[str, Any], where: str, where_params: tuple = None) -> int:
+        """更新数据，返回影响的行数"""
+        return await self.run(self.db.update, table, data, where, where_params)
+
+    async def update_many(self, table: str, rows: List[Dict[str, Any]], key_column: str,
+                          chunk_size: int = None) -> int:
+        """按主键批量更新数据，返回影响的行数"""
+        return await self.run(self.db.update_many, table, rows, key_column, chunk_size)
+
+    async def delete(self, table: str, where: str, where_params: tuple = None) -> int:
+        """删除数据，返回影响的行数"""
+        return await self.run(self.db.delete, table, where, where_params)
+
+    async def get_by_id(self, table: str, id_column: str, id_value: Any,
+                        columns: Sequence[str] = None) -> Optional[Dict[str, Any]]:
+        """根据 ID 获取单条记录"""
+        return await self.run(self.db.get_by_id, table, id_column, id_value, columns)
+
+    async def get_all(self, table: str, where: str = None, params: tuple = None, order_by: str = None,
+                      limit: int = None, offset: int = None, columns: Sequence[str] = None) -> List[Dict[str, Any]]:
+        """获取表中所有记录"""
+        return await self.run(self.db.get_all, table, where, params, order_by, limit, offset, columns)
+
+    async def count(self, table: str, where: str = None, params: tuple = None) -> int:
+        """统计记录数"""
+        return await self.run(self.db.count, table, where, params)
+
+    def close(self):
+        """停止数据库线程并关闭连接池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.db.close_connection()
+        logger.debug("异步数据库已关闭")
+
+
+# 全局异步数据库实例
+adb = AsyncDatabase(db, max_workers=settings.database_workers)
@@ -2,19 +2,21 @@
 SQLite 数据库工具类
 
 提供通用的数据库操作方法，无需为每个表单独编写代码
-使用线程本地存储优化连接管理
+使用连接池管理连接：写操作使用专用写连接串行执行，读操作使用只读连接
+通用方法的 SQL 由 StatementBuilder 生成（校验表名 / 列名，并按形状缓存）
 """
-import sqlite3
-import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 from contextlib import contextmanager
 
+from src.config import settings
+from src.database.pool import ConnectionPool
+from src.database.statements import StatementBuilder
 from src.logger import logger
 
 
 class Database:
-    """SQLite 数据库操作类（支持连接复用）"""
+    """SQLite 数据库操作类（基于连接池）"""
 
     def __init__(self, db_path: str = None):
         """
@@ -26,43 +28,95 @@ class Database:
         if db_path is None:
             db_path = Path(__file__).parent / "Mideas.db"
         self.db_path = str(db_path)
-        self._local = threading.local()
+        self.pool = ConnectionPool(
+            self.db_path,
+            max_readers=settings.database_pool_readers,
+            idle_seconds=settings.database_pool_idle_seconds,
+            timeout=10.0,  # 10秒超时
+            cache_size_kb=settings.database_cache_size_kb,
+            mmap_size_mb=settings.database_mmap_size_mb
+        )
+        self.statements = StatementBuilder(self._table_columns)
+        self.batch_size = settings.database_batch_size
+        self._transaction_depth = 0  # 只由持有写连接的线程修改
         logger.debug(f"数据库初始化: {self.db_path}")
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取线程本地连接（复用连接）"""
-        if not hasattr(self._local, "connection") or self._local.connection is None:
-            self._local.connection = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,
-                timeout=10.0  # 10秒超时
-            )
-            self._local.connection.row_factory = sqlite3.Row
-            # 启用 WAL 模式提高并发性能
-            self._local.connection.execute("PRAGMA journal_mode=WAL")
-            logger.debug(f"创建新的数据库连接 (线程: {threading.current_thread().name})")
-        return self._local.connection
-
     @contextmanager
     def get_connection(self):
-        """获取数据库连接（上下文管理器）"""
-        conn = self._get_connection()
-        try:
-            yield conn
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"数据库操作失败: {str(e)}")
-            raise
-        finally:
-            # 不关闭连接，保持复用
-            pass
+        """获取写连接（上下文管理器，持有期间其他线程的写操作等待）"""
+        with self.pool.writer() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                # 显式事务中的失败由 transaction() 处理
+                if self._transaction_depth == 0:
+                    conn.rollback()
+                logger.error(f"数据库操作失败: {str(e)}")
+                raise
+
+    @contextmanager
+    def transaction(self):
+        """
+        显式事务（上下文管理器）
+
+        块内通过 execute / insert / update / delete / insert_many / update_many 执行的写操作
+        在退出时一次提交，出现异常时整体回滚；嵌套使用时内层为 SAVEPOINT，只回滚内层的修改。
+
+            with db.transaction():
+                db.insert(...)
+                db.update(...)
+        """
+        with self.pool.writer() as conn:
+            depth = self._transaction_depth
+            savepoint = f"sp_{depth}"
+            if depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            else:
+                conn.execute(f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if depth == 0:
+                    conn.rollback()
+                else:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                if depth == 0:
+                    conn.commit()
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self._transaction_depth = depth
+
+    def _commit(self, conn):
+        """不在显式事务中时立即提交"""
+        if self._transaction_depth == 0:
+            conn.commit()
+
+    @contextmanager
+    def get_read_connection(self):
+        """获取只读连接（上下文管理器）"""
+        with self.pool.reader() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                logger.error(f"数据库查询失败: {str(e)}")
+                raise
+
+    def _table_columns(self, table: str) -> List[str]:
+        """读取表的列名（表名已由 StatementBuilder 校验）"""
+        return [row["name"] for row in self.query(f"PRAGMA table_info({table})")]
 
     def close_connection(self):
-        """关闭当前线程的数据库连接"""
-        if hasattr(self._local, "connection") and self._local.connection:
-            self._local.connection.close()
-            self._local.connection = None
-            logger.debug(f"关闭数据库连接 (线程: {threading.current_thread().name})")
+        """关闭连接池中的所有连接（之后的操作会重新建立连接）"""
+        self.pool.close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """连接池指标"""
+        return self.pool.stats()
 
     def query(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
         """
@@ -75,7 +129,7 @@ class Database:
         Returns:
             查询结果列表
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(sql, params or ())
             rows = cursor.fetchall()
@@ -95,7 +149,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(sql, params or ())
-            conn.commit()
+            self._commit(conn)
             return cursor.rowcount
 
     def insert(self, table: str, data: Dict[str, Any]) -> int:
@@ -109,16 +163,45 @@ class Database:
         Returns:
             新插入记录的 ID
         """
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["?" for _ in data])
-        sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        sql = self.statements.insert(table, tuple(data.keys()))
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(sql, tuple(data.values()))
-            conn.commit()
+            self._commit(conn)
             return cursor.lastrowid
 
+    def _chunks(self, rows: List[Dict[str, Any]], chunk_size: Optional[int]):
+        chunk_size = max(1, chunk_size or self.batch_size)
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+    def insert_many(self, table: str, rows: List[Dict[str, Any]], chunk_size: int = None) -> int:
+        """
+        批量插入数据（executemany，每个分块一个事务）
+
+        Args:
+            table: 表名
+            rows: 数据字典列表（所有字典的键必须相同）
+            chunk_size: 每个事务插入的行数（默认 database_batch_size）；在 transaction() 中调用时全部并入外层事务
+
+        Returns:
+            插入的行数
+        """
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        if any(tuple(row.keys()) != columns for row in rows):
+            raise ValueError("insert_many 的所有数据行必须包含相同的字段")
+        sql = self.statements.insert(table, columns)
+
+        inserted = 0
+        for chunk in self._chunks(rows, chunk_size):
+            with self.transaction() as conn:
+                conn.executemany(sql, [tuple(row.values()) for row in chunk])
+            inserted += len(chunk)
+        return inserted
+
     def update(self, table: str, data: Dict[str, Any], where: str, where_params: tuple = None) -> int:
         """
         更新数据
@@ -132,11 +215,41 @@ class Database:
         Returns:
             影响的行数
         """
-        set_clause = ", ".join([f"{k} = ?" for k in data.keys()])
-        sql = f"UPDATE {table} SET {set_clause} WHERE {where}"
+        sql = self.statements.update(table, tuple(data.keys()), where)
         params = tuple(data.values()) + (where_params or ())
         return self.execute(sql, params)
 
+    def update_many(self, table: str, rows: List[Dict[str, Any]], key_column: str, chunk_size: int = None) -> int:
+        """
+        按主键批量更新数据（executemany，每个分块一个事务）
+
+        Args:
+            table: 表名
+            rows: 数据字典列表（所有字典的键必须相同，且包含 key_column）
+            key_column: 用于定位记录的列（如 "execution_id"）
+            chunk_size: 每个事务更新的行数（默认 database_batch_size）；在 transaction() 中调用时全部并入外层事务
+
+        Returns:
+            影响的行数
+        """
+        if not rows:
+            return 0
+        keys = tuple(rows[0].keys())
+        if key_column not in keys or any(tuple(row.keys()) != keys for row in rows):
+            raise ValueError(f"update_many 的所有数据行必须包含相同的字段，且包含 {key_column}")
+        columns = tuple(key for key in keys if key != key_column)
+        sql = self.statements.update(table, columns, f"{key_column} = ?")
+
+        updated = 0
+        for chunk in self._chunks(rows, chunk_size):
+            with self.transaction() as conn:
+                cursor = conn.executemany(
+                    sql,
+                    [tuple(row[column] for column in columns) + (row[key_column],) for row in chunk]
+                )
+                updated += cursor.rowcount
+        return updated
+
     def delete(self, table: str, where: str, where_params: tuple = None) -> int:
         """
         删除数据
@@ -149,10 +262,11 @@ class Database:
         Returns:
             影响的行数
         """
-        sql = f"DELETE FROM {table} WHERE {where}"
+        sql = self.statements.delete(table, where)
         return self.execute(sql, where_params)
 
-    def get_by_id(self, table: str, id_column: str, id_value: Any) -> Optional[Dict[str, Any]]:
+    def get_by_id(self, table: str, id_column: str, id_value: Any,
+                  columns: Sequence[str] = None) -> Optional[Dict[str, Any]]:
         """
         根据 ID 获取单条记录
 
@@ -160,15 +274,17 @@ class Database:
             table: 表名
             id_column: ID 列名
             id_value: ID 值
+            columns: 返回的列（可选，默认返回所有列）
 
         Returns:
             记录字典或 None
         """
-        sql = f"SELECT * FROM {table} WHERE {id_column} = ?"
+        sql = self.statements.select_by_id(table, id_column, tuple(columns) if columns else None)
         results = self.query(sql, (id_value,))
         return results[0] if results else None
 
-    def get_all(self, table: str, where: str = None, params: tuple = None, order_by: str = None, limit: int = None, offset: int = None) -> List[Dict[str, Any]]:
+    def get_all(self, table: str, where: str = None, params: tuple = None, order_by: str = None, limit: int = None, offset: int = None,
+                columns: Sequence[str] = None) -> List[Dict[str, Any]]:
         """
         获取表中所有记录
 
@@ -179,19 +295,19 @@ class Database:
             order_by: 排序字段（如 "id DESC"）
             limit: 返回记录数量限制
             offset: 偏移量
+            columns: 返回的列（可选，默认返回所有列；列表场景应只取需要的列，避免读取大字段）
 
         Returns:
             记录列表
         """
-        sql = f"SELECT * FROM {table}"
-        if where:
-            sql += f" WHERE {where}"
-        if order_by:
-            sql += f" ORDER BY {order_by}"
+        sql = self.statements.select(
+            table, where, order_by, limit is not None, offset is not None, tuple(columns) if columns else None
+        )
+        params = tuple(params or ())
         if limit is not None:
-            sql += f" LIMIT {limit}"
+            params += (int(limit),)
         if offset is not None:
-            sql += f" OFFSET {offset}"
+            params += (int(offset),)
         return self.query(sql, params)
 
     def count(self, table: str, where: str = None, params: tuple = None) -> int:
@@ -206,9 +322,7 @@ class Database:
         Returns:
             记录数
         """
-        sql = f"SELECT COUNT(*) as count FROM {table}"
-        if where:
-            sql += f" WHERE {where}"
+        sql = self.statements.count(table, where)
         result = self.query(sql, params)
         return result[0]["count"] if result else 0
 
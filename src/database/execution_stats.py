@@ -0,0 +1,165 @@
+"""
+任务执行统计
+
+按任务维护执行统计汇总表 tbl_task_execution_stats（执行次数、各状态数量、总耗时、最后一次执行），
+查询统计时只读取一行，不随执行历史增长而变慢：
+- 执行记录的写入（开始 / 结束）与汇总表的更新在同一个事务中完成
+- 汇总表由数据库迁移创建，创建时根据已有执行记录重建（按 task_id、status 分组聚合）
+- 批量导入执行记录后（如 migrate_task_logs.py）需要调用 rebuild() 重新计算
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from src.database.db import Database, db
+
+# 按任务、状态分组聚合执行记录
+AGGREGATE_BY_STATUS_SQL = """
+SELECT task_id, status, COUNT(*) AS count,
+       COUNT(execution_duration) AS completed, COALESCE(SUM(execution_duration), 0) AS duration
+FROM tbl_task_execution
+{where}
+GROUP BY task_id, status
+"""
+
+# 每个任务最后一次执行（按开始时间）
+LAST_EXECUTION_SQL = """
+SELECT task_id, execution_id, start_time
+FROM (
+    SELECT task_id, execution_id, start_time,
+           ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY start_time DESC, execution_id DESC) AS rn
+    FROM tbl_task_execution
+    {where}
+)
+WHERE rn = 1
+"""
+
+# 开始执行：执行次数、运行中数量加一，并更新最后一次执行
+RECORD_START_SQL = """
+INSERT INTO tbl_task_execution_stats
+    (task_id, total_count, running_count, last_execution_id, last_start_time, updated_at)
+VALUES (?, 1, 1, ?, ?, ?)
+ON CONFLICT(task_id) DO UPDATE SET
+    total_count = total_count + 1,
+    running_count = running_count + 1,
+    last_execution_id = CASE
+        WHEN last_start_time IS NULL OR excluded.last_start_time >= last_start_time
+        THEN excluded.last_execution_id ELSE last_execution_id END,
+    last_start_time = MAX(COALESCE(last_start_time, ''), excluded.last_start_time),
+    updated_at = excluded.updated_at
+"""
+
+# 执行结束：运行中数量减一，成功 / 失败数量加一，累计耗时
+RECORD_FINISH_SQL = """
+UPDATE tbl_task_execution_stats SET
+    running_count = MAX(running_count - 1, 0),
+    success_count = success_count + (? = 1),
+    failure_count = failure_count + (? = 2),
+    completed_count = completed_count + (? IS NOT NULL),
+    total_duration = total_duration + COALESCE(?, 0),
+    updated_at = ?
+WHERE task_id = ?
+"""
+
+STATS_COLUMNS = (
+    "task_id", "total_count", "running_count", "success_count", "failure_count",
+    "completed_count", "total_duration", "last_execution_id", "last_start_time", "updated_at",
+)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ExecutionStats:
+    """任务执行统计汇总"""
+
+    def __init__(self, database: Database):
+        """
+        初始化执行统计
+
+        Args:
+            database: 数据库实例
+        """
+        self.db = database
+
+    def _rebuild(self, task_id: Optional[int] = None) -> int:
+        where, params = ("WHERE task_id = ?", (task_id,)) if task_id is not None else ("", ())
+        now = _now()
+        stats: Dict[int, Dict[str, Any]] = {}
+        for row in self.db.query(AGGREGATE_BY_STATUS_SQL.format(where=where), params):
+            item = stats.setdefault(row["task_id"], {
+                "task_id": row["task_id"], "total_count": 0, "running_count": 0, "success_count": 0,
+                "failure_count": 0, "completed_count": 0, "total_duration": 0,
+                "last_execution_id": None, "last_start_time": None, "updated_at": now,
+            })
+            item["total_count"] += row["count"]
+            item["completed_count"] += row["completed"]
+            item["total_duration"] += row["duration"]
+            status_key = {0: "running_count", 1: "success_count", 2: "failure_count"}.get(row["status"])
+            if status_key:
+                item[status_key] += row["count"]
+        for row in self.db.query(LAST_EXECUTION_SQL.format(where=where), params):
+            stats[row["task_id"]]["last_execution_id"] = row["execution_id"]
+            stats[row["task_id"]]["last_start_time"] = row["start_time"]
+
+        if task_id is not None:
+            self.db.execute("DELETE FROM tbl_task_execution_stats WHERE task_id = ?", (task_id,))
+        else:
+            self.db.execute("DELETE FROM tbl_task_execution_stats")
+        if stats:
+            self.db.insert_many("tbl_task_execution_stats", list(stats.values()))
+        return len(stats)
+
+    def rebuild(self, task_id: Optional[int] = None) -> int:
+        """
+        根据执行记录重新计算汇总（不指定任务时全部重建）
+
+        Returns:
+            重建的任务数
+        """
+        with self.db.transaction():
+            return self._rebuild(task_id)
+
+    def insert_execution(self, data: Dict[str, Any]) -> int:
+        """
+        插入执行记录（开始执行）并更新汇总
+
+        Returns:
+            执行记录ID
+        """
+        with self.db.transaction():
+            execution_id = self.db.insert("tbl_task_execution", data)
+            self.db.execute(RECORD_START_SQL, (data["task_id"], execution_id, data["start_time"], _now()))
+        return execution_id
+
+    def finish_execution(self, execution_id: int, task_id: int, data: Dict[str, Any]) -> int:
+        """
+        更新执行记录（执行结束）并更新汇总
+
+        只有仍处于运行中（status = 0）的记录会被更新，重复调用不会重复计数
+
+        Args:
+            execution_id: 执行记录ID
+            task_id: 任务ID
+            data: 更新的字段（需包含 status，可包含 execution_duration）
+
+        Returns:
+            更新的记录数
+        """
+        duration = data.get("execution_duration")
+        with self.db.transaction():
+            rows = self.db.update("tbl_task_execution", data, "execution_id = ? AND status = 0", (execution_id,))
+            if rows:
+                self.db.execute(
+                    RECORD_FINISH_SQL,
+                    (data["status"], data["status"], duration, duration, _now(), task_id)
+                )
+        return rows
+
+    def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+        """读取任务的执行统计（没有执行记录时返回 None）"""
+        return self.db.get_by_id("tbl_task_execution_stats", "task_id", task_id, columns=STATS_COLUMNS)
+
+
+# 全局执行统计实例
+execution_stats = ExecutionStats(db)
@@ -1,43 +1,27 @@
 """
 创建智能体定时任务表
+
+表结构由数据库迁移（migrations.py）维护，应用启动时会自动执行，本脚本用于手动初始化并查看表结构
 """
-import sqlite3
+import sys
 from pathlib import Path
-from datetime import datetime
-
-db_path = Path(__file__).parent / "Mideas.db"
-
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# 创建智能体定时任务表
-create_table_sql = """
-CREATE TABLE IF NOT EXISTS tbl_agent_schedule_task (
-    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    task_name TEXT NOT NULL,
-    task_info TEXT,
-    task_conf TEXT NOT NULL,
-    task_prompt TEXT,
-    task_status INTEGER DEFAULT 1,
-    insert_time TEXT NOT NULL,
-    update_time TEXT NOT NULL
-);
-"""
 
-cursor.execute(create_table_sql)
-conn.commit()
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.database import db  # noqa: E402
+from src.database.migrations import migrate, current_version  # noqa: E402
+
+migrate()
 
-print("表 tbl_agent_schedule_task 创建成功！")
+print(f"表 tbl_agent_schedule_task 创建成功！（数据库版本 v{current_version()}）")
 
 # 显示表结构
-cursor.execute("PRAGMA table_info(tbl_agent_schedule_task);")
-columns = cursor.fetchall()
+columns = db.query("PRAGMA table_info(tbl_agent_schedule_task);")
 
 print("\n表结构：")
 print(f"{'序号':<6} {'字段名':<20} {'类型':<15} {'非空':<6} {'默认值':<10} {'主键':<6}")
 print("-" * 70)
 for col in columns:
-    cid, name, type_, notnull, default, pk = col
-    print(f"{cid:<6} {name:<20} {type_:<15} {notnull:<6} {str(default):<10} {pk:<6}")
+    print(f"{col['cid']:<6} {col['name']:<20} {col['type']:<15} {col['notnull']:<6} {str(col['dflt_value']):<10} {col['pk']:<6}")
 
-conn.close()
+db.close_connection()
@@ -2,72 +2,41 @@
 创建任务执行记录表
 
 替代原有的 tbl_agent_task_log 表，提供更完善的任务执行记录功能
+
+表结构由数据库迁移（migrations.py）维护，应用启动时会自动执行，本脚本用于手动初始化并查看表结构
 """
-import sqlite3
 import sys
 import io
 from pathlib import Path
-from datetime import datetime
 
 # 设置控制台编码为 UTF-8
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-db_path = Path(__file__).parent / "Mideas.db"
-
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# 创建任务执行记录表
-create_table_sql = """
-CREATE TABLE IF NOT EXISTS tbl_task_execution (
-    execution_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    task_id INTEGER NOT NULL,
-    task_name TEXT NOT NULL,
-    task_prompt TEXT,
-    status INTEGER DEFAULT 0,
-    start_time TEXT NOT NULL,
-    end_time TEXT,
-    execution_duration INTEGER,
-    result_summary TEXT,
-    result_detail TEXT,
-    error_message TEXT,
-    error_detail TEXT,
-    created_at TEXT NOT NULL,
-    updated_at TEXT NOT NULL,
-    FOREIGN KEY (task_id) REFERENCES tbl_agent_schedule_task(task_id)
-);
-"""
-
-cursor.execute(create_table_sql)
-conn.commit()
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-print("✓ 表 tbl_task_execution 创建成功！")
+from src.database import db  # noqa: E402
+from src.database.migrations import migrate, current_version  # noqa: E402
 
-# 创建索引以提高查询性能
-indexes = [
-    "CREATE INDEX IF NOT EXISTS idx_task_id ON tbl_task_execution(task_id);",
-    "CREATE INDEX IF NOT EXISTS idx_status ON tbl_task_execution(status);",
-    "CREATE INDEX IF NOT EXISTS idx_start_time ON tbl_task_execution(start_time DESC);",
-]
+# 创建任务执行记录表及索引（执行数据库迁移）
+migrate()
 
-for index_sql in indexes:
-    cursor.execute(index_sql)
+print(f"✓ 表 tbl_task_execution 创建成功！（数据库版本 v{current_version()}）")
 
-conn.commit()
-print("✓ 索引创建成功！")
+indexes = db.query(
+    "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='tbl_task_execution' AND sql IS NOT NULL"
+)
+print(f"✓ 索引：{', '.join(index['name'] for index in indexes)}")
 
 # 显示表结构
-cursor.execute("PRAGMA table_info(tbl_task_execution);")
-columns = cursor.fetchall()
+columns = db.query("PRAGMA table_info(tbl_task_execution);")
 
 print("\n表结构：")
 print(f"{'序号':<6} {'字段名':<20} {'类型':<15} {'非空':<6} {'默认值':<10} {'主键':<6}")
 print("-" * 80)
 for col in columns:
-    cid, name, type_, notnull, default, pk = col
-    print(f"{cid:<6} {name:<20} {type_:<15} {notnull:<6} {str(default):<10} {pk:<6}")
+    print(f"{col['cid']:<6} {col['name']:<20} {col['type']:<15} {col['notnull']:<6} {str(col['dflt_value']):<10} {col['pk']:<6}")
 
 # 显示字段说明
 print("\n字段说明：")
@@ -82,27 +51,27 @@ field_descriptions = [
     ("end_time", "结束时间"),
     ("execution_duration", "执行时长（秒）"),
     ("result_summary", "结果摘要（成功时，前500字符）"),
-    ("result_detail", "完整结果（可选，存储完整报告）"),
+    ("result_detail", "完整结果（旧数据，新报告保存在 tbl_report_blob）"),
     ("error_message", "错误信息（失败时）"),
     ("error_detail", "错误详情（失败时，堆栈信息等）"),
     ("created_at", "创建时间"),
     ("updated_at", "更新时间"),
+    ("report_hash", "报告哈希（关联 tbl_report_blob）"),
 ]
 
 for field, desc in field_descriptions:
     print(f"{field:<20} - {desc}")
 
 # 检查是否存在旧表
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tbl_agent_task_log';")
-old_table = cursor.fetchone()
+old_table = db.query("SELECT name FROM sqlite_master WHERE type='table' AND name='tbl_agent_task_log';")
 
 if old_table:
     print("\n" + "=" * 80)
     print("⚠ 检测到旧表 tbl_agent_task_log")
     print("建议：")
-    print("1. 如需迁移数据，请手动执行数据迁移脚本")
+    print("1. 如需迁移数据，请执行：python src/database/migrate_task_logs.py")
     print("2. 确认数据迁移完成后，可删除旧表：DROP TABLE tbl_agent_task_log;")
     print("=" * 80)
 
-conn.close()
+db.close_connection()
 print("\n✓ 初始化完成！")
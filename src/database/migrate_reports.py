@@ -0,0 +1,91 @@
+"""
+迁移执行记录中的明文报告
+
+将 tbl_task_execution.result_detail 中的报告转存到压缩报告表 tbl_report_blob：
+- 按 execution_id 分批读取，每批报告写入报告表后，通过 update_many 在一个事务中
+  写入 report_hash 并清空 result_detail
+- 只处理 result_detail 不为空且没有 report_hash 的记录，可重复执行
+- 迁移后数据库文件不会自动变小，可使用 --vacuum 回收空间（需要独占数据库，建议停服执行）
+
+用法：
+    python src/database/migrate_reports.py             # 迁移
+    python src/database/migrate_reports.py --dry-run   # 只统计待迁移记录数
+    python src/database/migrate_reports.py --vacuum    # 迁移完成后执行 VACUUM
+"""
+import argparse
+import io
+import sys
+from pathlib import Path
+
+# 设置控制台编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.database import db, report_store  # noqa: E402
+from src.database.migrations import migrate  # noqa: E402
+
+# 尚未迁移的明文报告（按 execution_id 分批读取）
+PENDING_REPORTS_SQL = """
+SELECT execution_id, result_detail
+FROM tbl_task_execution
+WHERE execution_id > ? AND result_detail IS NOT NULL AND report_hash IS NULL
+ORDER BY execution_id ASC
+LIMIT ?
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移 tbl_task_execution.result_detail 到压缩报告表")
+    parser.add_argument("--batch-size", type=int, default=100, help="每个事务迁移的记录数（报告较大，默认 100）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移的记录数")
+    parser.add_argument("--vacuum", action="store_true", help="迁移完成后执行 VACUUM 回收空间")
+    args = parser.parse_args()
+
+    migrate()
+
+    migrated = 0
+    size = 0
+    last_execution_id = 0
+    while True:
+        executions = db.query(PENDING_REPORTS_SQL, (last_execution_id, args.batch_size))
+        if not executions:
+            break
+        last_execution_id = executions[-1]["execution_id"]
+        size += sum(len(execution["result_detail"].encode("utf-8")) for execution in executions)
+        if not args.dry_run:
+            with db.transaction():
+                rows = [
+                    {
+                        "execution_id": execution["execution_id"],
+                        "report_hash": report_store.put(execution["result_detail"]),
+                        "result_detail": None,
+                    }
+                    for execution in executions
+                ]
+                db.update_many("tbl_task_execution", rows, key_column="execution_id")
+        migrated += len(executions)
+        print(f"  {'待迁移' if args.dry_run else '已迁移'} {migrated} 条（execution_id <= {last_execution_id}）")
+
+    if args.dry_run:
+        print(f"\n✓ 共 {migrated} 条报告待迁移，明文大小 {size / 1024 / 1024:.2f} MB")
+        return
+
+    stats = report_store.stats()
+    print(f"\n✓ 迁移完成：{migrated} 条报告（{size / 1024 / 1024:.2f} MB）")
+    print(f"  报告表共 {stats['reports']} 份报告，"
+          f"原始 {stats['size'] / 1024 / 1024:.2f} MB，压缩后 {stats['compressed_size'] / 1024 / 1024:.2f} MB")
+
+    if args.vacuum:
+        print("执行 VACUUM ...")
+        with db.get_connection() as conn:
+            conn.execute("VACUUM")
+        print("✓ VACUUM 完成")
+
+    db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+迁移旧任务日志表
+
+将 tbl_agent_task_log 中的记录迁移到 tbl_task_execution：
+- 按 log_id 分批读取，每批通过 insert_many 在一个事务中写入
+- 已迁移的记录（task_id、task_name、start_time 相同）会被跳过，可重复执行
+- 旧表中仍处于"执行中"的记录已无法完成，迁移为失败状态
+- 任务提示词从 tbl_agent_schedule_task 中补齐（任务已删除时为空）
+- 迁移后重建执行统计汇总表 tbl_task_execution_stats
+
+用法：
+    python src/database/migrate_task_logs.py            # 迁移
+    python src/database/migrate_task_logs.py --dry-run  # 只统计待迁移记录数
+    python src/database/migrate_task_logs.py --drop     # 迁移完成后删除旧表
+"""
+import argparse
+import io
+import sys
+from pathlib import Path
+
+# 设置控制台编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.database import db, execution_stats  # noqa: E402
+from src.database.migrations import migrate  # noqa: E402
+
+LEGACY_TABLE = "tbl_agent_task_log"
+
+# 尚未迁移的旧日志（按 log_id 分批读取）
+PENDING_LOGS_SQL = """
+SELECT l.log_id, l.task_id, l.task_name, l.start_time, l.end_time, l.status,
+       l.result_summary, l.error_message, l.execution_duration, t.task_prompt
+FROM tbl_agent_task_log l
+LEFT JOIN tbl_agent_schedule_task t ON t.task_id = l.task_id
+WHERE l.log_id > ?
+  AND NOT EXISTS (
+      SELECT 1 FROM tbl_task_execution e
+      WHERE e.task_id = l.task_id AND e.task_name = l.task_name AND e.start_time = l.start_time
+  )
+ORDER BY l.log_id ASC
+LIMIT ?
+"""
+
+
+def to_execution(log: dict) -> dict:
+    """将旧日志记录转换为 tbl_task_execution 记录"""
+    status = log["status"]
+    error_message = log["error_message"]
+    if status == 0:
+        status = 2
+        error_message = error_message or "迁移时任务仍处于执行中（服务重启导致中断）"
+    return {
+        "task_id": log["task_id"],
+        "task_name": log["task_name"] or "",
+        "task_prompt": log["task_prompt"],
+        "status": status,
+        "start_time": log["start_time"],
+        "end_time": log["end_time"],
+        "execution_duration": log["execution_duration"],
+        "result_summary": log["result_summary"],
+        "error_message": error_message,
+        "created_at": log["start_time"],
+        "updated_at": log["end_time"] or log["start_time"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移 tbl_agent_task_log 到 tbl_task_execution")
+    parser.add_argument("--batch-size", type=int, default=db.batch_size, help="每个事务迁移的记录数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移的记录数")
+    parser.add_argument("--drop", action="store_true", help="迁移完成后删除旧表")
+    args = parser.parse_args()
+
+    migrate()
+
+    if not db.query("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (LEGACY_TABLE,)):
+        print(f"✓ 未找到旧表 {LEGACY_TABLE}，无需迁移")
+        return
+
+    total = db.count(LEGACY_TABLE)
+    print(f"旧表 {LEGACY_TABLE} 共 {total} 条记录")
+
+    migrated = 0
+    last_log_id = 0
+    while True:
+        logs = db.query(PENDING_LOGS_SQL, (last_log_id, args.batch_size))
+        if not logs:
+            break
+        last_log_id = logs[-1]["log_id"]
+        if not args.dry_run:
+            db.insert_many("tbl_task_execution", [to_execution(log) for log in logs], chunk_size=args.batch_size)
+        migrated += len(logs)
+        print(f"  {'待迁移' if args.dry_run else '已迁移'} {migrated} 条（log_id <= {last_log_id}）")
+
+    if args.dry_run:
+        print(f"\n✓ 共 {migrated} 条记录待迁移，{total - migrated} 条已存在")
+        return
+
+    print(f"\n✓ 迁移完成：新迁移 {migrated} 条，跳过 {total - migrated} 条已存在的记录")
+
+    if migrated:
+        tasks = execution_stats.rebuild()
+        print(f"✓ 已重建 {tasks} 个任务的执行统计")
+
+    if args.drop:
+        db.execute(f"DROP TABLE {LEGACY_TABLE}")
+        print(f"✓ 已删除旧表 {LEGACY_TABLE}")
+
+    db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+数据库结构迁移
+
+按版本号顺序执行结构迁移，当前版本记录在 PRAGMA user_version 中：
+- 应用启动时（lifespan）自动执行，也可以单独运行本脚本
+- 每个迁移在一个事务中执行，并在同一事务中更新 user_version，失败时整体回滚
+- 迁移语句均可重复执行（IF NOT EXISTS / 列存在检查），已有的数据库（user_version = 0）可直接升级
+- 有迁移执行后运行 ANALYZE 更新统计信息，否则运行 PRAGMA optimize（只在统计信息过期时重新分析）
+
+新增表、列或索引时在 MIGRATIONS 末尾追加一个新版本，不要修改已发布的迁移。
+
+用法：
+    python src/database/migrations.py           # 执行迁移
+    python src/database/migrations.py --status  # 查看当前版本和待执行的迁移
+"""
+import argparse
+import io
+import sys
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Sequence, Union
+
+if __name__ == "__main__":
+    # 设置控制台编码为 UTF-8
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.database.db import Database, db  # noqa: E402
+from src.logger import logger  # noqa: E402
+
+
+class Migration(NamedTuple):
+    """结构迁移（steps 为 SQL 语句或接收 Database 的函数）"""
+    version: int
+    description: str
+    steps: Sequence[Union[str, Callable[[Database], None]]]
+
+
+def _add_column(table: str, column: str, definition: str) -> Callable[[Database], None]:
+    """添加列（列已存在时跳过）"""
+    def step(database: Database):
+        columns = {row["name"] for row in database.query(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            database.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+def _rebuild_execution_stats(database: Database):
+    """根据已有执行记录生成执行统计汇总"""
+    from src.database.execution_stats import ExecutionStats
+    ExecutionStats(database).rebuild()
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建定时任务表和任务执行记录表", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_agent_schedule_task (
+            task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_name TEXT NOT NULL,
+            task_info TEXT,
+            task_conf TEXT NOT NULL,
+            task_prompt TEXT,
+            task_status INTEGER DEFAULT 1,
+            insert_time TEXT NOT NULL,
+            update_time TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tbl_task_execution (
+            execution_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            task_name TEXT NOT NULL,
+            task_prompt TEXT,
+            status INTEGER DEFAULT 0,
+            start_time TEXT NOT NULL,
+            end_time TEXT,
+            execution_duration INTEGER,
+            result_summary TEXT,
+            result_detail TEXT,
+            error_message TEXT,
+            error_detail TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tbl_agent_schedule_task(task_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_status ON tbl_task_execution(status)",
+        "CREATE INDEX IF NOT EXISTS idx_start_time ON tbl_task_execution(start_time DESC)",
+    ]),
+    Migration(2, "执行记录列表索引（按任务、状态筛选后按开始时间倒序），替代 idx_task_id", [
+        "CREATE INDEX IF NOT EXISTS idx_task_execution_task_status_time "
+        "ON tbl_task_execution(task_id, status, start_time DESC, execution_id DESC)",
+        # task_id 是上面索引的前缀，单列索引只会增加写入开销
+        "DROP INDEX IF EXISTS idx_task_id",
+    ]),
+    Migration(3, "定时任务状态索引（调度器按 task_status 查询启用的任务）", [
+        "CREATE INDEX IF NOT EXISTS idx_agent_schedule_task_status ON tbl_agent_schedule_task(task_status)",
+    ]),
+    Migration(4, "压缩报告存储", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_report_blob (
+            report_hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            compressed_size INTEGER NOT NULL,
+            content BLOB NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        _add_column("tbl_task_execution", "report_hash", "TEXT"),
+    ]),
+    Migration(5, "报告向量索引分块表", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_report_chunk (
+            vector_row INTEGER PRIMARY KEY,
+            execution_id INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            content TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_report_chunk_execution ON tbl_report_chunk(execution_id)",
+    ]),
+    Migration(6, "任务执行统计汇总表", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_task_execution_stats (
+            task_id INTEGER PRIMARY KEY,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            running_count INTEGER NOT NULL DEFAULT 0,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            failure_count INTEGER NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            total_duration INTEGER NOT NULL DEFAULT 0,
+            last_execution_id INTEGER,
+            last_start_time TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        _rebuild_execution_stats,
+    ]),
+    Migration(7, "定时任务优先级", [
+        _add_column("tbl_agent_schedule_task", "task_priority", "INTEGER NOT NULL DEFAULT 0"),
+    ]),
+    Migration(8, "调度器状态表（每个任务最后触发的时段，重启后去重和补执行）", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_scheduler_state (
+            task_id INTEGER PRIMARY KEY,
+            last_slot_key TEXT NOT NULL,
+            last_fire_time TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+    ]),
+    Migration(9, "没有可索引内容的执行记录（增量索引不再重复扫描）", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_report_index_skip (
+            execution_id INTEGER PRIMARY KEY,
+            created_at TEXT NOT NULL
+        )
+        """,
+    ]),
+    Migration(10, "定时任务表修改计数（触发器维护，调度器据此发现其他进程对任务的修改）", [
+        """
+        CREATE TABLE IF NOT EXISTS tbl_agent_schedule_task_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO tbl_agent_schedule_task_version (id, version) VALUES (1, 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_agent_schedule_task_insert AFTER INSERT ON tbl_agent_schedule_task
+        BEGIN
+            UPDATE tbl_agent_schedule_task_version SET version = version + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_agent_schedule_task_update AFTER UPDATE ON tbl_agent_schedule_task
+        BEGIN
+            UPDATE tbl_agent_schedule_task_version SET version = version + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_agent_schedule_task_delete AFTER DELETE ON tbl_agent_schedule_task
+        BEGIN
+            UPDATE tbl_agent_schedule_task_version SET version = version + 1 WHERE id = 1;
+        END
+        """,
+    ]),
+]
+
+# 当前代码对应的数据库版本
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(database: Database = db) -> int:
+    """数据库当前版本（PRAGMA user_version）"""
+    return database.query("PRAGMA user_version")[0]["user_version"]
+
+
+def pending_migrations(database: Database = db) -> List[Migration]:
+    """待执行的迁移"""
+    version = current_version(database)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def migrate(database: Database = db) -> int:
+    """
+    执行待执行的迁移，并更新查询规划器的统计信息
+
+    Returns:
+        执行的迁移数
+
+    Raises:
+        RuntimeError: 数据库版本高于当前代码（使用旧代码打开了新数据库）
+    """
+    version = current_version(database)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"数据库版本 {version} 高于当前代码支持的版本 {LATEST_VERSION}，请升级代码")
+
+    pending = [migration for migration in MIGRATIONS if migration.version > version]
+    for migration in pending:
+        logger.info(f"执行数据库迁移 v{migration.version}: {migration.description}")
+        with database.transaction():
+            for step in migration.steps:
+                if callable(step):
+                    step(database)
+                else:
+                    database.execute(step)
+            # user_version 不能使用占位符，版本号来自代码中的常量
+            database.execute(f"PRAGMA user_version = {int(migration.version)}")
+        # 表结构可能已变化，清除语句构建器缓存的列信息
+        database.statements.invalidate()
+
+    optimize(database, analyze=bool(pending))
+    if pending:
+        logger.info(f"数据库迁移完成: v{version} -> v{LATEST_VERSION}")
+    else:
+        logger.debug(f"数据库已是最新版本 v{version}")
+    return len(pending)
+
+
+def optimize(database: Database = db, analyze: bool = False):
+    """
+    更新查询规划器的统计信息
+
+    Args:
+        analyze: 是否完整运行 ANALYZE（结构变化后使用），否则运行 PRAGMA optimize
+    """
+    with database.get_connection() as conn:
+        if analyze:
+            conn.execute("ANALYZE")
+        else:
+            conn.execute("PRAGMA optimize")
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库结构迁移")
+    parser.add_argument("--status", action="store_true", help="只查看当前版本和待执行的迁移")
+    args = parser.parse_args()
+
+    version = current_version()
+    print(f"数据库 {db.db_path}")
+    print(f"当前版本 v{version}，最新版本 v{LATEST_VERSION}")
+
+    if args.status:
+        for migration in pending_migrations():
+            print(f"  待执行 v{migration.version}: {migration.description}")
+        return
+
+    applied = migrate()
+    print(f"✓ 执行了 {applied} 个迁移，当前版本 v{current_version()}")
+    db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
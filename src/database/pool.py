@@ -0,0 +1,216 @@
+"""
+SQLite 连接池
+
+- 一个专用写连接：所有写操作串行执行（WAL 模式下同一时刻只允许一个写事务，串行化可避免 database is locked）
+- 最多 max_readers 个只读连接：按需创建，归还后复用，空闲超时后关闭
+- 每个连接创建时统一设置 PRAGMA（synchronous / cache_size / mmap_size / temp_store）
+- 持有写连接的线程内的读操作直接使用写连接，可以读到本事务尚未提交的数据
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.logger import logger
+
+# WAL 文件保留的大小上限（字节）
+_JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+
+class ConnectionPool:
+    """SQLite 连接池（单写多读）"""
+
+    def __init__(self, db_path: str, max_readers: int = 4, idle_seconds: int = 300, timeout: float = 10.0,
+                 cache_size_kb: int = 16384, mmap_size_mb: int = 256, cached_statements: int = 256):
+        """
+        初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            max_readers: 只读连接数上限
+            idle_seconds: 只读连接空闲多久后关闭（0 表示不关闭）
+            timeout: 等待数据库锁 / 可用连接的超时时间（秒）
+            cache_size_kb: 每个连接的页缓存大小（KB）
+            mmap_size_mb: 内存映射读取的大小上限（MB，0 表示不使用）
+            cached_statements: 每个连接缓存的已编译语句数
+        """
+        self.db_path = db_path
+        self.max_readers = max(1, max_readers)
+        self.idle_seconds = max(0, idle_seconds)
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.cached_statements = cached_statements
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_owner: Optional[int] = None  # 持有写连接的线程 ID
+
+        self._readers_cond = threading.Condition()
+        self._idle_readers: List[Tuple[sqlite3.Connection, float]] = []  # (连接, 归还时间)，末尾为最近归还
+        self._readers_open = 0
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "connections_created": 0,
+            "connections_evicted": 0,
+            "reader_acquires": 0,
+            "reader_waits": 0,
+            "reader_wait_ms": 0.0,
+            "writer_acquires": 0,
+            "writer_waits": 0,
+            "writer_wait_ms": 0.0,
+        }
+
+    def _count(self, name: str, value: float = 1):
+        with self._metrics_lock:
+            self._metrics[name] += value
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        """创建连接并设置 PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        if not readonly:
+            # 增量 vacuum 只对新数据库生效（已有数据库需要执行一次 VACUUM 转换），由维护任务定期回收空闲页
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL 模式是数据库文件级别的设置，由写连接设置一次即可
+            conn.execute("PRAGMA journal_mode=WAL")
+            # checkpoint 后将 WAL 文件截断到该大小以内，避免一次大事务后 WAL 文件一直占用磁盘
+            conn.execute(f"PRAGMA journal_size_limit={_JOURNAL_SIZE_LIMIT}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        self._count("connections_created")
+        logger.debug(f"创建数据库{'只读' if readonly else '写'}连接: {self.db_path}")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """获取写连接（同一时刻只有一个线程持有，可重入）"""
+        start = time.perf_counter()
+        if not self._writer_lock.acquire(blocking=False):
+            self._count("writer_waits")
+            if not self._writer_lock.acquire(timeout=self.timeout):
+                raise sqlite3.OperationalError("等待数据库写连接超时")
+            self._count("writer_wait_ms", (time.perf_counter() - start) * 1000)
+        previous_owner = self._writer_owner
+        try:
+            self._count("writer_acquires")
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            self._writer_owner = threading.get_ident()
+            yield self._writer
+        finally:
+            self._writer_owner = previous_owner
+            self._writer_lock.release()
+
+    @contextmanager
+    def reader(self):
+        """获取只读连接（当前线程持有写连接时直接使用写连接）"""
+        if self._writer_owner == threading.get_ident():
+            yield self._writer
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        waited = False
+        with self._readers_cond:
+            self._count("reader_acquires")
+            while True:
+                self._evict_idle(time.monotonic())
+                if self._idle_readers:
+                    conn, _ = self._idle_readers.pop()
+                    break
+                if self._readers_open < self.max_readers:
+                    self._readers_open += 1
+                    conn = None
+                    break
+                if not waited:
+                    waited = True
+                    self._count("reader_waits")
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._readers_cond.wait(remaining):
+                    raise sqlite3.OperationalError("等待数据库只读连接超时")
+            if waited:
+                self._count("reader_wait_ms", (time.perf_counter() - start) * 1000)
+
+        if conn is None:
+            try:
+                conn = self._connect(readonly=True)
+            except Exception:
+                with self._readers_cond:
+                    self._readers_open -= 1
+                    self._readers_cond.notify()
+                raise
+        return conn
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        # 结束可能残留的读事务，避免长时间占用 WAL 快照
+        if conn.in_transaction:
+            conn.rollback()
+        with self._readers_cond:
+            self._idle_readers.append((conn, time.monotonic()))
+            self._readers_cond.notify()
+
+    def _evict_idle(self, now: float):
+        """关闭空闲超时的只读连接（调用方需持有 _readers_cond）"""
+        if self.idle_seconds == 0:
+            return
+        # 最早归还的连接在列表开头
+        while self._idle_readers and now - self._idle_readers[0][1] > self.idle_seconds:
+            conn, _ = self._idle_readers.pop(0)
+            conn.close()
+            self._readers_open -= 1
+            self._count("connections_evicted")
+
+    def evict_idle(self):
+        """关闭所有空闲超时的只读连接"""
+        with self._readers_cond:
+            self._evict_idle(time.monotonic())
+
+    def close(self):
+        """关闭所有空闲连接和写连接（正在使用的只读连接会在归还后继续复用）"""
+        with self._readers_cond:
+            for conn, _ in self._idle_readers:
+                conn.close()
+            self._readers_open -= len(self._idle_readers)
+            closed = len(self._idle_readers)
+            self._idle_readers.clear()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                closed += 1
+        logger.debug(f"关闭 {closed} 个数据库连接")
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池指标"""
+        with self._readers_cond:
+            idle = len(self._idle_readers)
+            open_readers = self._readers_open
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        return {
+            "max_readers": self.max_readers,
+            "readers_open": open_readers,
+            "readers_idle": idle,
+            "readers_in_use": open_readers - idle,
+            "writer_open": self._writer is not None,
+            "writer_busy": self._writer_owner is not None,
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in metrics.items()},
+        }
@@ -0,0 +1,171 @@
+"""
+研究报告存储
+
+完整报告不再以 TEXT 形式保存在 tbl_task_execution.result_detail 中：
+- 报告压缩后保存在 tbl_report_blob（zlib，安装 zstandard 后可选 zstd），按内容的 sha256 去重
+- 执行记录只保存 report_hash 和摘要（result_summary）
+- 读取时按块从数据库读取压缩数据（sqlite3 blobopen，Python 3.11+）并解压，可以流式返回，
+  不需要在内存中保存完整的压缩数据或拼出完整报告
+
+旧数据（result_detail 中的明文报告）仍可正常读取，可使用 migrate_reports.py 迁移
+"""
+import codecs
+import hashlib
+import sqlite3
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from src.config import settings
+from src.database.db import Database, db
+from src.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # zstd 为可选依赖
+    zstandard = None
+
+CODECS = ("zlib", "zstd")
+
+# 每次从数据库读取并解压的压缩数据大小
+_READ_CHUNK_BYTES = 64 * 1024
+
+# 按块读取时定位报告所在的行
+_BLOB_ROW_SQL = "SELECT rowid FROM tbl_report_blob WHERE report_hash = ?"
+
+
+class ReportStore:
+    """压缩、去重的报告存储"""
+
+    def __init__(self, database: Database, codec: str = "zlib", level: int = 6):
+        """
+        初始化报告存储
+
+        Args:
+            database: 数据库实例
+            codec: 新报告使用的压缩算法（zlib / zstd，未安装 zstandard 时回退到 zlib）
+            level: 压缩级别
+        """
+        if codec not in CODECS:
+            raise ValueError(f"不支持的报告压缩算法: {codec}，可选: {', '.join(CODECS)}")
+        if codec == "zstd" and zstandard is None:
+            logger.warning("未安装 zstandard，报告压缩回退到 zlib（pip install zstandard）")
+            codec = "zlib"
+        self.db = database
+        self.codec = codec
+        self.level = level
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    def put(self, report: str) -> str:
+        """
+        保存报告（内容相同的报告只保存一份）
+
+        Returns:
+            报告哈希（写入执行记录的 report_hash）
+        """
+        data = report.encode("utf-8")
+        report_hash = hashlib.sha256(data).hexdigest()
+        if self.db.query("SELECT 1 FROM tbl_report_blob WHERE report_hash = ?", (report_hash,)):
+            return report_hash
+
+        content = self._compress(data)
+        self.db.execute(
+            "INSERT OR IGNORE INTO tbl_report_blob (report_hash, codec, size, compressed_size, content, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (report_hash, self.codec, len(data), len(content), content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        return report_hash
+
+    def _read_slice(self, report_hash: str, offset: int) -> bytes:
+        """
+        读取压缩数据中从 offset 开始的一块
+
+        每块单独获取只读连接，流式响应较慢时不会长时间占用连接池；每次按哈希重新定位行，
+        报告在读取期间被删除时抛出 KeyError
+
+        Raises:
+            KeyError: 报告不存在
+        """
+        with self.db.get_read_connection() as conn:
+            row = conn.execute(_BLOB_ROW_SQL, (report_hash,)).fetchone()
+            if row is not None:
+                with conn.blobopen("tbl_report_blob", "content", row[0], readonly=True) as blob:
+                    blob.seek(offset)
+                    return blob.read(_READ_CHUNK_BYTES)
+        raise KeyError(f"报告不存在: {report_hash}")
+
+    def _iter_compressed(self, report_hash: str, compressed_size: int) -> Iterator[bytes]:
+        """按块读取压缩数据（不支持 blobopen 的 Python 版本一次读出）"""
+        if not hasattr(sqlite3.Connection, "blobopen"):
+            content = self.db.query("SELECT content FROM tbl_report_blob WHERE report_hash = ?", (report_hash,))
+            if not content:
+                raise KeyError(f"报告不存在: {report_hash}")
+            data = memoryview(content[0]["content"])
+            for start in range(0, len(data), _READ_CHUNK_BYTES):
+                yield data[start:start + _READ_CHUNK_BYTES]
+            return
+        for offset in range(0, compressed_size, _READ_CHUNK_BYTES):
+            yield self._read_slice(report_hash, offset)
+
+    def iter_text(self, report_hash: str) -> Iterator[str]:
+        """
+        按块读取并解压报告（生成器，第一次迭代时查询）
+
+        Raises:
+            KeyError: 报告不存在
+        """
+        rows = self.db.query("SELECT codec, compressed_size FROM tbl_report_blob WHERE report_hash = ?", (report_hash,))
+        if not rows:
+            raise KeyError(f"报告不存在: {report_hash}")
+        codec, compressed_size = rows[0]["codec"], rows[0]["compressed_size"]
+
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("报告使用 zstd 压缩，需要安装 zstandard")
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            decompressor = zlib.decompressobj()
+
+        # 增量 UTF-8 解码，避免多字节字符被块边界截断
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for data in self._iter_compressed(report_hash, compressed_size):
+            text = decoder.decode(decompressor.decompress(data))
+            if text:
+                yield text
+        tail = decoder.decode(decompressor.flush(), final=True)
+        if tail:
+            yield tail
+
+    def get(self, report_hash: str) -> str:
+        """读取完整报告"""
+        return "".join(self.iter_text(report_hash))
+
+    def load(self, execution: dict) -> Optional[str]:
+        """读取执行记录的报告（兼容 result_detail 中的明文报告）"""
+        if execution.get("report_hash"):
+            return self.get(execution["report_hash"])
+        return execution.get("result_detail")
+
+    def delete_orphans(self) -> int:
+        """删除没有执行记录引用的报告，返回删除数"""
+        return self.db.execute(
+            "DELETE FROM tbl_report_blob WHERE report_hash NOT IN "
+            "(SELECT report_hash FROM tbl_task_execution WHERE report_hash IS NOT NULL)"
+        )
+
+    def stats(self) -> dict:
+        """存储统计"""
+        row = self.db.query(
+            "SELECT COUNT(*) AS reports, COALESCE(SUM(size), 0) AS size, "
+            "COALESCE(SUM(compressed_size), 0) AS compressed_size FROM tbl_report_blob"
+        )[0]
+        row["codec"] = self.codec
+        return row
+
+
+# 全局报告存储实例
+report_store = ReportStore(db, codec=settings.report_compression, level=settings.report_compression_level)
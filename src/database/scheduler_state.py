@@ -0,0 +1,110 @@
+"""
+调度器状态
+
+持久化调度器的去重状态（tbl_scheduler_state，每个任务一行：最后触发的时段和触发时间），
+服务重启后同一触发时段不会重复执行，并可据此发现停机期间错过的触发：
+- 调度器提交任务后批量写入（同一事务）
+- 启动时读取全部状态，并清理已删除任务的状态
+- 启动时将遗留的运行中（status = 0）执行记录标记为失败（服务只有一个调度器实例时，这些执行已随上次进程退出中断）
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from src.database.db import Database, db
+from src.database.execution_stats import execution_stats
+
+# 记录任务最后触发的时段
+RECORD_FIRE_SQL = """
+INSERT INTO tbl_scheduler_state (task_id, last_slot_key, last_fire_time, updated_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(task_id) DO UPDATE SET
+    last_slot_key = excluded.last_slot_key,
+    last_fire_time = excluded.last_fire_time,
+    updated_at = excluded.updated_at
+"""
+
+# 已删除任务的状态
+DELETE_REMOVED_SQL = """
+DELETE FROM tbl_scheduler_state
+WHERE task_id NOT IN (SELECT task_id FROM tbl_agent_schedule_task)
+"""
+
+# 遗留的运行中执行记录
+RUNNING_EXECUTIONS_SQL = """
+SELECT execution_id, task_id, task_name, start_time
+FROM tbl_task_execution
+WHERE status = 0
+ORDER BY execution_id ASC
+"""
+
+# 遗留执行记录标记为失败时的错误信息
+ORPHAN_ERROR_MESSAGE = "服务重启，执行被中断"
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class SchedulerState:
+    """调度器持久化状态"""
+
+    def __init__(self, database: Database):
+        """
+        初始化调度器状态
+
+        Args:
+            database: 数据库实例
+        """
+        self.db = database
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """
+        读取所有任务的调度状态（先清理已删除任务的状态）
+
+        Returns:
+            {task_id: {"last_slot_key": 触发时段, "last_fire_time": 触发时间}}
+        """
+        self.db.execute(DELETE_REMOVED_SQL)
+        return {
+            row["task_id"]: row
+            for row in self.db.query("SELECT task_id, last_slot_key, last_fire_time FROM tbl_scheduler_state")
+        }
+
+    def record_fires(self, fires: List[Tuple[int, str, str]]):
+        """
+        记录任务的触发（同一事务）
+
+        Args:
+            fires: [(task_id, 触发时段, 触发时间 YYYY-MM-DD HH:MM:SS)]
+        """
+        if not fires:
+            return
+        now = _now()
+        with self.db.transaction() as conn:
+            conn.executemany(RECORD_FIRE_SQL, [(*fire, now) for fire in fires])
+
+    def fail_orphans(self) -> List[Dict[str, Any]]:
+        """
+        将遗留的运行中执行记录标记为失败（只应在调度器启动、尚未开始执行任务时调用）
+
+        Returns:
+            被标记为失败的执行记录
+        """
+        orphans = self.db.query(RUNNING_EXECUTIONS_SQL)
+        end_time = _now()
+        failed = []
+        for execution in orphans:
+            # 中断的执行没有可靠的耗时，execution_duration 留空，不计入耗时统计
+            rows = execution_stats.finish_execution(execution["execution_id"], execution["task_id"], {
+                "end_time": end_time,
+                "status": 2,
+                "error_message": ORPHAN_ERROR_MESSAGE,
+                "updated_at": end_time
+            })
+            if rows:
+                failed.append(execution)
+        return failed
+
+
+# 全局调度器状态实例
+scheduler_state = SchedulerState(db)
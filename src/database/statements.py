@@ -0,0 +1,242 @@
+"""
+SQL 语句构建与缓存
+
+Database 的通用方法（insert / update / delete / get_by_id / get_all / count）通过这里生成 SQL：
+- 表名、列名在首次使用时通过 PRAGMA table_info 校验，结果按表缓存
+- order_by 只允许 "列名 [ASC|DESC]" 列表，where 只允许列名、? 占位符、字面量、运算符和少量关键字 / 函数
+- 生成的 SQL 按形状（语句类型、表、列集合、条件）缓存，同一形状每次得到相同的 SQL 字符串，
+  sqlite3 连接的语句缓存（cached_statements）可以直接复用已编译的语句
+- LIMIT / OFFSET 使用占位符，分页参数变化不会产生新的 SQL
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 合法标识符
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# WHERE 条件的词法单元：字符串字面量、数字、标识符、占位符、运算符、括号、逗号、点号、空白
+_WHERE_TOKEN_RE = re.compile(
+    r"\s+|'(?:[^']|'')*'|\d+(?:\.\d+)?|[A-Za-z_][A-Za-z0-9_]*|\?|<=|>=|<>|!=|==|[=<>(),.+\-*/%]"
+)
+
+# WHERE 条件中允许的关键字
+_WHERE_KEYWORDS = {
+    "and", "or", "not", "in", "is", "null", "like", "glob", "between", "escape", "collate", "nocase",
+}
+
+# WHERE 条件中允许的函数
+_WHERE_FUNCTIONS = {
+    "date", "datetime", "time", "strftime", "julianday", "lower", "upper", "length", "substr", "trim",
+    "coalesce", "ifnull", "abs", "instr",
+}
+
+# ORDER BY 的单个排序项
+_ORDER_ITEM_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)(?:\s+(ASC|DESC))?\s*$", re.IGNORECASE)
+
+
+class StatementBuilder:
+    """按形状缓存的 SQL 语句构建器"""
+
+    def __init__(self, load_columns: Callable[[str], List[str]], max_statements: int = 512):
+        """
+        初始化构建器
+
+        Args:
+            load_columns: 读取表结构的函数（表名 -> 列名列表，表不存在时返回空列表）
+            max_statements: 缓存的 SQL 形状数量上限
+        """
+        self._load_columns = load_columns
+        self.max_statements = max_statements
+        self._columns: Dict[str, Dict[str, str]] = {}  # 表名 -> {小写列名: 列名}
+        self._statements: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    # ==================== 校验 ====================
+
+    def columns(self, table: str) -> Dict[str, str]:
+        """
+        获取表的列（首次使用时通过 PRAGMA table_info 读取）
+
+        Raises:
+            ValueError: 表名不合法或表不存在
+        """
+        columns = self._columns.get(table)
+        if columns is not None:
+            return columns
+        if not _IDENTIFIER_RE.match(table):
+            raise ValueError(f"非法的表名: {table}")
+        names = self._load_columns(table)
+        if not names:
+            raise ValueError(f"表不存在: {table}")
+        columns = {name.lower(): name for name in names}
+        self._columns[table] = columns
+        return columns
+
+    def _check_columns(self, table: str, names: Sequence[str]):
+        columns = self.columns(table)
+        for name in names:
+            if not isinstance(name, str) or name.lower() not in columns:
+                raise ValueError(f"表 {table} 中不存在列: {name}")
+
+    def _check_order_by(self, table: str, order_by: str):
+        """校验 ORDER BY：逗号分隔的 "列名 [ASC|DESC]" """
+        columns = self.columns(table)
+        for item in order_by.split(","):
+            match = _ORDER_ITEM_RE.match(item)
+            if not match or match.group(1).lower() not in columns:
+                raise ValueError(f"非法的排序字段: {item.strip()}")
+
+    def _check_where(self, table: str, where: str):
+        """校验 WHERE 条件：只允许列名、占位符、字面量、运算符和白名单中的关键字 / 函数"""
+        columns = self.columns(table)
+        position = 0
+        tokens = []
+        while position < len(where):
+            match = _WHERE_TOKEN_RE.match(where, position)
+            if not match:
+                raise ValueError(f"WHERE 条件包含非法字符: {where[position:position + 10]}")
+            tokens.append(match.group())
+            position = match.end()
+
+        # 相邻的 "--" / "/*" 会形成注释
+        for previous, token in zip(tokens, tokens[1:]):
+            if (previous, token) in (("-", "-"), ("/", "*")):
+                raise ValueError("WHERE 条件中不允许包含注释")
+
+        tokens = [token for token in tokens if not token.isspace()]
+        for i, token in enumerate(tokens):
+            if not _IDENTIFIER_RE.match(token):
+                continue
+            name = token.lower()
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+            if name in _WHERE_KEYWORDS or name in columns:
+                continue
+            if name in _WHERE_FUNCTIONS and next_token == "(":
+                continue
+            if name == table.lower() and next_token == ".":
+                continue
+            raise ValueError(f"WHERE 条件中包含未知的列或关键字: {token}")
+
+    # ==================== 缓存 ====================
+
+    def _cached(self, key: tuple, build: Callable[[], str]) -> str:
+        with self._lock:
+            sql = self._statements.get(key)
+            if sql is not None:
+                self._statements.move_to_end(key)
+                self._hits += 1
+                return sql
+            self._misses += 1
+
+        sql = build()
+        with self._lock:
+            self._statements[key] = sql
+            while len(self._statements) > self.max_statements:
+                self._statements.popitem(last=False)
+        return sql
+
+    def invalidate(self, table: str = None):
+        """清除表结构和 SQL 缓存（表结构变化后调用，不指定表时全部清除）"""
+        with self._lock:
+            if table is None:
+                self._columns.clear()
+                self._statements.clear()
+                return
+            self._columns.pop(table, None)
+            for key in [key for key in self._statements if key[1] == table]:
+                del self._statements[key]
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                "tables": len(self._columns),
+                "statements": len(self._statements),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    # ==================== 语句 ====================
+
+    def insert(self, table: str, columns: Tuple[str, ...]) -> str:
+        """INSERT INTO table (columns) VALUES (?, ...)"""
+        def build():
+            self._check_columns(table, columns)
+            placeholders = ", ".join(["?"] * len(columns))
+            return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        return self._cached(("insert", table, columns), build)
+
+    def update(self, table: str, columns: Tuple[str, ...], where: str) -> str:
+        """UPDATE table SET column = ?, ... WHERE where"""
+        def build():
+            self._check_columns(table, columns)
+            self._check_where(table, where)
+            set_clause = ", ".join(f"{column} = ?" for column in columns)
+            return f"UPDATE {table} SET {set_clause} WHERE {where}"
+        return self._cached(("update", table, columns, where), build)
+
+    def delete(self, table: str, where: str) -> str:
+        """DELETE FROM table WHERE where"""
+        def build():
+            self._check_where(table, where)
+            return f"DELETE FROM {table} WHERE {where}"
+        return self._cached(("delete", table, where), build)
+
+    def _projection(self, table: str, columns: Optional[Tuple[str, ...]]) -> str:
+        """SELECT 的列列表（为空时为 *）"""
+        if not columns:
+            return "*"
+        self._check_columns(table, columns)
+        return ", ".join(columns)
+
+    def select(self, table: str, where: Optional[str] = None, order_by: Optional[str] = None,
+               limit: bool = False, offset: bool = False, columns: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        SELECT columns FROM table [WHERE ...] [ORDER BY ...] [LIMIT ? [OFFSET ?]]
+
+        Args:
+            limit: 是否带 LIMIT 占位符
+            offset: 是否带 OFFSET 占位符（没有 LIMIT 时使用 LIMIT -1）
+            columns: 返回的列（为空时返回所有列）
+        """
+        def build():
+            sql = f"SELECT {self._projection(table, columns)} FROM {table}"
+            if where:
+                self._check_where(table, where)
+                sql += f" WHERE {where}"
+            else:
+                self.columns(table)
+            if order_by:
+                self._check_order_by(table, order_by)
+                sql += f" ORDER BY {order_by}"
+            if limit:
+                sql += " LIMIT ?"
+            elif offset:
+                sql += " LIMIT -1"
+            if offset:
+                sql += " OFFSET ?"
+            return sql
+        return self._cached(("select", table, where, order_by, limit, offset, columns), build)
+
+    def select_by_id(self, table: str, id_column: str, columns: Optional[Tuple[str, ...]] = None) -> str:
+        """SELECT columns FROM table WHERE id_column = ?"""
+        def build():
+            self._check_columns(table, (id_column,))
+            return f"SELECT {self._projection(table, columns)} FROM {table} WHERE {id_column} = ?"
+        return self._cached(("select_by_id", table, id_column, columns), build)
+
+    def count(self, table: str, where: Optional[str] = None) -> str:
+        """SELECT COUNT(*) as count FROM table [WHERE ...]"""
+        def build():
+            sql = f"SELECT COUNT(*) as count FROM {table}"
+            if where:
+                self._check_where(table, where)
+                sql += f" WHERE {where}"
+            else:
+                self.columns(table)
+            return sql
+        return self._cached(("count", table, where), build)
@@ -0,0 +1,24 @@
+"""
+Embedding 模块
+
+本地 embedding 模型加载与推理调度
+"""
+from .batcher import get_batcher, stop_batchers, EmbeddingBatcher
+from .cache import embedding_cache, EmbeddingCache
+from .model import get_embedding_model
+from .registry import model_registry, ModelRegistry, ModelReadiness
+from .pool import inference_pool, InferencePool, EmbeddingQueueFull
+from .service import count_tokens, embed_texts
+from .tokenizer import tokenizer_cache, TokenizerCache
+from .warmup import start_idle_unloader, start_preload
+
+__all__ = [
+    "get_batcher", "stop_batchers", "EmbeddingBatcher",
+    "embedding_cache", "EmbeddingCache",
+    "get_embedding_model",
+    "model_registry", "ModelRegistry", "ModelReadiness",
+    "inference_pool", "InferencePool", "EmbeddingQueueFull",
+    "count_tokens", "embed_texts",
+    "tokenizer_cache", "TokenizerCache",
+    "start_idle_unloader", "start_preload",
+]
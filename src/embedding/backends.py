@@ -0,0 +1,211 @@
+"""
+Embedding 推理后端
+
+通过 Settings.embedding_backend 选择，三种后端对外提供相同的 encode / tokenizer 接口：
+- torch：sentence-transformers 默认的 PyTorch fp32 推理
+- onnx：导出为 ONNX 后使用 ONNX Runtime 推理
+- onnx-int8：在 ONNX 基础上做动态 int8 量化（CPU 节点上内存和延迟最低）
+
+非 torch 后端加载后会与 fp32 输出做一致性校验（余弦相似度），校验结果按 ONNX 文件（修改时间和大小）
+缓存在导出目录的 parity.json 中，空闲卸载或 LRU 淘汰后重新加载时不会再加载 fp32 模型
+
+ONNX 后端依赖 sentence-transformers>=3.2 及 optimum[onnxruntime]
+"""
+import gc
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from src.config import settings
+from src.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# 一致性校验使用的文本（覆盖中英文、短查询和较长句子）
+PARITY_TEXTS = [
+    "人工智能在医疗领域的最新进展",
+    "What are the latest developments in renewable energy?",
+    "新能源汽车市场在过去一年的销量变化以及主要厂商的竞争格局分析",
+    "hello",
+]
+
+# 一致性校验结果缓存文件（位于模型导出目录）
+PARITY_CACHE_FILE = "parity.json"
+
+
+@dataclass
+class BackendModel:
+    """按指定后端加载的模型"""
+    model: Any
+    backend: str
+    size_bytes: int
+    parity_min_cosine: Optional[float] = None  # 与 fp32 输出的最小余弦相似度（torch 后端为空）
+
+
+def estimate_model_bytes(model) -> int:
+    """估算 PyTorch 模型占用的内存（参数 + buffer 字节数，无法估算时返回 0）"""
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+        return int(total)
+    except Exception:
+        return 0
+
+
+def _export_dir(path: str) -> Path:
+    """模型导出目录（每个模型一个子目录）"""
+    return Path(settings.embedding_onnx_dir) / path.replace("/", "__").replace("\\", "__")
+
+
+@contextmanager
+def _export_lock(export_dir: Path):
+    """导出文件锁，避免多个工作进程同时导出同一个模型"""
+    export_dir.mkdir(parents=True, exist_ok=True)
+    with open(export_dir / ".export.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_onnx(path: str, quantized: bool):
+    """加载 ONNX 模型（首次使用时导出 / 量化并保存到 embedding_onnx_dir）"""
+    from sentence_transformers import SentenceTransformer
+
+    export_dir = _export_dir(path)
+    onnx_file = Path("onnx") / "model.onnx"
+    if quantized:
+        config = settings.embedding_onnx_quantization
+        onnx_file = Path("onnx") / f"model_qint8_{config}.onnx"
+
+    with _export_lock(export_dir):
+        if not (export_dir / "onnx" / "model.onnx").exists():
+            logger.info(f"导出 ONNX 模型: {path} -> {export_dir}")
+            SentenceTransformer(path, backend="onnx").save(str(export_dir))
+
+        if quantized and not (export_dir / onnx_file).exists():
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            logger.info(f"动态 int8 量化 ONNX 模型: {path}（配置: {config}）")
+            model = SentenceTransformer(str(export_dir), backend="onnx")
+            export_dynamic_quantized_onnx_model(model, config, str(export_dir))
+
+    model = SentenceTransformer(
+        str(export_dir),
+        backend="onnx",
+        model_kwargs={"file_name": str(onnx_file)}
+    )
+    return model, export_dir / onnx_file
+
+
+def _artifact_key(onnx_path: Path) -> Dict[str, int]:
+    """ONNX 文件的缓存键（修改时间和大小，重新导出或量化后失效）"""
+    stat = onnx_path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _read_parity_cache(export_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(export_dir / PARITY_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_parity_cache(export_dir: Path, cache: Dict[str, Any]):
+    tmp_path = export_dir / f"{PARITY_CACHE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, export_dir / PARITY_CACHE_FILE)
+
+
+def _measure_parity(path: str, model) -> float:
+    """加载 fp32 参考模型，计算校验文本上的最小余弦相似度（参考模型用完立即释放）"""
+    from sentence_transformers import SentenceTransformer
+
+    reference_model = SentenceTransformer(path)
+    try:
+        reference = reference_model.encode(PARITY_TEXTS, convert_to_numpy=True)
+    finally:
+        del reference_model
+        gc.collect()
+    candidate = model.encode(PARITY_TEXTS, convert_to_numpy=True)
+
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return float(np.min(np.sum(reference * candidate, axis=1)))
+
+
+def check_parity(path: str, model, onnx_path: Optional[Path] = None) -> float:
+    """
+    与 fp32 PyTorch 输出做一致性校验
+
+    Args:
+        path: 模型名称或本地路径
+        model: 待校验的模型
+        onnx_path: 模型对应的 ONNX 文件（指定时校验结果按文件缓存，文件未变化时不再加载 fp32 模型）
+
+    Returns:
+        校验文本上的最小余弦相似度
+
+    Raises:
+        RuntimeError: 相似度低于 embedding_parity_min_cosine
+    """
+    if onnx_path is None:
+        min_cosine = _measure_parity(path, model)
+    else:
+        export_dir = onnx_path.parent.parent
+        with _export_lock(export_dir):
+            cache = _read_parity_cache(export_dir)
+            name = onnx_path.name
+            key = _artifact_key(onnx_path)
+            cached = cache.get(name)
+            if cached and cached.get("mtime_ns") == key["mtime_ns"] and cached.get("size") == key["size"]:
+                min_cosine = float(cached["min_cosine"])
+            else:
+                min_cosine = _measure_parity(path, model)
+                cache[name] = {**key, "min_cosine": min_cosine}
+                _write_parity_cache(export_dir, cache)
+
+    if min_cosine < settings.embedding_parity_min_cosine:
+        raise RuntimeError(
+            f"Embedding 后端一致性校验失败: {path}，最小余弦相似度 {min_cosine:.4f} "
+            f"低于阈值 {settings.embedding_parity_min_cosine}"
+        )
+    logger.info(f"Embedding 后端一致性校验通过: {path}，最小余弦相似度 {min_cosine:.4f}")
+    return min_cosine
+
+
+def load_model(path: str, backend: str = None) -> BackendModel:
+    """
+    按指定后端加载 sentence-transformers 模型
+
+    Args:
+        path: 模型名称或本地路径
+        backend: torch / onnx / onnx-int8（为空时使用 Settings.embedding_backend）
+    """
+    backend = backend or settings.embedding_backend
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的 embedding 后端: {backend}，可选: {', '.join(BACKENDS)}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        model = SentenceTransformer(path)
+        return BackendModel(model, backend, estimate_model_bytes(model))
+
+    model, onnx_path = _load_onnx(path, quantized=backend == "onnx-int8")
+    parity = check_parity(path, model, onnx_path) if settings.embedding_parity_check else None
+    return BackendModel(model, backend, os.path.getsize(onnx_path), parity)
@@ -0,0 +1,232 @@
+"""
+Embedding 动态批处理
+
+将并发请求合并为一次 encode 调用：
+- 单批最多 max_batch_size 条文本
+- 首个请求到达后最多等待 max_wait_ms 毫秒收集更多请求
+- encode 结果按请求切分后分别返回给调用方
+- encode 在推理工作池中执行，同时进行的批次数不超过工作池大小
+- 排队请求数超过上限时直接拒绝（EmbeddingQueueFull），由接口返回 503
+"""
+import asyncio
+import functools
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from src.config import settings
+from src.embedding.model import encode_texts
+from src.embedding.pool import EmbeddingQueueFull, InferencePool, inference_pool
+from src.logger import logger
+
+
+@dataclass
+class _PendingRequest:
+    """等待批处理的单个请求"""
+    texts: List[str]
+    future: asyncio.Future = field(repr=False)
+    lengths: Optional[List[int]] = None  # 每条文本的 token 数（用于按长度分桶）
+
+
+class EmbeddingBatcher:
+    """Embedding 动态批处理器"""
+
+    def __init__(self, encode_fn: Callable[[List[str], Optional[List[int]]], np.ndarray], pool: InferencePool,
+                 max_batch_size: int = 64, max_wait_ms: float = 5, max_queue_size: int = 256):
+        """
+        初始化批处理器
+
+        Args:
+            encode_fn: 实际执行 encode 的函数（参数为文本列表和 token 数列表，返回 numpy 矩阵，需为模块级函数）
+            pool: 执行 encode 的推理工作池
+            max_batch_size: 单批最大文本数
+            max_wait_ms: 收集批次的最长等待时间（毫秒）
+            max_queue_size: 最大排队请求数（超过后拒绝新请求）
+        """
+        self.encode_fn = encode_fn
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue_size = max(1, max_queue_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None  # 可同时执行的批次数
+        self._running: Set[asyncio.Task] = set()  # 正在执行的批次
+        self._carry: Optional[_PendingRequest] = None  # 超出上一批容量、留到下一批的请求
+        self._collecting: List[_PendingRequest] = []  # 正在收集中的批次
+
+    def _ensure_started(self):
+        """在当前事件循环中启动批处理协程（首次提交时）"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._slots = asyncio.Semaphore(self.pool.workers)
+            self._carry = None
+            self._worker = asyncio.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队中的请求数"""
+        if self._queue is None:
+            return 0
+        return self._queue.qsize() + (1 if self._carry is not None else 0)
+
+    async def submit(self, texts: List[str], lengths: Optional[List[int]] = None) -> np.ndarray:
+        """
+        提交文本并等待 embedding 结果
+
+        Args:
+            texts: 文本列表
+            lengths: 每条文本的 token 数（可选，已知时 encode 端不再重复分词）
+
+        Returns:
+            与 texts 一一对应的 embedding 矩阵
+
+        Raises:
+            EmbeddingQueueFull: 排队请求数已达上限
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingRequest(texts, future, lengths))
+        except asyncio.QueueFull:
+            raise EmbeddingQueueFull(self.queue_depth)
+        return await future
+
+    async def _next_request(self, timeout: float = None) -> Optional[_PendingRequest]:
+        """取下一个待处理请求，超时返回 None"""
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        if timeout is None:
+            return await self._queue.get()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _collect_batch(self) -> List[_PendingRequest]:
+        """收集一批请求（达到批次上限或等待超时即返回）"""
+        loop = asyncio.get_running_loop()
+        first = await self._next_request()
+        batch = self._collecting = [first]
+        size = len(first.texts)
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            request = await self._next_request(remaining)
+            if request is None:
+                break
+            if size + len(request.texts) > self.max_batch_size:
+                # 放不下的请求留给下一批，避免超出批次上限
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    async def _process_batch(self, batch: List[_PendingRequest]):
+        """在工作池中执行一次 encode 并把结果切分给各个请求"""
+        # 跳过已取消的请求（如客户端断开）
+        batch = [r for r in batch if not r.future.done()]
+        if not batch:
+            return
+
+        texts = [text for r in batch for text in r.texts]
+        # 所有请求都带有 token 数时一并传给 encode，避免重复分词
+        lengths = None
+        if all(r.lengths is not None for r in batch):
+            lengths = [n for r in batch for n in r.lengths]
+        try:
+            embeddings = await self.pool.run(self.encode_fn, texts, lengths)
+        except asyncio.CancelledError:
+            for r in batch:
+                r.future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"批量生成 embedding 失败: {e}")
+            for r in batch:
+                if not r.future.done():
+                    r.future.set_exception(e)
+            return
+
+        logger.debug(f"批量生成 embedding，请求数: {len(batch)}, 文本数: {len(texts)}")
+
+        offset = 0
+        for r in batch:
+            count = len(r.texts)
+            if not r.future.done():
+                r.future.set_result(embeddings[offset:offset + count])
+            offset += count
+
+    async def _run(self):
+        """批处理主循环"""
+        while True:
+            # 先占用执行槽位再收集批次：工作池繁忙时请求在队列中累积成更大的批次
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._collecting = []
+            task = asyncio.create_task(self._process_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task):
+        """批次执行完成，释放执行槽位"""
+        self._running.discard(task)
+        self._slots.release()
+
+    async def stop(self):
+        """停止批处理协程，未完成的请求全部取消"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        for task in list(self._running):
+            task.cancel()
+        pending = list(self._collecting)
+        if self._carry:
+            pending.append(self._carry)
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for r in pending:
+            if not r.future.done():
+                r.future.cancel()
+        self._carry = None
+        self._collecting = []
+
+
+# 每个模型一个批处理器（不同模型的请求不能合并为一批）
+_batchers: Dict[str, EmbeddingBatcher] = {}
+
+
+def get_batcher(model_name: str) -> EmbeddingBatcher:
+    """获取指定模型（注册表别名）的批处理器"""
+    batcher = _batchers.get(model_name)
+    if batcher is None:
+        batcher = _batchers[model_name] = EmbeddingBatcher(
+            functools.partial(encode_texts, model_name),
+            inference_pool,
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+            max_queue_size=settings.embedding_queue_size
+        )
+    return batcher
+
+
+async def stop_batchers():
+    """停止所有批处理器"""
+    for batcher in _batchers.values():
+        await batcher.stop()
@@ -0,0 +1,226 @@
+"""
+Embedding 缓存
+
+以 (模型名称, 规范化文本) 的哈希作为键缓存 embedding 结果：
+- 内存层：按字节数限制容量的 LRU
+- 磁盘层（可选）：SQLite 文件，服务重启后仍然有效
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import settings
+from src.logger import logger
+
+# 每个缓存条目除向量外的额外内存开销估算（键字符串、字典节点等）
+_ENTRY_OVERHEAD_BYTES = 160
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本（Unicode NFC、合并空白字符、去除首尾空白）"""
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_cache_key(model_name: str, text: str) -> str:
+    """生成缓存键：sha256(模型名称 + 规范化文本)"""
+    raw = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding 两级缓存（内存 LRU + 可选 SQLite 磁盘层）"""
+
+    def __init__(self, max_bytes: int, disk_path: str = None):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 内存层最大字节数（0 表示不使用内存层）
+            disk_path: 磁盘层 SQLite 文件路径（为空则不启用磁盘层）
+        """
+        self.max_bytes = max(0, max_bytes)
+        self.disk_path = disk_path or None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用缓存（内存层或磁盘层至少一个可用）"""
+        return self.max_bytes > 0 or self.disk_enabled
+
+    @property
+    def disk_enabled(self) -> bool:
+        """是否启用磁盘层"""
+        return self.disk_path is not None
+
+    def _get_disk(self) -> sqlite3.Connection:
+        """获取磁盘层连接（延迟创建）"""
+        if self._disk is None:
+            Path(self.disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=10.0)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            self._disk.commit()
+            logger.info(f"Embedding 磁盘缓存已启用: {self.disk_path}")
+        return self._disk
+
+    def _memory_put(self, key: str, vector: np.ndarray):
+        """写入内存层并按字节数淘汰最久未使用的条目（调用方需持有锁）"""
+        if self.max_bytes == 0:
+            return
+        size = vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old.nbytes + _ENTRY_OVERHEAD_BYTES
+        self._memory[key] = vector
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """从磁盘层批量读取（调用方需持有锁）"""
+        found = {}
+        conn = self._get_disk()
+        # SQLite 单条语句参数数量有限，分块查询
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows = conn.execute(
+                f"SELECT cache_key, vector FROM embedding_cache WHERE cache_key IN ({placeholders})",
+                chunk
+            ).fetchall()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype="<f4")
+                vector.setflags(write=False)
+                found[key] = vector
+        return found
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        批量查询缓存
+
+        Args:
+            model_name: 模型名称
+            texts: 文本列表
+
+        Returns:
+            与 texts 一一对应的 embedding（未命中为 None）
+        """
+        keys = [make_cache_key(model_name, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        with self._lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing and self.disk_enabled:
+                for key, vector in self._disk_get(list(missing)).items():
+                    # 磁盘命中的条目提升到内存层
+                    self._memory_put(key, vector)
+                    for i in missing.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(indexes) for indexes in missing.values())
+
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], embeddings: np.ndarray):
+        """
+        批量写入缓存
+
+        Args:
+            model_name: 模型名称
+            texts: 文本列表
+            embeddings: 与 texts 一一对应的 embedding 矩阵
+        """
+        entries = {}
+        for text, embedding in zip(texts, embeddings):
+            # 复制为独立的只读 float32 向量，避免引用整批结果
+            vector = np.array(embedding, dtype="<f4")
+            vector.setflags(write=False)
+            entries[make_cache_key(model_name, text)] = vector
+
+        with self._lock:
+            for key, vector in entries.items():
+                self._memory_put(key, vector)
+
+            if self.disk_enabled and entries:
+                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                conn = self._get_disk()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (cache_key, dim, vector, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, vector.shape[0], vector.tobytes(), now) for key, vector in entries.items()]
+                )
+                conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """缓存命中统计"""
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / total, 4) if total else 0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.max_bytes,
+                "disk_enabled": self.disk_enabled
+            }
+
+    def clear(self):
+        """清空内存层并重置统计（磁盘层保留）"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+    def close(self):
+        """关闭磁盘层连接"""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+# 全局缓存实例
+embedding_cache = EmbeddingCache(
+    max_bytes=settings.embedding_cache_max_mb * 1024 * 1024 if settings.embedding_cache_enabled else 0,
+    disk_path=settings.embedding_cache_path if settings.embedding_cache_enabled else None
+)
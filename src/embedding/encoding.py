@@ -0,0 +1,45 @@
+"""
+Embedding 响应编码
+
+直接从 numpy 缓冲区生成响应内容，不为每个元素创建 Python 对象：
+- float：整块矩阵一次性 tolist()
+- base64：每行原始小端字节（float32 / float16）做 base64 编码（兼容 OpenAI encoding_format）
+"""
+import base64
+from typing import List, Union
+
+import numpy as np
+
+ENCODING_FORMATS = ("float", "base64")
+
+# 输出精度对应的小端 numpy 类型
+EMBEDDING_DTYPES = {
+    "float32": "<f4",
+    "float16": "<f2",
+}
+
+
+def encode_embeddings(embeddings: np.ndarray, encoding_format: str = "float",
+                      dtype: str = "float32") -> List[Union[List[float], str]]:
+    """
+    将 embedding 矩阵编码为响应中的 embedding 字段列表
+
+    Args:
+        embeddings: embedding 矩阵（行数 = 文本数）
+        encoding_format: float 或 base64
+        dtype: 输出精度（float32 或 float16）
+
+    Returns:
+        与矩阵每一行对应的 embedding（float 列表或 base64 字符串）
+    """
+    if encoding_format not in ENCODING_FORMATS:
+        raise ValueError(f"不支持的 encoding_format: {encoding_format}")
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"不支持的 embedding 精度: {dtype}")
+
+    matrix = np.ascontiguousarray(embeddings, dtype=EMBEDDING_DTYPES[dtype])
+
+    if encoding_format == "base64":
+        return [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+
+    return matrix.tolist()
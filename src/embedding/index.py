@@ -0,0 +1,309 @@
+"""
+本地向量索引
+
+磁盘上的紧凑索引目录：
+- vectors.f32：归一化后的 float32 向量矩阵（按行追加，内存映射读取）
+- ids.i64：每行对应的 (execution_id, task_id)，用于过滤和回查
+- codes.u8：随机超平面签名（每行 n_bits 位），用于近似搜索的候选召回
+- meta.json：维度、行数、模型名称（行数以 meta 为准，未写完 meta 的尾部数据视为无效）
+
+删除的数据通过 compact 重写索引文件回收，只保留仍被引用的行并重新编号；
+压缩中断（存在 compact.json 标记）时索引与外部记录的行号可能不一致，加载后 interrupted 为 True，需要重建
+
+行数不超过 exact_threshold 时使用 numpy 暴力点积，超过后先按签名汉明距离召回候选再精确重排
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.logger import logger
+
+# 近似搜索签名位数
+_CODE_BITS = 256
+# 暴力搜索时每次参与矩阵乘法的行数（限制内存占用）
+_SCAN_BLOCK_ROWS = 65536
+# 每个字节中 1 的个数（汉明距离查表）
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class VectorIndex:
+    """内存映射的向量索引（单写多读）"""
+
+    def __init__(self, index_dir: str, exact_threshold: int = 50000, candidate_factor: int = 20):
+        """
+        初始化索引
+
+        Args:
+            index_dir: 索引目录
+            exact_threshold: 行数不超过该值时使用暴力搜索
+            candidate_factor: 近似搜索时召回 top_k * candidate_factor 个候选再精确重排
+        """
+        self.index_dir = Path(index_dir)
+        self.exact_threshold = exact_threshold
+        self.candidate_factor = max(1, candidate_factor)
+        self._lock = threading.Lock()
+        self.dim = 0
+        self.count = 0
+        self.model = None
+        self.interrupted = False  # 上次压缩中断，需要重建
+        self.generation = 0  # 行号发生变化（压缩、重置）时递增，调用方据此判断行号是否仍然有效
+        self._hyperplanes: Optional[np.ndarray] = None
+        self._load_meta()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.index_dir / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.index_dir / "vectors.f32"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.index_dir / "ids.i64"
+
+    @property
+    def _codes_path(self) -> Path:
+        return self.index_dir / "codes.u8"
+
+    @property
+    def _compact_marker_path(self) -> Path:
+        return self.index_dir / "compact.json"
+
+    def _load_meta(self):
+        """读取 meta.json，并截掉超出记录行数的残留数据"""
+        if self._compact_marker_path.exists():
+            logger.warning(f"向量索引上次压缩未完成，需要重建: {self.index_dir}")
+            self.interrupted = True
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.model = meta.get("model")
+        for path, row_bytes in self._row_files():
+            if path.exists() and path.stat().st_size > self.count * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(self.count * row_bytes)
+                logger.warning(f"向量索引文件存在未提交的数据，已截断: {path}")
+
+    def _write_meta(self):
+        """原子写入 meta.json"""
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"dim": self.dim, "count": self.count, "model": self.model}), encoding="utf-8")
+        os.replace(tmp, self._meta_path)
+
+    def _row_files(self) -> List[Tuple[Path, int]]:
+        """索引数据文件及每行字节数"""
+        return [
+            (self._vectors_path, self.dim * 4),
+            (self._ids_path, 2 * 8),
+            (self._codes_path, _CODE_BITS // 8),
+        ]
+
+    def _get_hyperplanes(self) -> np.ndarray:
+        """随机超平面（按维度固定种子生成，重启后保持一致）"""
+        if self._hyperplanes is None or self._hyperplanes.shape[0] != self.dim:
+            rng = np.random.default_rng(self.dim)
+            self._hyperplanes = rng.standard_normal((self.dim, _CODE_BITS)).astype(np.float32)
+        return self._hyperplanes
+
+    def _encode_codes(self, vectors: np.ndarray) -> np.ndarray:
+        """计算随机超平面签名（每行 _CODE_BITS 位打包为字节）"""
+        return np.packbits(vectors @ self._get_hyperplanes() > 0, axis=1)
+
+    def reset(self, dim: int, model: str):
+        """清空索引（维度或模型变化时重建）"""
+        with self._lock:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            for path, _ in self._row_files():
+                path.unlink(missing_ok=True)
+            self.dim = dim
+            self.count = 0
+            self.model = model
+            self.generation += 1
+            self._write_meta()
+            self._compact_marker_path.unlink(missing_ok=True)
+            self.interrupted = False
+            logger.info(f"向量索引已重置: {self.index_dir}（维度: {dim}, 模型: {model}）")
+
+    def append(self, vectors: np.ndarray, execution_ids: List[int], task_ids: List[int]) -> int:
+        """
+        追加向量
+
+        Args:
+            vectors: 向量矩阵（会归一化后保存）
+            execution_ids: 每行对应的执行记录ID
+            task_ids: 每行对应的任务ID
+
+        Returns:
+            第一行的行号
+        """
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度不匹配: 期望 {self.dim}，实际 {vectors.shape}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        ids = np.ascontiguousarray(np.column_stack([execution_ids, task_ids]), dtype="<i8")
+        codes = self._encode_codes(vectors)
+
+        with self._lock:
+            start = self.count
+            for (path, _), data in zip(self._row_files(), (vectors, ids, codes)):
+                with open(path, "ab") as f:
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            # 最后更新 meta，写入中途失败的数据会在下次加载时截断
+            self.count += len(vectors)
+            self._write_meta()
+        return start
+
+    def compact(self, keep_rows: np.ndarray, commit: Callable[[], None] = None) -> int:
+        """
+        压缩索引：只保留 keep_rows 中的行，按原顺序重新编号为 0..len(keep_rows)-1
+
+        新文件写完后先写入压缩标记，再调用 commit（由调用方更新外部记录的行号），
+        最后替换索引文件、更新 meta 并删除标记；commit 失败时放弃压缩，索引保持不变。
+
+        Args:
+            keep_rows: 保留的行号（升序、不重复）
+            commit: 替换索引文件前调用（如在数据库事务中更新行号）
+
+        Returns:
+            删除的行数
+        """
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+        with self._lock:
+            count = self.count
+            if keep_rows.size and (keep_rows[0] < 0 or keep_rows[-1] >= count or np.any(np.diff(keep_rows) <= 0)):
+                raise ValueError("保留的行号必须升序、不重复且小于索引行数")
+            removed = count - int(keep_rows.size)
+            if removed == 0:
+                return 0
+
+            files = [
+                (path, self._memmap(path, dtype, width))
+                for (path, _), dtype, width in zip(
+                    self._row_files(), ("<f4", "<i8", "u1"), (self.dim, 2, _CODE_BITS // 8)
+                )
+            ]
+            tmp_paths = []
+            try:
+                for path, data in files:
+                    tmp = path.with_suffix(path.suffix + ".compact")
+                    tmp_paths.append(tmp)
+                    with open(tmp, "wb") as f:
+                        for i in range(0, keep_rows.size, _SCAN_BLOCK_ROWS):
+                            f.write(np.ascontiguousarray(data[keep_rows[i:i + _SCAN_BLOCK_ROWS]]).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                del files
+
+                self._compact_marker_path.write_text(
+                    json.dumps({"count": count, "keep": int(keep_rows.size)}), encoding="utf-8"
+                )
+                # 在更新外部行号之前递增，读取外部记录后发现 generation 变化的调用方需要重试
+                self.generation += 1
+                if commit is not None:
+                    try:
+                        commit()
+                    except Exception:
+                        self._compact_marker_path.unlink(missing_ok=True)
+                        raise
+            except Exception:
+                for tmp in tmp_paths:
+                    tmp.unlink(missing_ok=True)
+                raise
+
+            # 已打开的内存映射（进行中的搜索）仍指向旧文件，替换后不受影响
+            for (path, _), tmp in zip(self._row_files(), tmp_paths):
+                os.replace(tmp, path)
+            self.count = int(keep_rows.size)
+            self._write_meta()
+            self._compact_marker_path.unlink(missing_ok=True)
+
+        logger.info(f"向量索引压缩完成: {self.index_dir}，删除 {removed} 行，保留 {self.count} 行")
+        return removed
+
+    def _memmap(self, path: Path, dtype: str, width: int) -> np.ndarray:
+        return np.memmap(path, dtype=dtype, mode="r", shape=(self.count, width))
+
+    def search(self, query: np.ndarray, top_k: int = 10, task_id: int = None) -> List[Tuple[int, float]]:
+        """
+        相似度搜索
+
+        Args:
+            query: 查询向量
+            top_k: 返回数量
+            task_id: 只搜索指定任务的报告（可选）
+
+        Returns:
+            [(行号, 余弦相似度)]，按相似度降序
+        """
+        # 在锁内打开内存映射：压缩替换文件后，已打开的映射仍指向旧文件，行数与之一致
+        with self._lock:
+            count = self.count
+            if count == 0 or top_k <= 0:
+                return []
+            vectors = self._memmap(self._vectors_path, "<f4", self.dim)
+            ids = self._memmap(self._ids_path, "<i8", 2)
+            codes = self._memmap(self._codes_path, "u1", _CODE_BITS // 8)
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        rows = None
+        if task_id is not None:
+            rows = np.flatnonzero(ids[:, 1] == task_id)
+            if rows.size == 0:
+                return []
+
+        size = count if rows is None else rows.size
+        if size > self.exact_threshold:
+            rows = self._candidates(codes, query, rows, top_k * self.candidate_factor)
+
+        if rows is None:
+            scores = np.concatenate([
+                vectors[i:i + _SCAN_BLOCK_ROWS] @ query for i in range(0, count, _SCAN_BLOCK_ROWS)
+            ])
+            rows = np.arange(count)
+        else:
+            scores = vectors[rows] @ query
+
+        k = min(top_k, scores.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def _candidates(self, codes: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray], limit: int) -> np.ndarray:
+        """按签名汉明距离召回候选行（近似搜索）"""
+        query_code = self._encode_codes(query[None, :])[0]
+        if rows is None:
+            rows = np.arange(codes.shape[0])
+        distances = np.concatenate([
+            _POPCOUNT[np.bitwise_xor(codes[rows[i:i + _SCAN_BLOCK_ROWS]], query_code)].sum(axis=1, dtype=np.uint16)
+            for i in range(0, rows.size, _SCAN_BLOCK_ROWS)
+        ])
+        limit = min(limit, rows.size)
+        return rows[np.argpartition(distances, limit - 1)[:limit]]
+
+    def execution_ids(self, rows: List[int]) -> List[int]:
+        """获取行号对应的执行记录ID"""
+        with self._lock:
+            ids = self._memmap(self._ids_path, "<i8", 2)
+        return [int(ids[row, 0]) for row in rows]
+
+    def stats(self) -> Dict[str, object]:
+        """索引统计"""
+        return {
+            "rows": self.count,
+            "dim": self.dim,
+            "model": self.model,
+            "size_bytes": sum(path.stat().st_size for path, _ in self._row_files() if path.exists()),
+            "search_mode": "approximate" if self.count > self.exact_threshold else "exact"
+        }
@@ -0,0 +1,86 @@
+"""
+Embedding 模型调用
+
+通过模型注册表获取 sentence-transformers 模型（延迟加载）。
+这里的函数都是模块级函数，可直接提交到线程池 / 进程池执行。
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.embedding.registry import model_registry
+
+# 预热使用的文本（中英文各一条，覆盖分词器的常用路径）
+WARMUP_TEXTS = ["warm up", "模型预热"]
+
+
+def get_embedding_model(model_name: Optional[str] = None):
+    """获取 embedding 模型（延迟加载，为空时使用默认模型）"""
+    return model_registry.get(model_name)
+
+
+def tokenize_lengths(model_name: str, texts: List[str]) -> Tuple[List[int], int]:
+    """
+    使用模型自带的分词器批量计算 token 数（一次批量分词调用）
+
+    Args:
+        model_name: 模型别名
+        texts: 文本列表
+
+    Returns:
+        (每条文本的 token 数（含特殊 token，未截断）, 模型最大序列长度)
+    """
+    model = get_embedding_model(model_name)
+    encoded = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=False,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )
+    return [len(ids) for ids in encoded["input_ids"]], model.max_seq_length
+
+
+def encode_texts(model_name: str, texts: List[str], lengths: Optional[List[int]] = None):
+    """
+    使用指定模型生成 embedding（返回 numpy 矩阵）
+
+    按 token 长度排序后分桶 encode，每个桶一次前向计算，
+    避免短查询和长文档分块混在一起时大量 padding，结果按输入顺序返回
+
+    Args:
+        model_name: 模型别名
+        texts: 文本列表
+        lengths: 每条文本的 token 数（为空时在此处分词计算）
+    """
+    model = get_embedding_model(model_name)
+    bucket_size = max(1, settings.embedding_encode_batch_size)
+    if len(texts) <= 1:
+        return model.encode(texts, convert_to_numpy=True)
+
+    if lengths is None:
+        lengths, _ = tokenize_lengths(model_name, texts)
+
+    order = np.argsort(lengths, kind="stable")
+    sorted_texts = [texts[i] for i in order]
+    buckets = [
+        model.encode(sorted_texts[i:i + bucket_size], batch_size=bucket_size, convert_to_numpy=True)
+        for i in range(0, len(sorted_texts), bucket_size)
+    ]
+    sorted_embeddings = np.concatenate(buckets)
+
+    # 还原为输入顺序
+    embeddings = np.empty_like(sorted_embeddings)
+    embeddings[order] = sorted_embeddings
+    return embeddings
+
+
+def warm_up_model(model_name: Optional[str] = None):
+    """加载模型并执行一次预热 encode（在推理工作池中调用）"""
+    encode_texts(model_name, WARMUP_TEXTS)
+
+
+def unload_idle_models():
+    """卸载当前线程 / 进程中空闲超时的模型（在推理工作池中调用）"""
+    model_registry.unload_idle()
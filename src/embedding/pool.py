@@ -0,0 +1,80 @@
+"""
+Embedding 推理工作池
+
+把 encode 等 CPU 密集操作放到独立的线程池 / 进程池中执行，避免阻塞事件循环
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.config import settings
+from src.logger import logger
+
+
+class EmbeddingQueueFull(Exception):
+    """推理队列已满（用于触发 503 背压）"""
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        super().__init__(f"Embedding 推理队列已满，当前排队请求数: {depth}")
+
+
+class InferencePool:
+    """Embedding 推理工作池"""
+
+    def __init__(self, kind: str = "thread", workers: int = 1):
+        """
+        初始化工作池
+
+        Args:
+            kind: 工作池类型（thread: 线程池，process: 进程池）
+            workers: 工作线程 / 进程数
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"不支持的 embedding 工作池类型: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        """获取执行器（延迟创建）"""
+        if self._executor is None:
+            if self.kind == "process":
+                # 使用 spawn 启动子进程，避免 fork 复制事件循环和已加载的模型
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="embedding"
+                )
+            logger.info(f"Embedding 工作池已创建（类型: {self.kind}, 数量: {self.workers}）")
+        return self._executor
+
+    @property
+    def started(self) -> bool:
+        """工作池是否已创建（进程池模式下工作进程是否已启动）"""
+        return self._executor is not None
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        在工作池中执行函数
+
+        进程池模式下 fn 及其参数必须可被 pickle（使用模块级函数）
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self):
+        """关闭工作池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Embedding 工作池已关闭")
+
+
+# 全局工作池实例
+inference_pool = InferencePool(settings.embedding_executor, settings.embedding_workers)
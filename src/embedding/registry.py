@@ -0,0 +1,224 @@
+"""
+Embedding 模型注册表
+
+- 在 Settings.embedding_models 中配置多个 sentence-transformers 模型（别名 -> 模型名称 / 路径）
+- 请求通过 model 字段（别名）选择模型，首次使用时加载
+- 已加载模型按最近使用顺序（LRU）管理，总内存超过预算或空闲超时后卸载
+- 推理后端（torch / onnx / onnx-int8）由 Settings.embedding_backend 统一指定
+- 每个模型的就绪状态（预热完成或首次 encode 成功）在服务进程中维护，推理工作池为进程池时同样有效
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+from src.embedding.backends import BackendModel, load_model
+from src.logger import logger
+
+
+class ModelReadiness:
+    """模型就绪状态"""
+
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.status = self.NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == self.READY
+
+    def mark_ready(self):
+        """标记为就绪（预加载完成或首次 encode 成功）"""
+        if self.status != self.READY:
+            self.status = self.READY
+            self.error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "load_seconds": self.load_seconds
+        }
+
+
+@dataclass
+class _LoadedModel:
+    """已加载的模型"""
+    loaded: BackendModel
+    loaded_at: float
+    last_used: float
+
+    @property
+    def model(self) -> Any:
+        return self.loaded.model
+
+    @property
+    def size_bytes(self) -> int:
+        return self.loaded.size_bytes
+
+
+class ModelRegistry:
+    """Embedding 模型注册表"""
+
+    def __init__(self, models: Dict[str, str], default_model: str, memory_budget_bytes: int = 0,
+                 idle_seconds: int = 0):
+        """
+        初始化注册表
+
+        Args:
+            models: 模型配置（别名 -> sentence-transformers 模型名称或本地路径）
+            default_model: 默认模型别名（请求未指定模型时使用）
+            memory_budget_bytes: 已加载模型的总内存预算（0 表示不限制）
+            idle_seconds: 模型空闲多久后卸载（0 表示不按空闲时间卸载）
+        """
+        if default_model not in models:
+            raise ValueError(f"默认 embedding 模型 {default_model} 不在 embedding_models 配置中")
+        self.models = dict(models)
+        self.default_model = default_model
+        self.memory_budget_bytes = max(0, memory_budget_bytes)
+        self.idle_seconds = max(0, idle_seconds)
+        self._loaded: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()  # 保护 _loaded
+        self._load_locks = {name: threading.Lock() for name in self.models}  # 每个模型一把加载锁
+        self._readiness = {name: ModelReadiness() for name in self.models}  # 每个模型的就绪状态
+
+    def resolve(self, name: Optional[str] = None) -> str:
+        """
+        将请求中的模型名称解析为注册表中的别名
+
+        支持别名或配置中的模型名称 / 路径，为空时返回默认模型
+
+        Raises:
+            ValueError: 模型未配置
+        """
+        if not name:
+            return self.default_model
+        if name in self.models:
+            return name
+        for alias, path in self.models.items():
+            if path == name:
+                return alias
+        raise ValueError(f"未知的 embedding 模型: {name}，可用模型: {', '.join(self.models)}")
+
+    def model_path(self, name: Optional[str] = None) -> str:
+        """获取模型别名对应的模型名称 / 路径"""
+        return self.models[self.resolve(name)]
+
+    def get(self, name: Optional[str] = None):
+        """获取模型（未加载时加载，并发的首次请求只加载一份）"""
+        alias = self.resolve(name)
+        now = time.monotonic()
+
+        with self._lock:
+            self._unload_idle(now, keep=alias)
+            entry = self._loaded.get(alias)
+            if entry is not None:
+                entry.last_used = now
+                self._loaded.move_to_end(alias)
+                return entry.model
+
+        with self._load_locks[alias]:
+            # 等待锁期间可能已被其他线程加载
+            with self._lock:
+                entry = self._loaded.get(alias)
+                if entry is not None:
+                    return entry.model
+
+            loaded = self._load(alias)
+
+            with self._lock:
+                now = time.monotonic()
+                self._loaded[alias] = _LoadedModel(loaded, now, now)
+                self._evict_over_budget(keep=alias)
+            return loaded.model
+
+    def _load(self, alias: str) -> BackendModel:
+        """按配置的推理后端加载模型"""
+        path = self.models[alias]
+        try:
+            logger.info(f"正在加载 embedding 模型: {alias} ({path})，后端: {settings.embedding_backend}")
+            loaded = load_model(path)
+            logger.info(f"Embedding 模型加载成功: {alias}")
+            return loaded
+        except ImportError:
+            logger.error("sentence-transformers 未安装，请运行: pip install sentence-transformers")
+            raise
+        except Exception as e:
+            logger.error(f"加载 embedding 模型失败: {alias} ({path}), 错误: {e}")
+            raise
+
+    def _unload(self, alias: str, reason: str):
+        """卸载模型（调用方需持有锁；正在使用该模型的推理会在完成后释放引用）"""
+        entry = self._loaded.pop(alias)
+        logger.info(f"卸载 embedding 模型: {alias}，原因: {reason}，释放约 {entry.size_bytes // (1024 * 1024)}MB")
+
+    def _evict_over_budget(self, keep: str):
+        """总内存超出预算时按 LRU 卸载模型（调用方需持有锁）"""
+        if self.memory_budget_bytes == 0:
+            return
+        for alias in list(self._loaded):
+            if self.loaded_bytes <= self.memory_budget_bytes:
+                break
+            if alias != keep:
+                self._unload(alias, "超出内存预算")
+
+    def _unload_idle(self, now: float, keep: str = None):
+        """卸载空闲超时的模型（调用方需持有锁）"""
+        if self.idle_seconds == 0:
+            return
+        for alias, entry in list(self._loaded.items()):
+            if alias != keep and now - entry.last_used > self.idle_seconds:
+                self._unload(alias, f"空闲超过 {self.idle_seconds} 秒")
+
+    def unload_idle(self):
+        """卸载所有空闲超时的模型"""
+        with self._lock:
+            self._unload_idle(time.monotonic())
+
+    @property
+    def loaded_bytes(self) -> int:
+        """已加载模型的总内存估算"""
+        return sum(entry.size_bytes for entry in self._loaded.values())
+
+    def readiness(self, name: Optional[str] = None) -> ModelReadiness:
+        """获取模型的就绪状态"""
+        return self._readiness[self.resolve(name)]
+
+    def is_loaded(self, name: Optional[str] = None) -> bool:
+        """模型是否已在当前进程加载"""
+        return self.resolve(name) in self._loaded
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """列出所有已配置的模型及加载状态"""
+        with self._lock:
+            models = []
+            for alias, path in self.models.items():
+                entry = self._loaded.get(alias)
+                models.append({
+                    "id": alias,
+                    "path": path,
+                    "default": alias == self.default_model,
+                    "backend": settings.embedding_backend,
+                    "loaded": entry is not None,
+                    "status": self._readiness[alias].status,
+                    "size_mb": round(entry.size_bytes / (1024 * 1024), 1) if entry else None,
+                    "parity_min_cosine": entry.loaded.parity_min_cosine if entry else None
+                })
+            return models
+
+
+# 全局模型注册表
+model_registry = ModelRegistry(
+    models=settings.embedding_models,
+    default_model=settings.embedding_default_model,
+    memory_budget_bytes=settings.embedding_model_memory_mb * 1024 * 1024,
+    idle_seconds=settings.embedding_model_idle_seconds
+)
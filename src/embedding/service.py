@@ -0,0 +1,96 @@
+"""
+Embedding 生成服务
+
+组合缓存、动态批处理和推理工作池：
+- 先查缓存，只把未命中的文本送去 encode
+- 同一请求内重复的文本只 encode 一次
+- 结果按输入顺序返回
+- token 数由模型的分词器单独计算（只加载分词器，缓存全部命中的请求不会加载模型）
+"""
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.embedding.batcher import get_batcher
+from src.embedding.cache import embedding_cache
+from src.embedding.model import tokenize_lengths
+from src.embedding.pool import inference_pool
+from src.embedding.registry import model_registry
+from src.embedding.tokenizer import tokenizer_cache
+
+
+async def count_tokens(texts: List[str], model_name: str = None) -> Tuple[List[int], int]:
+    """
+    批量计算 token 数
+
+    使用单独加载的分词器在线程中计算，不经过推理工作池；分词器无法单独加载时回退到推理工作池中的完整模型
+
+    Returns:
+        (每条文本的 token 数（未截断）, 模型最大序列长度)
+    """
+    alias = model_registry.resolve(model_name)
+    result = await asyncio.to_thread(tokenizer_cache.count, alias, texts)
+    if result is not None:
+        return result
+    return await inference_pool.run(tokenize_lengths, alias, texts)
+
+
+async def embed_texts(texts: List[str], model_name: str = None, lengths: Optional[List[int]] = None) -> np.ndarray:
+    """
+    生成文本 embedding（带缓存）
+
+    Args:
+        texts: 文本列表
+        model_name: 模型别名（为空时使用默认模型）
+        lengths: 每条文本的 token 数（可选，用于按长度分桶）
+
+    Returns:
+        与 texts 一一对应的 float32 embedding 矩阵
+
+    Raises:
+        ValueError: 模型未配置
+    """
+    alias = model_registry.resolve(model_name)
+    batcher = get_batcher(alias)
+    # 缓存键使用实际模型名称，指向同一模型的不同别名共享缓存
+    cache_model = model_registry.model_path(alias)
+
+    if not embedding_cache.enabled:
+        embeddings = await batcher.submit(texts, lengths)
+        model_registry.readiness(alias).mark_ready()
+        return embeddings
+
+    # 磁盘层查询涉及文件 IO，放到线程中执行
+    if embedding_cache.disk_enabled:
+        cached = await asyncio.to_thread(embedding_cache.get_many, cache_model, texts)
+    else:
+        cached = embedding_cache.get_many(cache_model, texts)
+
+    # 未命中的文本去重后送去 encode
+    miss_positions = {}
+    for i, vector in enumerate(cached):
+        if vector is None:
+            miss_positions.setdefault(texts[i], []).append(i)
+
+    if not miss_positions:
+        return np.stack(cached)
+
+    miss_texts = list(miss_positions)
+    miss_lengths = [lengths[positions[0]] for positions in miss_positions.values()] if lengths else None
+    computed = await batcher.submit(miss_texts, miss_lengths)
+    model_registry.readiness(alias).mark_ready()
+
+    if embedding_cache.disk_enabled:
+        await asyncio.to_thread(embedding_cache.put_many, cache_model, miss_texts, computed)
+    else:
+        embedding_cache.put_many(cache_model, miss_texts, computed)
+
+    # 按原始顺序组装结果
+    result = np.empty((len(texts), computed.shape[1]), dtype=np.float32)
+    for i, vector in enumerate(cached):
+        if vector is not None:
+            result[i] = vector
+    for text, embedding in zip(miss_texts, computed):
+        result[miss_positions[text]] = embedding
+    return result
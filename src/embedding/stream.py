@@ -0,0 +1,159 @@
+"""
+NDJSON 流式 embedding
+
+用于批量任务（如全量重建 embedding）：
+- 请求体按块写入 SpooledTemporaryFile（超过阈值自动落盘），不在内存中保留完整输入
+- 每行一个输入：JSON 字符串，或 {"input": "...", "id": ...} 对象
+- 按固定批大小逐批 encode，每批结果立即以 NDJSON 行写回，最后一行为用量统计
+- 推理队列已满时等待后重试，批量任务不会挤占在线请求
+"""
+import asyncio
+import json
+import tempfile
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from src.embedding.encoding import encode_embeddings
+from src.embedding.pool import EmbeddingQueueFull
+from src.embedding.service import count_tokens, embed_texts
+from src.logger import logger
+
+# 队列已满时的重试等待时间（秒）
+_RETRY_MIN_SECONDS = 0.05
+_RETRY_MAX_SECONDS = 2.0
+
+
+async def spool_request_body(chunks: AsyncIterator[bytes], max_memory_bytes: int):
+    """
+    将请求体写入临时文件（不超过 max_memory_bytes 时保留在内存）
+
+    Returns:
+        已回到文件开头的 SpooledTemporaryFile（由调用方关闭）
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+    try:
+        async for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+def parse_line(line: bytes, line_no: int) -> Optional[Tuple[str, Any]]:
+    """
+    解析一行输入
+
+    Returns:
+        (文本, 调用方提供的 id)，空行返回 None
+
+    Raises:
+        ValueError: 行格式错误
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        item = json.loads(line)
+    except ValueError:
+        raise ValueError(f"第 {line_no} 行不是合法的 JSON")
+    if isinstance(item, str):
+        return item, None
+    if isinstance(item, dict) and isinstance(item.get("input"), str):
+        return item["input"], item.get("id")
+    raise ValueError(f"第 {line_no} 行格式错误：应为字符串或包含 input 字段的对象")
+
+
+class NdjsonBatchReader:
+    """从临时文件中按批读取输入行"""
+
+    def __init__(self, spool, batch_size: int):
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.line_no = 0
+
+    def read_batch(self) -> List[Tuple[str, Any]]:
+        """读取下一批输入（文件读完时返回空列表）"""
+        batch = []
+        while len(batch) < self.batch_size:
+            line = self.spool.readline()
+            if not line:
+                break
+            self.line_no += 1
+            item = parse_line(line, self.line_no)
+            if item is not None:
+                batch.append(item)
+        return batch
+
+
+async def _with_retry(fn, *args):
+    """推理队列已满时按指数退避重试"""
+    delay = _RETRY_MIN_SECONDS
+    while True:
+        try:
+            return await fn(*args)
+        except EmbeddingQueueFull:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RETRY_MAX_SECONDS)
+
+
+def _dump_line(item: dict) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+async def stream_embeddings(spool, model_name: str, batch_size: int, encoding_format: str = "float",
+                            dtype: str = "float32") -> AsyncIterator[bytes]:
+    """
+    逐批生成 embedding 并以 NDJSON 输出
+
+    每条输入输出一行 {"object": "embedding", "index": i, "id": ..., "embedding": ...}；
+    出错时输出一行 {"object": "error", ...} 并结束；正常结束时最后一行为 {"object": "usage", ...}
+
+    Args:
+        spool: spool_request_body 返回的临时文件（结束后关闭）
+        model_name: 模型别名
+        batch_size: 每批 encode 的文本数
+        encoding_format: float 或 base64
+        dtype: 输出精度（float32 或 float16）
+    """
+    reader = NdjsonBatchReader(spool, batch_size)
+    index = 0
+    total_tokens = 0
+    truncated = 0
+
+    try:
+        while True:
+            batch = await asyncio.to_thread(reader.read_batch)
+            if not batch:
+                break
+
+            texts = [text for text, _ in batch]
+            token_counts, max_seq_length = await _with_retry(count_tokens, texts, model_name)
+            embeddings = await _with_retry(embed_texts, texts, model_name, token_counts)
+            truncated += sum(1 for n in token_counts if n > max_seq_length)
+            total_tokens += sum(min(n, max_seq_length) for n in token_counts)
+
+            lines = []
+            for (_, item_id), embedding in zip(batch, encode_embeddings(embeddings, encoding_format, dtype)):
+                item = {"object": "embedding", "index": index, "embedding": embedding}
+                if item_id is not None:
+                    item["id"] = item_id
+                lines.append(_dump_line(item))
+                index += 1
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+        logger.info(f"流式 embedding 完成，模型: {model_name}，文本数量: {index}")
+        yield (_dump_line({
+            "object": "usage",
+            "model": model_name,
+            "count": index,
+            "prompt_tokens": total_tokens,
+            "total_tokens": total_tokens,
+            "truncated_inputs": truncated
+        }) + "\n").encode("utf-8")
+
+    except Exception as e:
+        logger.error(f"流式 embedding 失败（已输出 {index} 条）: {e}")
+        yield (_dump_line({"object": "error", "index": index, "message": str(e)}) + "\n").encode("utf-8")
+    finally:
+        spool.close()
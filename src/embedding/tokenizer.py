@@ -0,0 +1,138 @@
+"""
+Embedding 模型分词器
+
+只加载模型的分词器（AutoTokenizer），不加载模型权重，用于在请求线程中计算 token 数：
+缓存全部命中的请求不需要经过推理工作池，也不会因此加载（或重新加载）模型。
+- 分词器按模型名称 / 路径缓存，指向同一模型的不同别名共享
+- 最大序列长度与 sentence-transformers 一致：优先读取 sentence_bert_config.json 的 max_seq_length，
+  否则取分词器 model_max_length 与模型 max_position_embeddings 中的较小值
+- 分词器无法单独加载时记录为不可用，由调用方回退到加载完整模型计算
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.embedding.registry import model_registry
+from src.logger import logger
+
+# sentence-transformers 模型配置文件（包含 max_seq_length）
+_SBERT_CONFIG_FILE = "sentence_bert_config.json"
+# 分词器未设置 model_max_length 时 transformers 使用的占位值
+_UNSET_MAX_LENGTH = 10 ** 12
+
+
+def _read_sbert_config(path: str) -> Dict[str, Any]:
+    """读取 sentence_bert_config.json（本地目录或 Hugging Face Hub 缓存，不存在时返回空字典）"""
+    try:
+        if os.path.isdir(path):
+            config_file = os.path.join(path, _SBERT_CONFIG_FILE)
+        else:
+            from huggingface_hub import hf_hub_download
+            config_file = hf_hub_download(path, _SBERT_CONFIG_FILE)
+        with open(config_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _max_seq_length(path: str, tokenizer) -> Optional[int]:
+    """模型最大序列长度（无法确定时返回 None）"""
+    max_seq_length = _read_sbert_config(path).get("max_seq_length")
+    if max_seq_length:
+        return int(max_seq_length)
+
+    limits = []
+    model_max_length = getattr(tokenizer, "model_max_length", None)
+    if model_max_length and model_max_length < _UNSET_MAX_LENGTH:
+        limits.append(int(model_max_length))
+    try:
+        from transformers import AutoConfig
+        max_positions = getattr(AutoConfig.from_pretrained(path), "max_position_embeddings", None)
+        if max_positions:
+            limits.append(int(max_positions))
+    except Exception:
+        pass
+    return min(limits) if limits else None
+
+
+class _Tokenizer:
+    """已加载的分词器"""
+
+    def __init__(self, tokenizer, max_seq_length: int):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        # fast tokenizer 并发调用时可能报 "Already borrowed"，同一分词器串行调用
+        self.lock = threading.Lock()
+
+    def lengths(self, texts: List[str]) -> List[int]:
+        with self.lock:
+            encoded = self.tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=False,
+                return_attention_mask=False,
+                return_token_type_ids=False
+            )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class TokenizerCache:
+    """按模型缓存的分词器"""
+
+    def __init__(self):
+        self._tokenizers: Dict[str, Optional[_Tokenizer]] = {}  # 模型名称 / 路径 -> 分词器（None 表示不可用）
+        self._lock = threading.Lock()  # 保护 _tokenizers
+        self._load_locks: Dict[str, threading.Lock] = {}  # 每个模型一把加载锁
+
+    def get(self, path: str) -> Optional[_Tokenizer]:
+        """获取模型的分词器（未加载时加载，不可用时返回 None）"""
+        with self._lock:
+            if path in self._tokenizers:
+                return self._tokenizers[path]
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        with load_lock:
+            # 等待锁期间可能已被其他线程加载
+            with self._lock:
+                if path in self._tokenizers:
+                    return self._tokenizers[path]
+
+            tokenizer = self._load(path)
+            with self._lock:
+                self._tokenizers[path] = tokenizer
+            return tokenizer
+
+    def _load(self, path: str) -> Optional[_Tokenizer]:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(path)
+            max_seq_length = _max_seq_length(path, tokenizer)
+        except Exception as e:
+            logger.warning(f"无法单独加载分词器: {path}，token 数将由完整模型计算，错误: {e}")
+            return None
+        if max_seq_length is None:
+            logger.warning(f"无法确定模型最大序列长度: {path}，token 数将由完整模型计算")
+            return None
+        logger.info(f"分词器加载成功: {path}，最大序列长度 {max_seq_length}")
+        return _Tokenizer(tokenizer, max_seq_length)
+
+    def count(self, model_name: str, texts: List[str]) -> Optional[Tuple[List[int], int]]:
+        """
+        批量计算 token 数（一次批量分词调用）
+
+        Args:
+            model_name: 模型别名
+            texts: 文本列表
+
+        Returns:
+            (每条文本的 token 数（含特殊 token，未截断）, 模型最大序列长度)，分词器不可用时返回 None
+        """
+        tokenizer = self.get(model_registry.model_path(model_name))
+        if tokenizer is None:
+            return None
+        return tokenizer.lengths(texts), tokenizer.max_seq_length
+
+
+# 全局分词器缓存实例
+tokenizer_cache = TokenizerCache()
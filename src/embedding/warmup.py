@@ -0,0 +1,83 @@
+"""
+Embedding 模型预加载与空闲卸载
+
+在后台加载模型并预热，就绪状态（readiness）与存活状态（liveness）分开上报：
+- EMBEDDING_PRELOAD=True 时服务启动即预加载默认模型
+- 未预加载的模型由首次就绪检查（/ready）触发预热，避免就绪探针一直返回 503、流量永远无法进入
+- 就绪状态按模型别名记录在模型注册表中
+
+配置 EMBEDDING_MODEL_IDLE_SECONDS 时后台定期卸载空闲超时的模型，没有请求的服务也能释放内存
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from src.embedding.model import unload_idle_models, warm_up_model
+from src.embedding.pool import inference_pool
+from src.embedding.registry import ModelReadiness, model_registry
+from src.logger import logger
+
+# 进行中的预加载任务（模型别名 -> 任务），同一模型只预加载一次
+_preload_tasks: Dict[str, asyncio.Task] = {}
+
+# 空闲卸载的最长检查间隔（秒）
+_IDLE_CHECK_SECONDS = 60
+
+
+async def preload_embedding_model(model_name: Optional[str] = None):
+    """在推理工作池中加载模型并预热（每个工作线程 / 进程各提交一次）"""
+    alias = model_registry.resolve(model_name)
+    readiness = model_registry.readiness(alias)
+    readiness.status = ModelReadiness.LOADING
+    start = time.monotonic()
+    logger.info(f"开始预加载 embedding 模型: {alias}")
+    try:
+        await asyncio.gather(*[
+            inference_pool.run(warm_up_model, alias) for _ in range(inference_pool.workers)
+        ])
+    except asyncio.CancelledError:
+        readiness.status = ModelReadiness.NOT_LOADED
+        raise
+    except Exception as e:
+        readiness.status = ModelReadiness.FAILED
+        readiness.error = str(e)
+        logger.error(f"预加载 embedding 模型失败: {alias}, 错误: {e}")
+        return
+
+    readiness.load_seconds = round(time.monotonic() - start, 2)
+    readiness.mark_ready()
+    logger.info(f"Embedding 模型预加载完成: {alias}，耗时: {readiness.load_seconds}秒")
+
+
+def start_preload(model_name: Optional[str] = None) -> asyncio.Task:
+    """启动后台预加载任务（模型正在预加载时返回已有任务）"""
+    alias = model_registry.resolve(model_name)
+    task = _preload_tasks.get(alias)
+    if task is None or task.done():
+        # 立即标记为加载中，任务开始执行前的就绪检查不会重复触发预加载
+        model_registry.readiness(alias).status = ModelReadiness.LOADING
+        task = asyncio.create_task(preload_embedding_model(alias))
+        _preload_tasks[alias] = task
+    return task
+
+
+async def unload_idle_periodically():
+    """后台定期卸载空闲超时的模型（模型只在请求中加载，不检查的话空闲的服务永远不会释放内存）"""
+    interval = min(_IDLE_CHECK_SECONDS, max(1, model_registry.idle_seconds // 2))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if inference_pool.kind == "thread":
+                model_registry.unload_idle()
+            elif inference_pool.started:
+                # 进程池模式下模型加载在工作进程中，每个工作进程各提交一次（不会为此启动工作进程）
+                await asyncio.gather(*[
+                    inference_pool.run(unload_idle_models) for _ in range(inference_pool.workers)
+                ])
+        except Exception as e:
+            logger.warning(f"卸载空闲 embedding 模型失败: {e}")
+
+
+def start_idle_unloader() -> asyncio.Task:
+    """启动后台空闲卸载任务"""
+    return asyncio.create_task(unload_idle_periodically())
@@ -2,91 +2,95 @@
 智能体定时任务调度器
 
 功能：
-- 每分钟执行一次检查
-- 从数据库获取所有启用的定时任务
-- 根据任务配置的时间判断是否需要执行
-- 执行 GPT Researcher 研究任务
-- 跳过正在执行中的任务，避免重复执行
+- 启用的定时任务来自注册表缓存（任务接口修改任务后失效），时间配置编译后按 (task_id, update_time) 缓存
+- 按下一次触发时间维护小顶堆，休眠到最近的触发时间，任务被修改时提前唤醒
+- 到触发时间的任务提交到研究任务执行器，按优先级排队、有界并发执行 GPT Researcher 研究任务
+- 跳过正在排队或执行中的任务，避免重复执行
+- 每个任务最后触发的时段持久化到 tbl_scheduler_state，启动时恢复（同一时段不会因重启重复执行），
+  处理遗留的运行中执行记录和停机期间错过的触发
 """
 import asyncio
+import heapq
 import os
-from datetime import datetime
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 from src.config import settings
-from src.database import db
+from src.database import adb, execution_stats, report_store, scheduler_state
 from src.logger import logger
+from src.process.executor import ResearchExecutor
+from src.process.schedule import CompiledSchedule, compile_schedule, jitter_minute
+from src.process.task_registry import task_registry
+
+# 正在排队 / 执行的任务或队列已满时稍后重试的间隔（秒）
+_RETRY_SECONDS = 60
+# 最短休眠时间（秒），避免触发时间与当前时间过近时空转
+_MIN_SLEEP_SECONDS = 1
+# 停机期间错过触发的处理策略：skip（跳过）/ once（启动后补执行一次）
+_CATCHUP_POLICIES = ("skip", "once")
+# 启动时遗留的运行中执行记录的处理策略：fail（标记为失败）/ requeue（标记为失败并重新执行任务）
+_ORPHAN_POLICIES = ("fail", "requeue")
+# 持久化的触发时间格式
+_FIRE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 class AgentScheduler:
     """智能体定时任务调度器"""
 
-    def __init__(self):
-        self.running = False
-        self.task = None
-        self.executing_tasks = set()  # 记录正在执行的任务ID
-        self.last_execution_time = {}  # 记录每个任务最后执行的时间（小时级别）格式：{task_id: "YYYY-MM-DD-HH"}
-
-    def parse_time_config(self, task_conf: str) -> Dict[str, Any]:
+    def __init__(self, catchup_policy: str = "skip", orphan_policy: str = "fail"):
         """
-        解析任务时间配置
-
-        格式：时 日 月 周
-        示例：
-        - "6,8 * * *" - 每天6点和8点
-        - "20 * * 0" - 每周日晚8点
-        - "9 1 * *" - 每月1号早9点
-        - "14 * * 1-5" - 每周一到周五下午2点
+        初始化调度器
 
         Args:
-            task_conf: 时间配置字符串
-
-        Returns:
-            解析后的配置字典
+            catchup_policy: 停机期间错过触发的处理策略（skip / once）
+            orphan_policy: 启动时遗留的运行中执行记录的处理策略（fail / requeue）
         """
-        try:
-            parts = task_conf.strip().split()
-            if len(parts) != 4:
-                logger.error(f"时间配置格式错误: {task_conf}")
-                return None
-
-            return {
-                "hour": parts[0],  # 时 (0-23)
-                "day": parts[1],  # 日 (1-31)
-                "month": parts[2],  # 月 (1-12)
-                "weekday": parts[3]  # 周 (0-6, 0=周日)
-            }
-        except Exception as e:
-            logger.error(f"解析时间配置失败: {task_conf}, 错误: {e}")
-            return None
-
-    def match_value(self, config_value: str, current_value: int) -> bool:
+        if catchup_policy not in _CATCHUP_POLICIES:
+            raise ValueError(f"不支持的补执行策略: {catchup_policy}，可选: {', '.join(_CATCHUP_POLICIES)}")
+        if orphan_policy not in _ORPHAN_POLICIES:
+            raise ValueError(f"不支持的中断执行处理策略: {orphan_policy}，可选: {', '.join(_ORPHAN_POLICIES)}")
+        self.catchup_policy = catchup_policy
+        self.orphan_policy = orphan_policy
+        self.running = False
+        self.task = None
+        self.last_execution_time = {}  # 记录每个任务最后执行的触发时段 格式：{task_id: "YYYY-MM-DD-HH"（小时级配置）或 "YYYY-MM-DD-HH:MM"（分钟级配置）}
+        self._schedules: Dict[int, Tuple[Tuple[Any, Any], Optional[CompiledSchedule]]] = {}  # task_id -> ((update_time, task_conf), 编译结果)
+        self._next_fire: Dict[int, datetime] = {}  # task_id -> 下一次触发时间
+        self._fire_heap: List[Tuple[datetime, int]] = []  # (触发时间, task_id) 小顶堆
+        self._registry_version = None  # 已计算触发时间的注册表版本
+        self._tasks_by_id: Dict[int, Dict[str, Any]] = {}  # 注册表中的启用任务
+        self._catch_up: Dict[int, datetime] = {}  # task_id -> 停机期间错过的触发时间（启动后首次调度时补执行）
+        self.executor = ResearchExecutor(
+            self.execute_gpt_research,
+            max_concurrency=settings.scheduler_max_concurrency,
+            max_queue_size=settings.scheduler_queue_size,
+        )
+
+    def _compile(self, task: Dict[str, Any]) -> Optional[CompiledSchedule]:
         """
-        匹配单个时间字段
+        获取任务编译后的时间配置（按 task_id 缓存，update_time 或 task_conf 变化时重新编译）
 
-        Args:
-            config_value: 配置值（如 "*", "6", "6,8", "1-5"）
-            current_value: 当前值
-
-        Returns:
-            是否匹配
+        update_time 只精确到分钟，同一分钟内的多次修改通过 task_conf 区分；
+        小时级配置按 task_id 错开触发分钟（scheduler_jitter_minutes）
         """
-        # * 表示任意值
-        if config_value == "*":
-            return True
-
-        # 逗号分隔的多个值（如 6,8,10）
-        if "," in config_value:
-            values = [int(v.strip()) for v in config_value.split(",")]
-            return current_value in values
-
-        # 范围值（如 1-5）
-        if "-" in config_value:
-            start, end = map(int, config_value.split("-"))
-            return start <= current_value <= end
+        task_id = task.get("task_id")
+        key = (task.get("update_time"), task.get("task_conf"))
+        cached = self._schedules.get(task_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
 
-        # 单个值
-        return int(config_value) == current_value
+        try:
+            schedule = compile_schedule(
+                task.get("task_conf"),
+                minute=jitter_minute(task_id, settings.scheduler_jitter_minutes)
+            )
+        except ValueError as e:
+            logger.error(f"任务 {task.get('task_name')} (ID: {task_id}) {e}")
+            schedule = None
+        self._schedules[task_id] = (key, schedule)
+        # 配置变化后重新计算触发时间
+        self._next_fire.pop(task_id, None)
+        return schedule
 
     def should_execute(self, task_conf: str, now: datetime = None) -> bool:
         """
@@ -99,32 +103,12 @@ class AgentScheduler:
         Returns:
             是否应该执行
         """
-        if now is None:
-            now = datetime.now()
-
-        config = self.parse_time_config(task_conf)
-        if not config:
-            return False
-
-        # 匹配小时
-        if not self.match_value(config["hour"], now.hour):
-            return False
-
-        # 匹配日期
-        if not self.match_value(config["day"], now.day):
-            return False
-
-        # 匹配月份
-        if not self.match_value(config["month"], now.month):
-            return False
-
-        # 匹配星期（0=周日, 1=周一, ..., 6=周六）
-        weekday = (now.weekday() + 1) % 7  # Python: 0=周一, 转换为 0=周日
-        if not self.match_value(config["weekday"], weekday):
+        try:
+            return compile_schedule(task_conf).matches(now or datetime.now())
+        except ValueError as e:
+            logger.error(str(e))
             return False
 
-        return True
-
     async def execute_gpt_research(self, task: Dict[str, Any]):
         """
         执行 GPT Research 任务
@@ -136,16 +120,14 @@ class AgentScheduler:
         task_name = task.get("task_name")
         task_prompt = task.get("task_prompt", "")
 
-        # 标记任务开始执行
-        self.executing_tasks.add(task_id)
+        # 记录任务开始时间
+        start_time = datetime.now()
+        start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S")
+        execution_id = None
 
         try:
-            # 记录任务开始时间
-            start_time = datetime.now()
-            start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S")
-
-            # 插入执行记录（状态：0=运行中）
-            execution_id = db.insert("tbl_task_execution", {
+            # 插入执行记录（状态：0=运行中），同时更新任务执行统计
+            execution_id = await adb.run(execution_stats.insert_execution, {
                 "task_id": task_id,
                 "task_name": task_name,
                 "task_prompt": task_prompt,
@@ -215,18 +197,26 @@ class AgentScheduler:
             end_time_str = end_time.strftime("%Y-%m-%d %H:%M:%S")
             duration = int((end_time - start_time).total_seconds())
 
+            # 完整报告压缩后单独保存（相同内容只保存一份），执行记录中只保留摘要和报告哈希
+            report_hash = await adb.run(report_store.put, report)
+
             # 更新执行记录（状态：1=成功）
-            db.update("tbl_task_execution", {
+            await adb.run(execution_stats.finish_execution, execution_id, task_id, {
                 "end_time": end_time_str,
                 "status": 1,
                 "result_summary": result_summary,
-                "result_detail": report,
+                "report_hash": report_hash,
                 "execution_duration": duration,
                 "updated_at": end_time_str
-            }, "execution_id = ?", (execution_id,))
+            })
 
             logger.info(f"[执行ID: {execution_id}] 任务完成: {task_name}, 耗时: {duration}秒")
 
+            # 为新报告建立向量索引（后台执行，不影响任务结果）
+            if settings.report_index_enabled:
+                from src.process.report_index import report_indexer
+                asyncio.create_task(report_indexer.sync_in_background())
+
         except Exception as e:
             # 计算执行时长
             end_time = datetime.now()
@@ -239,101 +229,246 @@ class AgentScheduler:
             import traceback
             error_detail = traceback.format_exc()
 
+            # 执行记录插入失败时没有可更新的记录
+            if execution_id is None:
+                logger.error(f"任务 {task_name} (ID: {task_id}) 执行记录创建失败: {error_msg}")
+                logger.debug(f"任务 {task_name} (ID: {task_id}) 错误详情: {error_detail}")
+                return
+
             # 更新执行记录（状态：2=失败）
-            db.update("tbl_task_execution", {
+            await adb.run(execution_stats.finish_execution, execution_id, task_id, {
                 "end_time": end_time_str,
                 "status": 2,
                 "error_message": error_msg,
                 "error_detail": error_detail,
                 "execution_duration": duration,
                 "updated_at": end_time_str
-            }, "execution_id = ?", (execution_id,))
+            })
 
             logger.error(f"[执行ID: {execution_id}] 任务失败: {task_name}, 错误: {error_msg}")
             logger.debug(f"[执行ID: {execution_id}] 错误详情: {error_detail}")
-        finally:
-            # 无论成功或失败，都要移除执行标记
-            self.executing_tasks.discard(task_id)
+
+    def _push(self, task_id: int, fire_time: datetime):
+        """记录任务的下一次触发时间（堆中的旧记录在弹出时丢弃）"""
+        self._next_fire[task_id] = fire_time
+        heapq.heappush(self._fire_heap, (fire_time, task_id))
+
+    def _retry_later(self, task_id: int, schedule: CompiledSchedule, now: datetime):
+        """本触发时段内稍后重试，超出本时段则计算下一次触发时间"""
+        retry_time = now + timedelta(seconds=_RETRY_SECONDS)
+        if schedule.slot_key(retry_time) == schedule.slot_key(now):
+            self._push(task_id, retry_time)
+        else:
+            self._push_next(task_id, schedule, now)
+
+    def _refresh_schedules(self, tasks: List[Dict[str, Any]], now: datetime):
+        """为新增或配置变化的任务计算触发时间，移除已删除 / 禁用的任务"""
+        self._tasks_by_id = {task.get("task_id"): task for task in tasks}
+        task_ids = set(self._tasks_by_id)
+        for task in tasks:
+            task_id = task.get("task_id")
+            schedule = self._compile(task)
+            if schedule is not None and task_id not in self._next_fire:
+                fire_time = schedule.current_or_next_fire_time(now)
+                if task_id in self._catch_up:
+                    if fire_time is not None and fire_time <= now:
+                        # 当前时段本身就要执行，不再补执行
+                        del self._catch_up[task_id]
+                    else:
+                        fire_time = now
+                if fire_time is None:
+                    logger.warning(f"任务 {task.get('task_name')} (ID: {task_id}) 的时间配置永远不会触发: {task.get('task_conf')}")
+                else:
+                    self._push(task_id, fire_time)
+
+        for task_id in set(self._schedules) - task_ids:
+            del self._schedules[task_id]
+        for task_id in set(self._next_fire) - task_ids:
+            del self._next_fire[task_id]
+        for task_id in set(self._catch_up) - task_ids:
+            del self._catch_up[task_id]
+
+    def _sleep_seconds(self, now: datetime) -> float:
+        """距离下一次触发的秒数（最长为注册表的检查间隔，以便发现其他进程对任务表的修改）"""
+        max_seconds = max(task_registry.check_seconds, _MIN_SLEEP_SECONDS)
+        while self._fire_heap and self._next_fire.get(self._fire_heap[0][1]) != self._fire_heap[0][0]:
+            heapq.heappop(self._fire_heap)
+        if not self._fire_heap:
+            return max_seconds
+        seconds = (self._fire_heap[0][0] - now).total_seconds()
+        return min(max(seconds, _MIN_SLEEP_SECONDS), max_seconds)
 
     async def check_and_execute_tasks(self):
-        """检查并执行符合条件的任务"""
+        """执行已到触发时间的任务"""
         try:
-            # 获取所有启用的任务（task_status = 1）
-            tasks = db.get_all(
-                "tbl_agent_schedule_task",
-                where="task_status = 1",
-                order_by="task_id ASC"
-            )
+            # 获取所有启用的任务（task_status = 1，来自注册表缓存，任务变化后才重新加载）
+            tasks = await task_registry.get_tasks()
 
+            now = datetime.now()
+            if task_registry.version != self._registry_version:
+                self._refresh_schedules(tasks, now)
+                self._registry_version = task_registry.version
             if not tasks:
                 logger.debug("扫描完成：没有启用的定时任务")
                 return
 
-            now = datetime.now()
-            current_time_str = now.strftime('%Y-%m-%d %H:%M:%S')
-            current_hour_key = now.strftime("%Y-%m-%d-%H")
-
-            # 扫描统计
-            total_tasks = len(tasks)
             executed_count = 0
             skipped_count = 0
+            fires: List[Tuple[int, str, str]] = []  # 本次提交的任务（task_id, 触发时段, 触发时间），批量持久化
 
-            logger.info(f"========== 开始扫描定时任务 ==========")
-            logger.info(f"扫描时间: {current_time_str}")
-            logger.info(f"启用任务数: {total_tasks}")
+            # 依次取出已到触发时间的任务
+            while self._fire_heap and self._fire_heap[0][0] <= now:
+                fire_time, task_id = heapq.heappop(self._fire_heap)
+                if self._next_fire.get(task_id) != fire_time:
+                    continue  # 已被重新调度的旧记录
 
-            # 检查每个任务
-            for task in tasks:
-                task_id = task.get("task_id")
+                task = self._tasks_by_id[task_id]
                 task_name = task.get("task_name")
-                task_conf = task.get("task_conf")
+                schedule = self._schedules[task_id][1]
+
+                # 补执行停机期间错过的触发（只执行一次，之后按正常的触发时间调度）
+                missed_time = self._catch_up.pop(task_id, None)
+                if missed_time is not None:
+                    next_fire = schedule.current_or_next_fire_time(now)
+                    if next_fire is None:
+                        self._next_fire.pop(task_id, None)
+                    else:
+                        self._push(task_id, next_fire)
+                    if self.executor.contains(task_id) or not self.executor.submit(task, fire_time):
+                        skipped_count += 1
+                        continue
+                    # 触发时间记录为当前时间：停机期间可能错过了多个时段，再次重启时只从此时之后计算错过的触发
+                    slot_key = schedule.slot_key(missed_time)
+                    self.last_execution_time[task_id] = slot_key
+                    fires.append((task_id, slot_key, now.strftime(_FIRE_TIME_FORMAT)))
+                    logger.info(f"✓ 补执行任务: {task_name} (ID: {task_id}), 错过的触发时间: {missed_time:%Y-%m-%d %H:%M}")
+                    executed_count += 1
+                    continue
 
-                logger.debug(f"检查任务: {task_name} (ID: {task_id}), 配置: {task_conf}")
+                # 不在触发时段内（如事件循环阻塞错过了整个时段），直接计算下一次
+                if not schedule.matches(now):
+                    logger.warning(f"任务 {task_name} (ID: {task_id}) 错过了触发时间 {fire_time:%Y-%m-%d %H:%M}")
+                    self._push_next(task_id, schedule, now)
+                    skipped_count += 1
+                    continue
 
-                if not task_conf:
-                    logger.warning(f"任务 {task_name} (ID: {task_id}) 缺少时间配置，跳过")
+                # 检查是否在同一触发时段内已经执行过
+                slot_key = schedule.slot_key(now)
+                if self.last_execution_time.get(task_id) == slot_key:
+                    logger.info(f"跳过任务 {task_name} (ID: {task_id}): 触发时段 {slot_key} 已执行过")
+                    self._push_next(task_id, schedule, now)
                     skipped_count += 1
                     continue
 
-                # 检查任务是否正在执行中
-                if task_id in self.executing_tasks:
-                    logger.info(f"跳过任务 {task_name} (ID: {task_id}): 正在执行中")
+                # 检查任务是否正在排队或执行中（本时段内稍后重试）
+                if self.executor.contains(task_id):
+                    logger.info(f"跳过任务 {task_name} (ID: {task_id}): 正在排队或执行中")
+                    self._retry_later(task_id, schedule, now)
                     skipped_count += 1
                     continue
 
-                # 判断是否应该执行
-                if self.should_execute(task_conf, now):
-                    # 检查是否在同一小时内已经执行过
-                    last_exec_time = self.last_execution_time.get(task_id)
+                # 提交到执行器排队执行（队列已满时本时段内稍后重试）
+                if not self.executor.submit(task, fire_time):
+                    self._retry_later(task_id, schedule, now)
+                    skipped_count += 1
+                    continue
 
-                    if last_exec_time == current_hour_key:
-                        logger.info(f"跳过任务 {task_name} (ID: {task_id}): 当前小时 {current_hour_key} 已执行过")
-                        skipped_count += 1
-                        continue
+                self._push_next(task_id, schedule, now)
+                # 记录本次执行的触发时段
+                self.last_execution_time[task_id] = slot_key
+                fires.append((task_id, slot_key, fire_time.strftime(_FIRE_TIME_FORMAT)))
 
-                    # 记录本次执行的小时
-                    self.last_execution_time[task_id] = current_hour_key
+                logger.info(f"✓ 触发任务: {task_name} (ID: {task_id}), 配置: {task.get('task_conf')}")
+                executed_count += 1
 
-                    logger.info(f"✓ 触发任务: {task_name} (ID: {task_id}), 配置: {task_conf}")
-                    executed_count += 1
-                    # 使用 asyncio.create_task 异步执行，不阻塞其他任务检查
-                    asyncio.create_task(self.execute_gpt_research(task))
-                else:
-                    logger.debug(f"跳过任务 {task_name} (ID: {task_id}): 不符合时间条件")
-                    skipped_count += 1
+            # 持久化触发时段（重启后同一时段不会重复执行）
+            await adb.run(scheduler_state.record_fires, fires)
 
-            # 输出扫描统计
-            logger.info(f"========== 扫描完成 ==========")
-            logger.info(f"检查任务数: {total_tasks}, 触发执行: {executed_count}, 跳过: {skipped_count}")
-            logger.info(f"正在执行的任务数: {len(self.executing_tasks)}")
+            if executed_count or skipped_count:
+                executor_stats = self.executor.stats()
+                logger.info(f"========== 调度完成 ==========")
+                logger.info(f"启用任务数: {len(tasks)}, 触发执行: {executed_count}, 跳过: {skipped_count}")
+                logger.info(f"排队中的任务数: {executor_stats['queue_depth']}, 正在执行的任务数: {executor_stats['running']}")
 
         except Exception as e:
             logger.error(f"检查定时任务失败: {e}")
 
+    def _push_next(self, task_id: int, schedule: CompiledSchedule, now: datetime):
+        """计算并记录下一次触发时间"""
+        fire_time = schedule.next_fire_time(now)
+        if fire_time is None:
+            self._next_fire.pop(task_id, None)
+        else:
+            self._push(task_id, fire_time)
+
+    async def recover(self):
+        """
+        启动时恢复调度器状态
+
+        - 读取持久化的触发时段，重启前已执行的时段不会重复执行
+        - 遗留的运行中执行记录（上次进程退出时中断）标记为失败，orphan_policy 为 requeue 时重新执行对应任务
+        - 找出停机期间错过触发的任务，catchup_policy 为 once 时在首次调度时补执行一次
+        """
+        state = await adb.run(scheduler_state.load)
+        for task_id, row in state.items():
+            self.last_execution_time[task_id] = row["last_slot_key"]
+
+        orphans = await adb.run(scheduler_state.fail_orphans)
+        for execution in orphans:
+            logger.warning(
+                f"[执行ID: {execution['execution_id']}] 任务 {execution['task_name']} 在上次停止时仍在执行"
+                f"（开始于 {execution['start_time']}），已标记为失败"
+            )
+
+        tasks = await task_registry.get_tasks()
+        tasks_by_id = {task.get("task_id"): task for task in tasks}
+        now = datetime.now()
+        if self.orphan_policy == "requeue":
+            fires: List[Tuple[int, str, str]] = []
+            for task_id in dict.fromkeys(execution["task_id"] for execution in orphans):
+                task = tasks_by_id.get(task_id)
+                if task is None or not self.executor.submit(task):
+                    continue
+                logger.info(f"重新执行中断的任务: {task.get('task_name')} (ID: {task_id})")
+                # 当前处于触发时段内时，重新执行即算作本时段的执行，避免同一时段再执行一次
+                schedule = self._compile(task)
+                if schedule is not None and schedule.matches(now):
+                    slot_key = schedule.slot_key(now)
+                    self.last_execution_time[task_id] = slot_key
+                    fires.append((task_id, slot_key, now.strftime(_FIRE_TIME_FORMAT)))
+            await adb.run(scheduler_state.record_fires, fires)
+
+        for task_id, row in state.items():
+            task = tasks_by_id.get(task_id)
+            schedule = self._compile(task) if task is not None else None
+            if schedule is None:
+                continue
+            # 上次触发之后的第一个触发时段早于当前时段，说明停机期间错过了触发
+            missed_time = schedule.next_fire_time(datetime.strptime(row["last_fire_time"], _FIRE_TIME_FORMAT))
+            if missed_time is None or missed_time > now or schedule.slot_key(missed_time) == schedule.slot_key(now):
+                continue
+            if self.catchup_policy == "once" and not self.executor.contains(task_id):
+                self._catch_up[task_id] = missed_time
+                logger.info(f"任务 {task.get('task_name')} (ID: {task_id}) 在停机期间错过了触发（{missed_time:%Y-%m-%d %H:%M} 起），将补执行一次")
+            else:
+                logger.info(f"任务 {task.get('task_name')} (ID: {task_id}) 在停机期间错过了触发（{missed_time:%Y-%m-%d %H:%M} 起），已跳过")
+
+        logger.info(
+            f"调度器状态已恢复: {len(state)} 个任务的触发记录，中断的执行 {len(orphans)} 条，"
+            f"待补执行 {len(self._catch_up)} 个任务"
+        )
+
     async def run(self):
-        """启动定时任务调度器（启动后10秒首次执行，之后每分钟执行一次）"""
+        """启动定时任务调度器（启动后10秒首次执行，之后休眠到下一个任务的触发时间）"""
         self.running = True
-        logger.info("智能体定时任务调度器已启动（10秒后首次执行，之后每分钟扫描一次）")
+        self.executor.start()
+        logger.info("智能体定时任务调度器已启动（10秒后首次执行，之后按任务的触发时间唤醒）")
+
+        # 恢复持久化的调度状态，处理上次停止时中断的执行和停机期间错过的触发
+        try:
+            await self.recover()
+        except Exception as e:
+            logger.error(f"恢复调度器状态失败: {e}")
 
         # 首次启动延迟10秒
         logger.debug("等待 10 秒后首次执行任务检查")
@@ -341,26 +476,31 @@ class AgentScheduler:
 
         while self.running:
             try:
-                # 执行任务检查
+                # 执行已到触发时间的任务
                 await self.check_and_execute_tasks()
 
-                # 等待1分钟
-                logger.debug(f"等待 60 秒（1分钟）到下次扫描")
-                await asyncio.sleep(60)
+                # 休眠到下一个任务的触发时间，任务被修改时提前唤醒
+                seconds = self._sleep_seconds(datetime.now())
+                logger.debug(f"等待 {seconds:.1f} 秒到下次调度")
+                await task_registry.wait_changed(seconds)
 
             except Exception as e:
                 logger.error(f"定时任务调度器运行错误: {e}")
                 # 出错后等待 60 秒再继续
                 await asyncio.sleep(60)
 
-    def stop(self):
-        """停止定时任务调度器"""
+    async def stop(self):
+        """停止定时任务调度器（等待正在执行的任务取消完成）"""
         self.running = False
+        await self.executor.stop()
         logger.info("智能体定时任务调度器已停止")
 
 
 # 全局调度器实例
-scheduler = AgentScheduler()
+scheduler = AgentScheduler(
+    catchup_policy=settings.scheduler_catchup_policy,
+    orphan_policy=settings.scheduler_orphan_policy,
+)
 
 
 async def start_scheduler():
@@ -368,6 +508,6 @@ async def start_scheduler():
     await scheduler.run()
 
 
-def stop_scheduler():
+async def stop_scheduler():
     """停止调度器"""
-    scheduler.stop()
+    await scheduler.stop()
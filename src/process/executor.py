@@ -0,0 +1,171 @@
+"""
+研究任务执行器
+
+定时任务触发后先进入优先级队列，再由固定数量的工作协程执行，同一时刻触发的大量任务排队执行而不是同时启动：
+- 最大并发数由 scheduler_max_concurrency 控制，队列容量由 scheduler_queue_size 控制
+- 按任务优先级（task_priority，数值越大越优先）出队，同优先级按触发时间、入队顺序先进先出
+- 已在队列中或正在执行的任务不会重复入队：每个任务最多占用一个队列位置，这是执行器提供的唯一公平性保证，
+  不同任务之间不做轮转（同优先级的任务按触发时间先进先出）
+- 记录队列长度、等待时间等指标（/system/scheduler/queue 接口）
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.logger import logger
+
+
+def task_priority(task: Dict[str, Any]) -> int:
+    """任务优先级（未设置时为 0）"""
+    try:
+        return int(task.get("task_priority") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ResearchExecutor:
+    """有界并发的优先级队列执行器"""
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        max_concurrency: int = 2,
+        max_queue_size: int = 0,
+    ):
+        """
+        初始化执行器
+
+        Args:
+            handler: 执行单个任务的协程函数
+            max_concurrency: 最大并发数
+            max_queue_size: 队列容量（0 表示不限制）
+        """
+        self.handler = handler
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_size = max(0, max_queue_size)
+        # (-优先级, 触发时间, 入队序号, 入队时间, 任务)，入队序号唯一，不会比较到任务字典
+        self._queue: "asyncio.PriorityQueue[Tuple[int, datetime, int, float, Dict[str, Any]]]" = \
+            asyncio.PriorityQueue(self.max_queue_size)
+        self._seq = itertools.count()
+        self._queued: Dict[int, Tuple[int, float]] = {}  # task_id -> (优先级, 入队时间)
+        self._running: Dict[int, float] = {}  # task_id -> 开始执行时间
+        self._workers: List[asyncio.Task] = []
+        self._metrics = {
+            "submitted": 0,
+            "rejected_duplicate": 0,
+            "rejected_full": 0,
+            "started": 0,
+            "completed": 0,
+            "errors": 0,
+            "wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def contains(self, task_id: int) -> bool:
+        """任务是否在队列中或正在执行"""
+        return task_id in self._queued or task_id in self._running
+
+    def submit(self, task: Dict[str, Any], fire_time: Optional[datetime] = None) -> bool:
+        """
+        提交任务
+
+        Args:
+            task: 任务信息
+            fire_time: 触发时间（同优先级按触发时间排序）
+
+        Returns:
+            是否入队（任务已在队列中、正在执行或队列已满时返回 False）
+        """
+        task_id = task.get("task_id")
+        if self.contains(task_id):
+            self._metrics["rejected_duplicate"] += 1
+            return False
+
+        priority = task_priority(task)
+        enqueued_at = time.monotonic()
+        try:
+            self._queue.put_nowait((-priority, fire_time or datetime.now(), next(self._seq), enqueued_at, task))
+        except asyncio.QueueFull:
+            self._metrics["rejected_full"] += 1
+            logger.warning(f"执行队列已满（{self.max_queue_size}），任务 {task.get('task_name')} (ID: {task_id}) 未入队")
+            return False
+        self._queued[task_id] = (priority, enqueued_at)
+        self._metrics["submitted"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            _, _, _, enqueued_at, task = await self._queue.get()
+            task_id = task.get("task_id")
+            self._queued.pop(task_id, None)
+
+            started_at = time.monotonic()
+            wait_ms = (started_at - enqueued_at) * 1000
+            self._metrics["started"] += 1
+            self._metrics["wait_ms"] += wait_ms
+            self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], wait_ms)
+            if wait_ms >= 1000:
+                logger.info(f"任务 {task.get('task_name')} (ID: {task_id}) 排队 {wait_ms / 1000:.1f} 秒后开始执行")
+
+            self._running[task_id] = started_at
+            try:
+                await self.handler(task)
+                self._metrics["completed"] += 1
+            except Exception as e:
+                self._metrics["errors"] += 1
+                logger.error(f"执行任务 {task.get('task_name')} (ID: {task_id}) 出错: {e}")
+            finally:
+                self._running.pop(task_id, None)
+                self._queue.task_done()
+
+    def start(self):
+        """启动工作协程（需要在事件循环中调用）"""
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        logger.info(f"研究任务执行器已启动（最大并发 {self.max_concurrency}）")
+
+    async def stop(self):
+        """
+        停止工作协程（正在执行的任务会被取消，队列中的任务丢弃）
+
+        等待工作协程退出后才返回，之后关闭数据库时不会有被取消的任务仍在写入执行记录
+        """
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        dropped = len(self._queued)
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        self._queued.clear()
+        if dropped:
+            logger.warning(f"研究任务执行器已停止，丢弃 {dropped} 个排队中的任务")
+
+    def stats(self) -> Dict[str, Any]:
+        """执行器指标"""
+        now = time.monotonic()
+        metrics = dict(self._metrics)
+        started = metrics["started"]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_size": self.max_queue_size,
+            "workers": len(self._workers),
+            "queue_depth": len(self._queued),
+            "queue_depth_by_priority": {
+                priority: count
+                for priority, count in sorted(Counter(p for p, _ in self._queued.values()).items(), reverse=True)
+            },
+            "oldest_wait_ms": round(max(((now - t) * 1000 for _, t in self._queued.values()), default=0.0), 2),
+            "running": len(self._running),
+            "running_tasks": [
+                {"task_id": task_id, "running_seconds": round(now - t, 1)}
+                for task_id, t in self._running.items()
+            ],
+            "avg_wait_ms": round(metrics["wait_ms"] / started, 2) if started else 0.0,
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in metrics.items()},
+        }
@@ -0,0 +1,344 @@
+"""
+数据库维护任务
+
+功能（后台每 database_maintenance_interval_minutes 分钟执行一次）：
+- 保留策略：开始时间早于 execution_retention_days 天的执行记录（运行中的除外）归档后删除
+  - 归档为 gzip 压缩的 JSONL（每天一个文件，报告以明文写入 result_detail），写入并落盘后才删除；
+    每批只查询元数据列，报告逐条按块解压写入归档，内存占用与报告大小无关
+  - 同时删除对应的报告分块和索引跳过记录，重建相关任务的执行统计，清理不再被引用的报告
+  - 服务内的维护随后压缩报告向量索引（删除不再被分块引用的向量），命令行执行时由服务的下一次维护压缩
+- 增量 vacuum：每次最多回收 database_vacuum_pages 个空闲页（需要数据库为 auto_vacuum=INCREMENTAL）
+- WAL checkpoint(TRUNCATE)：将 WAL 合并回主库并截断 WAL 文件
+- PRAGMA optimize：统计信息过期时重新分析
+
+已有数据库需要执行一次完整 VACUUM 才能启用增量 vacuum（会锁库，建议停服执行）：
+    python src/process/maintenance.py --vacuum
+"""
+import argparse
+import asyncio
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+if __name__ == "__main__":
+    # 设置控制台编码为 UTF-8
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.config import settings  # noqa: E402
+from src.database import adb, db, execution_stats, report_store  # noqa: E402
+from src.database.migrations import optimize  # noqa: E402
+from src.logger import logger  # noqa: E402
+
+# 过期的执行记录（不含 result_detail；每批处理后即删除，因此总是从最早的记录开始读取）
+EXPIRED_EXECUTIONS_SQL = """
+SELECT {columns} FROM tbl_task_execution
+WHERE start_time < ? AND status != 0
+ORDER BY start_time ASC
+LIMIT ?
+"""
+
+# PRAGMA auto_vacuum 的取值
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+# 首次维护在启动后延迟执行，避免与启动时的迁移、索引同步争用
+_FIRST_RUN_DELAY_SECONDS = 60
+
+
+def _file_size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+class DatabaseMaintenance:
+    """数据库维护任务"""
+
+    def __init__(self):
+        self.running = False
+        self.last_result: Optional[Dict[str, Any]] = None  # 最近一次维护的结果
+        self._vacuum_hint_logged = False
+
+    # ==================== 保留策略 ====================
+
+    def _archive_path(self) -> Optional[Path]:
+        if not settings.execution_archive_dir:
+            return None
+        archive_dir = Path(settings.execution_archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        return archive_dir / f"tbl_task_execution-{datetime.now().strftime('%Y%m%d')}.jsonl.gz"
+
+    @staticmethod
+    def _metadata_columns() -> str:
+        """执行记录除 result_detail 以外的列（报告按条单独读取）"""
+        columns = [row["name"] for row in db.query("PRAGMA table_info(tbl_task_execution)")]
+        return ", ".join(column for column in columns if column != "result_detail")
+
+    @staticmethod
+    def _iter_report(execution: Dict[str, Any]) -> Optional[Iterator[str]]:
+        """按块读取执行记录的报告（兼容 result_detail 中的明文报告），没有报告时返回 None"""
+        if execution.get("report_hash"):
+            chunks = report_store.iter_text(execution["report_hash"])
+            try:
+                first = next(chunks, "")
+            except KeyError:
+                logger.warning(f"执行记录 {execution['execution_id']} 的报告内容不存在，归档时跳过报告")
+                return None
+            return itertools.chain([first], chunks)
+        row = db.get_by_id(
+            "tbl_task_execution", "execution_id", execution["execution_id"], columns=("result_detail",)
+        )
+        report = (row or {}).get("result_detail")
+        return iter([report]) if report is not None else None
+
+    def _write_archive(self, path: Path, executions: List[Dict[str, Any]]):
+        """
+        追加写入归档文件（每次追加一个 gzip 成员，gzip 可直接读取多成员文件），写入后落盘
+
+        报告逐条按块写入 result_detail 字段（JSON 字符串分块转义），不在内存中拼出完整记录
+        """
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                for execution in executions:
+                    record = json.dumps(execution, ensure_ascii=False)
+                    chunks = self._iter_report(execution)
+                    if chunks is None:
+                        archive.write(f'{record[:-1]}, "result_detail": null}}\n'.encode("utf-8"))
+                        continue
+                    archive.write(f'{record[:-1]}, "result_detail": "'.encode("utf-8"))
+                    for chunk in chunks:
+                        # 去掉 json.dumps 两端的引号，只保留转义后的内容
+                        archive.write(json.dumps(chunk, ensure_ascii=False)[1:-1].encode("utf-8"))
+                    archive.write(b'"}\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def apply_retention(self, retention_days: int, batch_size: int = None) -> Dict[str, Any]:
+        """
+        归档并删除过期的执行记录
+
+        Args:
+            retention_days: 保留天数
+            batch_size: 每批处理的记录数（每批一个事务）
+
+        Returns:
+            {"archived": 删除的记录数, "archive_file": 归档文件, "reports_removed": 清理的报告数}
+        """
+        batch_size = batch_size or db.batch_size
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        archive_path = self._archive_path()
+        expired_sql = EXPIRED_EXECUTIONS_SQL.format(columns=self._metadata_columns())
+        archived = 0
+        task_ids = set()
+
+        while True:
+            executions = db.query(expired_sql, (cutoff, batch_size))
+            if not executions:
+                break
+            if archive_path is not None:
+                self._write_archive(archive_path, executions)
+
+            execution_ids = tuple(execution["execution_id"] for execution in executions)
+            placeholders = ", ".join(["?"] * len(execution_ids))
+            with db.transaction():
+                db.execute(f"DELETE FROM tbl_report_chunk WHERE execution_id IN ({placeholders})", execution_ids)
+                db.execute(f"DELETE FROM tbl_report_index_skip WHERE execution_id IN ({placeholders})", execution_ids)
+                db.execute(f"DELETE FROM tbl_task_execution WHERE execution_id IN ({placeholders})", execution_ids)
+            task_ids.update(execution["task_id"] for execution in executions)
+            archived += len(executions)
+
+        reports_removed = 0
+        if archived:
+            # 执行统计只反映保留的执行记录
+            for task_id in task_ids:
+                execution_stats.rebuild(task_id)
+            reports_removed = report_store.delete_orphans()
+            logger.info(
+                f"执行记录归档完成: {archived} 条（{cutoff} 之前），清理报告 {reports_removed} 份"
+                + (f"，归档文件 {archive_path}" if archive_path else "")
+            )
+
+        return {
+            "archived": archived,
+            "archive_file": str(archive_path) if archived and archive_path else None,
+            "reports_removed": reports_removed,
+        }
+
+    # ==================== 空间回收 ====================
+
+    def incremental_vacuum(self, max_pages: int = 0) -> Dict[str, Any]:
+        """
+        回收空闲页
+
+        Args:
+            max_pages: 最多回收的页数（0 表示全部）
+        """
+        with db.get_connection() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if mode != 2:
+                if free_before and not self._vacuum_hint_logged:
+                    logger.info(
+                        f"数据库有 {free_before} 个空闲页，但未启用增量 vacuum，"
+                        "可执行 python src/process/maintenance.py --vacuum 转换（需停服）"
+                    )
+                    self._vacuum_hint_logged = True
+                return {"auto_vacuum": _AUTO_VACUUM_MODES.get(mode, mode), "freed_pages": 0}
+            if free_before:
+                # incremental_vacuum 每次 step 只回收一页，sqlite3 的 execute 只 step 一次，
+                # executescript 会执行到结束（不在事务中调用，不会提交其他未完成的写入）
+                conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {"auto_vacuum": "incremental", "freed_pages": free_before - free_after}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """WAL checkpoint(TRUNCATE)，有读事务未结束时只能部分完成（busy = 1）"""
+        with db.get_connection() as conn:
+            busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            logger.warning(f"WAL checkpoint 未能完成（有未结束的读事务）: {checkpointed}/{wal_frames} 帧")
+        return {"busy": bool(busy), "wal_frames": wal_frames, "checkpointed_frames": checkpointed}
+
+    def full_vacuum(self):
+        """完整 VACUUM，并将数据库转换为增量 vacuum 模式（期间锁库）"""
+        with db.get_connection() as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        self.checkpoint()
+
+    # ==================== 维护任务 ====================
+
+    def run_once(self) -> Dict[str, Any]:
+        """执行一次维护（同步方法，在数据库线程池或命令行中调用）"""
+        result = self._maintain()
+        self.last_result = result
+        logger.info(f"数据库维护完成: {result}")
+        return result
+
+    def _maintain(self) -> Dict[str, Any]:
+        """保留策略、空间回收和统计信息更新，返回维护结果"""
+        started = datetime.now()
+        result: Dict[str, Any] = {"started_at": started.strftime("%Y-%m-%d %H:%M:%S")}
+        if settings.execution_retention_days > 0:
+            result["retention"] = self.apply_retention(settings.execution_retention_days)
+        # 先回收空闲页，再 checkpoint 截断 vacuum 产生的 WAL
+        result["vacuum"] = self.incremental_vacuum(settings.database_vacuum_pages)
+        result["checkpoint"] = self.checkpoint()
+        optimize(db)
+        result["duration_ms"] = round((datetime.now() - started).total_seconds() * 1000, 1)
+        return result
+
+    async def run(self):
+        """后台定期执行维护"""
+        interval = settings.database_maintenance_interval_minutes * 60
+        self.running = True
+        logger.info(f"数据库维护任务已启动（每 {settings.database_maintenance_interval_minutes} 分钟执行一次）")
+
+        await asyncio.sleep(_FIRST_RUN_DELAY_SECONDS)
+        while self.running:
+            try:
+                result = await adb.run(self._maintain)
+                result["report_index"] = {"removed_vectors": await self.compact_report_index()}
+                # 结果完整后一次性替换，/system/db/size 不会读到构建中的结果
+                self.last_result = result
+                logger.info(f"数据库维护完成: {result}")
+            except Exception as e:
+                logger.error(f"数据库维护失败: {e}")
+            await asyncio.sleep(interval)
+
+    async def compact_report_index(self) -> int:
+        """
+        压缩报告向量索引，回收保留策略删除的分块对应的向量
+
+        在报告索引器的同步锁内执行（与增量索引互斥），因此只在服务进程的事件循环中调用
+
+        Returns:
+            删除的向量数
+        """
+        from src.process.report_index import report_indexer
+        return await report_indexer.compact()
+
+    def stop(self):
+        """停止维护任务"""
+        self.running = False
+
+    # ==================== 空间报告 ====================
+
+    def size_report(self) -> Dict[str, Any]:
+        """数据库文件、各表 / 索引占用空间、报告存储和归档目录的大小"""
+        db_path = Path(db.db_path)
+        with db.get_read_connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            try:
+                objects = [
+                    dict(row) for row in conn.execute(
+                        "SELECT name, COUNT(*) AS pages, SUM(pgsize) AS size "
+                        "FROM dbstat GROUP BY name ORDER BY size DESC"
+                    )
+                ]
+            except Exception:  # SQLite 未编译 dbstat 时不返回明细
+                objects = None
+
+        archive = None
+        if settings.execution_archive_dir:
+            archive_dir = Path(settings.execution_archive_dir)
+            files = sorted(archive_dir.glob("*.jsonl.gz")) if archive_dir.exists() else []
+            archive = {
+                "dir": str(archive_dir),
+                "files": len(files),
+                "size": sum(_file_size(path) for path in files),
+            }
+
+        return {
+            "database": {
+                "path": str(db_path),
+                "file_size": _file_size(db_path),
+                "wal_size": _file_size(Path(f"{db_path}-wal")),
+                "shm_size": _file_size(Path(f"{db_path}-shm")),
+                "page_size": page_size,
+                "page_count": page_count,
+                "freelist_count": freelist_count,
+                "free_size": freelist_count * page_size,
+                "auto_vacuum": _AUTO_VACUUM_MODES.get(auto_vacuum, auto_vacuum),
+            },
+            "objects": objects,
+            "reports": report_store.stats(),
+            "archive": archive,
+            "retention_days": settings.execution_retention_days,
+            "last_maintenance": self.last_result,
+        }
+
+
+# 全局数据库维护实例
+maintenance = DatabaseMaintenance()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库维护")
+    parser.add_argument("--vacuum", action="store_true", help="执行完整 VACUUM 并启用增量 vacuum（锁库，建议停服执行）")
+    parser.add_argument("--report", action="store_true", help="只输出空间报告")
+    args = parser.parse_args()
+
+    if args.vacuum:
+        before = maintenance.size_report()["database"]["file_size"]
+        maintenance.full_vacuum()
+        after = maintenance.size_report()["database"]["file_size"]
+        print(f"✓ VACUUM 完成：{before / 1024 / 1024:.2f} MB -> {after / 1024 / 1024:.2f} MB")
+    elif not args.report:
+        maintenance.run_once()
+
+    print(json.dumps(maintenance.size_report(), ensure_ascii=False, indent=2))
+    db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
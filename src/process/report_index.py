@@ -0,0 +1,321 @@
+"""
+研究报告向量索引
+
+功能：
+- 任务执行成功后，对报告（报告存储中的压缩报告，或旧数据 result_detail 中的明文报告）分块并生成 embedding
+- 增量索引：只处理尚未建立分块的执行记录，没有可索引内容的记录记入 tbl_report_index_skip，不再重复扫描
+- 分块文本保存在 tbl_report_chunk（vector_row 与向量索引的行号一一对应）
+- 执行记录被删除（保留策略）后，compact() 删除索引中不再被分块引用的向量并重新编号
+- 按查询文本搜索相关的历史研究报告
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import settings
+from src.database import adb, db, report_store
+from src.embedding import embed_texts, model_registry
+from src.embedding.index import VectorIndex
+from src.logger import logger
+
+# 仍被分块记录引用的向量行号
+LIVE_VECTOR_ROWS_SQL = "SELECT vector_row FROM tbl_report_chunk WHERE vector_row < ? ORDER BY vector_row ASC"
+
+
+def split_report(report: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    将报告按段落切分为不超过 chunk_size 字符的分块
+
+    超长段落按固定长度切分，相邻分块保留 overlap 字符重叠
+    """
+    chunks = []
+    current = ""
+    for paragraph in report.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(current) + len(paragraph) + 2 <= chunk_size:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+            continue
+        if current:
+            chunks.append(current)
+            current = ""
+        if len(paragraph) <= chunk_size:
+            current = paragraph
+            continue
+        step = max(1, chunk_size - overlap)
+        for start in range(0, len(paragraph), step):
+            chunks.append(paragraph[start:start + chunk_size])
+            if start + chunk_size >= len(paragraph):
+                break
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ReportIndexer:
+    """研究报告索引器"""
+
+    def __init__(self):
+        self.index = VectorIndex(
+            settings.report_index_dir,
+            exact_threshold=settings.report_index_exact_threshold
+        )
+        self._sync_lock = asyncio.Lock()
+        self._recovered = False
+
+    async def _recover(self):
+        """清理向量写入前中断留下的分块记录（分块表由数据库迁移创建）"""
+        if self._recovered:
+            return
+        if self.index.interrupted:
+            # 上次压缩中断，分块记录的行号与索引文件可能不一致，清空后重新索引
+            await asyncio.to_thread(self.index.reset, self.index.dim, self.index.model)
+            await adb.execute("DELETE FROM tbl_report_chunk")
+        await adb.execute(
+            "DELETE FROM tbl_report_chunk WHERE execution_id IN "
+            "(SELECT execution_id FROM tbl_report_chunk WHERE vector_row >= ?)",
+            (self.index.count,)
+        )
+        self._recovered = True
+
+    async def _pending_executions(self, limit: int) -> List[Dict[str, Any]]:
+        """查询尚未建立索引的成功执行记录"""
+        return await adb.query(
+            """
+            SELECT e.execution_id, e.task_id, e.report_hash
+            FROM tbl_task_execution e
+            WHERE e.status = 1 AND (e.report_hash IS NOT NULL OR e.result_detail IS NOT NULL)
+              AND NOT EXISTS (SELECT 1 FROM tbl_report_chunk c WHERE c.execution_id = e.execution_id)
+              AND NOT EXISTS (SELECT 1 FROM tbl_report_index_skip s WHERE s.execution_id = e.execution_id)
+            ORDER BY e.execution_id ASC
+            LIMIT ?
+            """,
+            (limit,)
+        )
+
+    @staticmethod
+    def _load_report(execution: Dict[str, Any]) -> str:
+        """读取执行记录的完整报告（在数据库线程中执行）"""
+        if execution["report_hash"]:
+            return report_store.get(execution["report_hash"])
+        row = db.get_by_id(
+            "tbl_task_execution", "execution_id", execution["execution_id"], columns=("result_detail",)
+        )
+        return (row or {}).get("result_detail") or ""
+
+    async def _index_execution(self, execution: Dict[str, Any], model_path: str) -> int:
+        """为单条执行记录的报告建立索引，返回分块数"""
+        execution_id = execution["execution_id"]
+        report = await adb.run(self._load_report, execution)
+        chunks = split_report(
+            report,
+            settings.report_chunk_size,
+            settings.report_chunk_overlap
+        )
+        if not chunks:
+            # 记录没有可索引内容的执行记录，增量索引不再重复扫描
+            await adb.execute(
+                "INSERT OR IGNORE INTO tbl_report_index_skip (execution_id, created_at) VALUES (?, ?)",
+                (execution_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return 0
+
+        vectors = await embed_texts(chunks, settings.report_index_model or None)
+
+        # 模型或维度变化时重建索引
+        if self.index.model != model_path or self.index.dim != vectors.shape[1]:
+            await asyncio.to_thread(self.index.reset, vectors.shape[1], model_path)
+            await adb.execute("DELETE FROM tbl_report_chunk")
+
+        # 先写分块记录再追加向量：向量写入中断时，下次启动会清理多出的分块记录并重新索引
+        start = self.index.count
+        await adb.insert_many("tbl_report_chunk", [
+            {
+                "vector_row": start + i,
+                "execution_id": execution_id,
+                "task_id": execution["task_id"],
+                "chunk_index": i,
+                "content": chunk
+            }
+            for i, chunk in enumerate(chunks)
+        ], chunk_size=len(chunks))
+        await asyncio.to_thread(
+            self.index.append, vectors, [execution_id] * len(chunks), [execution["task_id"]] * len(chunks)
+        )
+        return len(chunks)
+
+    async def sync(self, limit: int = 100) -> Dict[str, int]:
+        """
+        增量索引尚未处理的成功执行记录
+
+        Args:
+            limit: 本次最多处理的执行记录数
+
+        Returns:
+            本次索引的执行记录数和分块数
+        """
+        async with self._sync_lock:
+            await self._recover()
+            model_path = model_registry.model_path(settings.report_index_model or None)
+            indexed_executions = 0
+            indexed_chunks = 0
+
+            for execution in await self._pending_executions(limit):
+                chunk_count = await self._index_execution(execution, model_path)
+                if chunk_count:
+                    indexed_executions += 1
+                    indexed_chunks += chunk_count
+
+            if indexed_executions:
+                logger.info(f"报告索引完成: 执行记录 {indexed_executions} 条, 分块 {indexed_chunks} 个")
+            return {"executions": indexed_executions, "chunks": indexed_chunks}
+
+    def _compact(self) -> int:
+        """删除索引中不再被分块记录引用的向量，并按顺序更新分块的行号（在线程中执行）"""
+        live_rows = [row["vector_row"] for row in db.query(LIVE_VECTOR_ROWS_SQL, (self.index.count,))]
+        if len(live_rows) == self.index.count:
+            return 0
+
+        def commit():
+            # 新行号不大于旧行号，按旧行号升序逐行更新不会与尚未更新的行冲突
+            with db.transaction() as conn:
+                conn.executemany(
+                    "UPDATE tbl_report_chunk SET vector_row = ? WHERE vector_row = ?",
+                    [(new_row, old_row) for new_row, old_row in enumerate(live_rows) if new_row != old_row]
+                )
+
+        return self.index.compact(np.asarray(live_rows, dtype=np.int64), commit)
+
+    async def compact(self) -> int:
+        """
+        压缩向量索引（数据库维护删除执行记录后调用，与增量索引互斥）
+
+        Returns:
+            删除的向量数
+        """
+        async with self._sync_lock:
+            await self._recover()
+            return await asyncio.to_thread(self._compact)
+
+    async def sync_in_background(self):
+        """后台增量索引，直到没有待处理的记录（启动和任务执行完成后调用，失败只记录日志）"""
+        try:
+            while (await self.sync())["executions"]:
+                pass
+        except Exception as e:
+            logger.error(f"报告索引失败: {e}")
+
+    async def sync_when_ready(self, preload_task: Optional[asyncio.Task] = None):
+        """
+        服务启动时补齐未建立索引的报告
+
+        只在索引使用的 embedding 模型预加载就绪后执行，不会为补齐索引在启动时加载模型；
+        模型未就绪时由下一次任务执行完成后的增量索引补齐
+        """
+        if preload_task is not None:
+            await preload_task
+        if not model_registry.readiness(settings.report_index_model or None).is_ready:
+            logger.info("报告索引使用的 embedding 模型尚未就绪，跳过启动时的索引补齐（任务执行完成后自动补齐）")
+            return
+        await self.sync_in_background()
+
+    async def _search_chunks(self, query_vector: np.ndarray, limit: int, task_id: Optional[int]):
+        """
+        召回最相似的 limit 个向量并查询对应的分块（已删除的执行记录不会出现在结果中）
+
+        Returns:
+            ({行号: 相似度}, 分块记录, 召回的向量数)
+        """
+        while True:
+            generation = self.index.generation
+            hits = await asyncio.to_thread(self.index.search, query_vector, limit, task_id)
+            if not hits:
+                return {}, [], 0
+            scores = dict(hits)
+            placeholders = ", ".join(["?"] * len(hits))
+            rows = await adb.query(
+                f"""
+                SELECT c.vector_row, c.execution_id, c.task_id, c.chunk_index, c.content,
+                       e.task_name, e.start_time
+                FROM tbl_report_chunk c
+                JOIN tbl_task_execution e ON e.execution_id = c.execution_id
+                WHERE c.vector_row IN ({placeholders})
+                """,
+                tuple(scores)
+            )
+            # 期间索引被压缩或重置时行号已变化，重新搜索
+            if self.index.generation == generation:
+                return scores, rows, len(hits)
+
+    async def search(self, query: str, top_k: int = 10, task_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        搜索相关的历史研究报告
+
+        Args:
+            query: 查询文本
+            top_k: 返回的执行记录数和分块数
+            task_id: 只搜索指定任务的报告（可选）
+
+        Returns:
+            {"executions": 按最高分排序的执行记录, "chunks": 最相关的分块}
+        """
+        await self._recover()
+        if self.index.count == 0:
+            return {"executions": [], "chunks": []}
+
+        query_vector = (await embed_texts([query], settings.report_index_model or None))[0]
+        if query_vector.shape[0] != self.index.dim:
+            raise ValueError("当前 embedding 模型与报告索引不一致，请先重建索引")
+
+        # 多召回一些分块，用于按执行记录聚合；已删除（尚未压缩）的分块会被过滤掉，
+        # 存活的分块或执行记录不足 top_k 时扩大召回数量，直到召回了全部向量
+        limit = top_k * 3
+        while True:
+            scores, rows, recalled = await self._search_chunks(query_vector, limit, task_id)
+            enough = len(rows) >= limit or (
+                len(rows) >= top_k and len({row["execution_id"] for row in rows}) >= top_k
+            )
+            if enough or recalled < limit or limit >= self.index.count:
+                break
+            limit *= 4
+        if not rows:
+            return {"executions": [], "chunks": []}
+        rows.sort(key=lambda row: scores[row["vector_row"]], reverse=True)
+
+        executions: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        chunks = []
+        for row in rows:
+            score = round(scores[row["vector_row"]], 4)
+            if len(chunks) < top_k:
+                chunks.append({
+                    "execution_id": row["execution_id"],
+                    "chunk_index": row["chunk_index"],
+                    "score": score,
+                    "content": row["content"]
+                })
+            execution = executions.get(row["execution_id"])
+            if execution is None:
+                executions[row["execution_id"]] = {
+                    "execution_id": row["execution_id"],
+                    "task_id": row["task_id"],
+                    "task_name": row["task_name"],
+                    "start_time": row["start_time"],
+                    "score": score,
+                    "matched_chunks": 1
+                }
+            else:
+                execution["matched_chunks"] += 1
+
+        return {"executions": list(executions.values())[:top_k], "chunks": chunks}
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        return self.index.stats()
+
+
+# 全局报告索引器实例
+report_indexer = ReportIndexer()
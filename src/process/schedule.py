@@ -0,0 +1,200 @@
+"""
+定时任务时间配置
+
+task_conf 格式（空格分隔）：
+- 分 时 日 月 周：分钟级配置，在匹配的分钟触发
+- 时 日 月 周：小时级配置（兼容旧格式），在匹配的小时内触发一次，触发分钟默认为整点，
+  可按任务错开（见 jitter_minute）
+
+每个字段支持 *、单个值、范围（1-5）、步长（*/15、10-50/20、5/10）和逗号分隔的列表（6,8,10-12,30-59/15）
+
+配置编译为位掩码（CompiledSchedule）后匹配只需位运算，并可计算下一次触发时间：
+- 日和周同时指定时需要同时满足
+- 同一个触发时段（小时级配置为小时，分钟级配置为分钟）只执行一次，slot_key 用于去重
+"""
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# 字段名称和取值范围（分钟字段可省略）
+_MINUTE_FIELD: Tuple[str, int, int] = ("分", 0, 59)
+_FIELDS: Tuple[Tuple[str, int, int], ...] = (
+    ("时", 0, 23),
+    ("日", 1, 31),
+    ("月", 1, 12),
+    ("周", 0, 6),
+)
+
+# 计算下一次触发时间时最多向后查找的天数（覆盖闰年 2 月 29 日）
+_MAX_LOOKAHEAD_DAYS = 366 * 8 + 2
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> int:
+    """将单个字段解析为位掩码（第 n 位表示值 n）"""
+    mask = 0
+    for item in text.split(","):
+        base, has_step, step_text = item.strip().partition("/")
+        try:
+            step = int(step_text) if has_step else 1
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(part) for part in base.split("-", 1))
+            else:
+                # 带步长的单个值表示从该值开始到最大值（如 5/10 即 5,15,25...）
+                start = int(base)
+                end = high if has_step else start
+        except ValueError:
+            raise ValueError(f"时间配置的{name}字段格式错误: {text}")
+        if step < 1:
+            raise ValueError(f"时间配置的{name}字段步长必须大于 0: {text}")
+        if not low <= start <= end <= high:
+            raise ValueError(f"时间配置的{name}字段超出范围 {low}-{high}: {text}")
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+def _lowest_bit(mask: int, start: int) -> Optional[int]:
+    """mask 中不小于 start 的最低置位，没有时返回 None"""
+    mask = mask >> start << start
+    return (mask & -mask).bit_length() - 1 if mask else None
+
+
+def _weekday(moment: datetime) -> int:
+    """0=周日, 1=周一, ..., 6=周六（Python 的 weekday() 中 0=周一）"""
+    return (moment.weekday() + 1) % 7
+
+
+def jitter_minute(task_id: int, jitter_minutes: int) -> int:
+    """
+    小时级配置的错峰触发分钟（按任务ID确定，同一任务每次相同）
+
+    Args:
+        task_id: 任务ID
+        jitter_minutes: 错开的分钟数（0 表示整点触发，最大 60）
+
+    Returns:
+        0 到 jitter_minutes - 1 之间的分钟
+    """
+    jitter_minutes = min(jitter_minutes, 60)
+    if jitter_minutes <= 0 or task_id is None:
+        return 0
+    return zlib.crc32(str(task_id).encode("utf-8")) % jitter_minutes
+
+
+class CompiledSchedule:
+    """编译后的时间配置（分、时、日、月、周的位掩码）"""
+
+    __slots__ = ("task_conf", "minutes", "hours", "days", "months", "weekdays", "hourly")
+
+    def __init__(
+        self,
+        task_conf: str,
+        minutes: int,
+        hours: int,
+        days: int,
+        months: int,
+        weekdays: int,
+        hourly: bool = False,
+    ):
+        self.task_conf = task_conf
+        self.minutes = minutes
+        self.hours = hours
+        self.days = days
+        self.months = months
+        self.weekdays = weekdays
+        self.hourly = hourly  # 小时级配置：触发时段为整个小时
+
+    def _matches_date(self, moment: datetime) -> bool:
+        return bool(
+            self.days >> moment.day & 1
+            and self.months >> moment.month & 1
+            and self.weekdays >> _weekday(moment) & 1
+        )
+
+    def _slot_start(self, moment: datetime) -> datetime:
+        """moment 所在触发时段的开始时间"""
+        if self.hourly:
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(second=0, microsecond=0)
+
+    def matches(self, moment: datetime) -> bool:
+        """判断时间是否处于触发时段内（小时级配置为匹配的小时，分钟级配置为匹配的分钟）"""
+        return bool(
+            self.hours >> moment.hour & 1
+            and (self.hourly or self.minutes >> moment.minute & 1)
+            and self._matches_date(moment)
+        )
+
+    def slot_key(self, moment: datetime) -> str:
+        """moment 所在触发时段的标识（用于同一时段只执行一次）"""
+        if self.hourly:
+            return moment.strftime("%Y-%m-%d-%H")
+        return moment.strftime("%Y-%m-%d-%H:%M")
+
+    def next_fire_time(self, after: datetime) -> Optional[datetime]:
+        """
+        计算 after 所在触发时段之后的下一次触发时间
+
+        Returns:
+            下一次触发时间（精确到分钟），配置永远不会触发时（如 2 月 30 日）返回 None
+        """
+        # 下一个时段的开始时间
+        moment = self._slot_start(after) + (timedelta(hours=1) if self.hourly else timedelta(minutes=1))
+        day = moment.replace(hour=0, minute=0)
+        first_hour, first_minute = moment.hour, moment.minute
+        for _ in range(_MAX_LOOKAHEAD_DAYS):
+            if self._matches_date(day):
+                hour = _lowest_bit(self.hours, first_hour)
+                minute = None
+                if hour is not None:
+                    minute = _lowest_bit(self.minutes, first_minute if hour == first_hour else 0)
+                    if minute is None:
+                        # 第一个小时内剩余的分钟都不匹配，取下一个匹配小时的第一个匹配分钟
+                        hour = _lowest_bit(self.hours, hour + 1)
+                        minute = _lowest_bit(self.minutes, 0) if hour is not None else None
+                if minute is not None:
+                    return day.replace(hour=hour, minute=minute)
+            day += timedelta(days=1)
+            first_hour = first_minute = 0
+        return None
+
+    def current_or_next_fire_time(self, now: datetime) -> Optional[datetime]:
+        """
+        当前处于触发时段内时返回本时段的触发时间，否则返回下一次触发时间
+
+        小时级配置的触发分钟不为 0 时，本时段的触发时间可能晚于 now
+        """
+        if self.matches(now):
+            if self.hourly:
+                return self._slot_start(now).replace(minute=_lowest_bit(self.minutes, 0))
+            return self._slot_start(now)
+        return self.next_fire_time(now)
+
+    def __repr__(self):
+        return f"CompiledSchedule({self.task_conf!r})"
+
+
+def compile_schedule(task_conf: str, minute: int = 0) -> CompiledSchedule:
+    """
+    编译时间配置
+
+    Args:
+        task_conf: 时间配置（分 时 日 月 周，或 时 日 月 周）
+        minute: 小时级配置（4 个字段）在触发小时内的触发分钟，分钟级配置忽略
+
+    Raises:
+        ValueError: 配置格式错误或取值超出范围
+    """
+    parts = (task_conf or "").split()
+    if len(parts) == len(_FIELDS):
+        if not 0 <= minute <= 59:
+            raise ValueError(f"触发分钟超出范围 0-59: {minute}")
+        masks = [_parse_field(part, name, low, high) for part, (name, low, high) in zip(parts, _FIELDS)]
+        return CompiledSchedule(task_conf, 1 << minute, *masks, hourly=True)
+    if len(parts) == len(_FIELDS) + 1:
+        fields = (_MINUTE_FIELD,) + _FIELDS
+        masks = [_parse_field(part, name, low, high) for part, (name, low, high) in zip(parts, fields)]
+        return CompiledSchedule(task_conf, *masks)
+    raise ValueError(f"时间配置格式错误（应为 分 时 日 月 周，或 时 日 月 周）: {task_conf}")
@@ -0,0 +1,91 @@
+"""
+定时任务注册表
+
+调度器使用的启用任务（task_status = 1）内存缓存：
+- 启动时加载一次，任务接口（create / update / delete）修改任务后调用 invalidate()，下次读取时重新加载
+- 其他进程直接修改数据库时，通过定期检查任务表的修改计数发现变化（由触发器在每次插入、更新、删除时递增，
+  update_time 只精确到分钟，不能用来判断同一分钟内的多次修改）
+- version 在每次重新加载后递增，调度器据此判断是否需要重新计算触发时间
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+from src.database import adb
+from src.logger import logger
+
+# 任务表修改计数（用于发现其他进程的修改）
+FINGERPRINT_SQL = "SELECT version FROM tbl_agent_schedule_task_version WHERE id = 1"
+
+
+class TaskRegistry:
+    """启用任务的内存缓存"""
+
+    def __init__(self, check_seconds: int = 60):
+        """
+        初始化注册表
+
+        Args:
+            check_seconds: 检查任务表修改计数的最短间隔（秒）
+        """
+        self.check_seconds = check_seconds
+        self.version = 0  # 每次重新加载后递增
+        self._tasks: List[Dict[str, Any]] = []
+        self._fingerprint: Optional[int] = None
+        self._dirty = True
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+
+    def invalidate(self, task_id: Optional[int] = None):
+        """任务被修改后调用：下次读取时重新加载，并唤醒等待中的调度器"""
+        logger.debug(f"定时任务注册表失效（任务ID: {task_id}）")
+        self._dirty = True
+        self._changed.set()
+
+    async def _load_fingerprint(self) -> Optional[int]:
+        rows = await adb.query(FINGERPRINT_SQL)
+        return rows[0]["version"] if rows else None
+
+    async def get_tasks(self) -> List[Dict[str, Any]]:
+        """获取所有启用的任务（按 task_id 升序）"""
+        async with self._lock:
+            now = time.monotonic()
+            if not self._dirty and now - self._checked_at >= self.check_seconds:
+                self._checked_at = now
+                if await self._load_fingerprint() != self._fingerprint:
+                    logger.info("检测到定时任务表被外部修改，重新加载")
+                    self._dirty = True
+
+            if self._dirty:
+                # 先清除标记再加载，加载期间的修改会在下次读取时生效
+                self._dirty = False
+                self._changed.clear()
+                self._fingerprint = await self._load_fingerprint()
+                self._tasks = await adb.get_all(
+                    "tbl_agent_schedule_task",
+                    where="task_status = 1",
+                    order_by="task_id ASC"
+                )
+                self._checked_at = time.monotonic()
+                self.version += 1
+                logger.debug(f"定时任务注册表已加载: {len(self._tasks)} 个启用任务（版本 {self.version}）")
+            return self._tasks
+
+    async def wait_changed(self, timeout: float) -> bool:
+        """
+        等待任务被修改
+
+        Returns:
+            超时前是否有任务被修改
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# 全局定时任务注册表实例
+task_registry = TaskRegistry(check_seconds=settings.scheduler_registry_check_seconds)